@@ -0,0 +1,210 @@
+# shared/benchmark.py
+
+"""
+End-to-end benchmark of run_scraper_and_email against recorded fixtures (see shared/replay.py).
+No network access is needed: pages come from a local fixture server, politeness delays are
+disabled, state goes to a temporary directory and email goes to an in-memory SMTP sink.
+
+    python -m shared.benchmark fixtures/ [--latency 0.05 0.2] [--error-rate 0.05] [--repeat 3] [--json]
+
+fixtures/ is recorded from the live sites (python -m shared.replay record fixtures/) or, for a
+reproducible comparison between changes, synthesized (python -m shared.replay synthesize fixtures/).
+"""
+
+import argparse
+import json
+import logging
+import os
+import smtplib
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+from shared import config, email_sender, http_client, job_store, scraper, utils
+from shared.digest import DigestBuilder
+from shared.replay import FixtureServer
+from shared.sources import base
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class SinkSMTP:
+    """Stand-in for smtplib.SMTP that accepts every message and keeps it in memory."""
+
+    messages = []
+
+    def __init__(self, host="", port=0, *args, **kwargs):
+        self.host = host
+        self.port = port
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
+
+    def starttls(self, *args, **kwargs):
+        return (220, b"ready")
+
+    def login(self, user, password):
+        return (235, b"ok")
+
+    def sendmail(self, from_addr, to_addrs, msg, *args, **kwargs):
+        SinkSMTP.messages.append(msg)
+        return {}
+
+    def send_message(self, msg, from_addr=None, to_addrs=None, *args, **kwargs):
+        SinkSMTP.messages.append(msg.as_string())
+        return {}
+
+    def noop(self):
+        return (250, b"ok")
+
+    def quit(self):
+        return (221, b"bye")
+
+    close = quit
+
+
+class StageTimer:
+    """
+    Accumulates time spent in named pipeline stages by temporarily wrapping module functions.
+    Stages may run on several threads at once, so their totals can add up to more than wall time.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+        self._patches = []
+
+    def wrap(self, module, name, stage):
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.seconds[stage] += elapsed
+                    self.calls[stage] += 1
+
+        setattr(module, name, timed)
+        self._patches.append((module, name, original))
+
+    def restore(self):
+        for module, name, original in reversed(self._patches):
+            setattr(module, name, original)
+        self._patches.clear()
+
+
+@contextmanager
+def offline_environment(fixture_dir, latency=(0, 0), error_rate=0.0, seed=0):
+    """
+    Points the pipeline at recorded fixtures for the duration of the block: pages come from a
+    FixtureServer, politeness delays are off, the job store, outbox and page archive live in a
+    temporary directory and email goes to SinkSMTP. Yields the FixtureServer.
+    """
+    saved = (config.POLITENESS_DELAYS, config.JOB_STORE_PATH, config.EMAIL_OUTBOX_DIR, config.ARCHIVE_DIR, smtplib.SMTP)
+    saved_env = {key: os.environ.get(key) for key in ("RENDER_EMAIL_USER", "RENDER_EMAIL_PASS")}
+    SinkSMTP.messages = []
+
+    with tempfile.TemporaryDirectory(prefix="job-bot-offline-") as data_dir:
+        config.POLITENESS_DELAYS = False
+        config.JOB_STORE_PATH = os.path.join(data_dir, "jobs.db")
+        config.EMAIL_OUTBOX_DIR = os.path.join(data_dir, "outbox")
+        config.ARCHIVE_DIR = os.path.join(data_dir, "archive")
+        smtplib.SMTP = SinkSMTP
+        os.environ.setdefault("RENDER_EMAIL_USER", "bench@example.com")
+        os.environ.setdefault("RENDER_EMAIL_PASS", "bench")
+
+        try:
+            with FixtureServer(fixture_dir, latency=latency, error_rate=error_rate, seed=seed) as server:
+                yield server
+        finally:
+            config.POLITENESS_DELAYS, config.JOB_STORE_PATH, config.EMAIL_OUTBOX_DIR, config.ARCHIVE_DIR, smtplib.SMTP = saved
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+def run_once(fixture_dir, latency=(0, 0), error_rate=0.0, seed=0):
+    """Runs the full pipeline once against fixture_dir and returns a report dict."""
+    timer = StageTimer()
+    timer.wrap(http_client, "fetch", "fetch")
+    timer.wrap(base, "parse_results", "parse")
+    timer.wrap(utils, "classify_job", "filter")
+    timer.wrap(job_store.JobRecorder, "is_new", "dedup")
+    timer.wrap(DigestBuilder, "render_parts", "render")
+    timer.wrap(email_sender.Mailer, "send_digest", "email")
+
+    try:
+        with offline_environment(fixture_dir, latency, error_rate, seed) as server:
+            tracemalloc.start()
+            start = time.perf_counter()
+            jobs = scraper.run_scraper_and_email()
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            requests_served = server.requests_served
+    finally:
+        timer.restore()
+
+    return {
+        "wall_seconds": round(wall, 4),
+        "peak_memory_bytes": peak,
+        "requests": requests_served,
+        "jobs_emailed": len(jobs),
+        "emails_sent": len(SinkSMTP.messages),
+        "email_bytes": sum(len(m) for m in SinkSMTP.messages),
+        "stages": {
+            stage: {"seconds": round(timer.seconds[stage], 4), "calls": timer.calls[stage]}
+            for stage in ("fetch", "parse", "filter", "dedup", "render", "email")
+        },
+    }
+
+
+def format_report(report):
+    lines = [
+        f"wall time      {report['wall_seconds']:.3f} s",
+        f"peak memory    {report['peak_memory_bytes'] / 1024 / 1024:.2f} MiB",
+        f"requests       {report['requests']}",
+        f"jobs emailed   {report['jobs_emailed']} in {report['emails_sent']} message(s), {report['email_bytes']} bytes",
+        "stage          seconds    calls   (cumulative across threads)",
+    ]
+    for stage, numbers in report["stages"].items():
+        lines.append(f"  {stage:<12} {numbers['seconds']:>8.3f} {numbers['calls']:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark a full scrape-and-email run against recorded fixtures.")
+    parser.add_argument("fixture_dir")
+    parser.add_argument("--latency", type=float, nargs=2, default=(0, 0), metavar=("MIN", "MAX"),
+                        help="Per-response latency range in seconds injected by the fixture server.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503.")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of runs (each with a fresh job store).")
+    parser.add_argument("--json", action="store_true", help="Print reports as JSON.")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING) # Keep the per-page log lines out of the report
+    reports = []
+    for i in range(args.repeat):
+        report = run_once(args.fixture_dir, tuple(args.latency), args.error_rate, seed=i)
+        reports.append(report)
+        if not args.json:
+            print(f"--- run {i + 1}/{args.repeat} ---")
+            print(format_report(report))
+    if args.json:
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,30 @@
 # shared/config.py
 
+import os
+
 # This file can be used for general configurations or constants.
 # Specific search terms are now managed in shared/scraper.py's SCRAPE_TERMS.
 
-# You can keep general categories here if you plan to use them for other filtering logic
-# or for a more structured approach to defining job types, but they are not
-# directly used for the SCRAPE_TERMS list.
+# Job categories and the phrases that describe them. They are not used for the SCRAPE_TERMS list;
+# shared/scoring.py scores every job against them, and the digest is grouped by category and
+# ranked by score. Hebrew phrases matter as much as English ones: most sources are Israeli sites.
 JOB_CATEGORIES = {
-    "English to Hebrew translation": ["English to Hebrew translation", "translate English Hebrew", "Hebrew English translator", "Hebrew translator", "English Hebrew localization"],
-    "Song translation (light music)": ["song translation music", "light music translation", "music translation lyrics", "lyrics translation", "song adaptation"],
-    "Piano recording (session musician)": ["piano recording", "session pianist", "remote piano session", "piano for song", "midi piano recording"],
-    "Vocal recording (harmony recording)": ["vocal recording", "harmony vocalist", "backing vocals recording", "session singer harmony", "vocal harmony arrangements"],
+    "English to Hebrew translation": [
+        "English to Hebrew translation", "translate English Hebrew", "Hebrew English translator", "Hebrew translator", "English Hebrew localization",
+        "תרגום אנגלית עברית", "מתרגם מאנגלית לעברית", "מתרגם אנגלית", "תרגום מסמכים",
+    ],
+    "Song translation (light music)": [
+        "song translation music", "light music translation", "music translation lyrics", "lyrics translation", "song adaptation",
+        "תרגום שירים", "מתרגם שירים", "תרגום מילים לשיר",
+    ],
+    "Piano recording (session musician)": [
+        "piano recording", "session pianist", "remote piano session", "piano for song", "midi piano recording",
+        "הקלטת פסנתר", "פסנתרן ליווי", "פסנתרן להקלטות", "נגן פסנתר",
+    ],
+    "Vocal recording (harmony recording)": [
+        "vocal recording", "harmony vocalist", "backing vocals recording", "session singer harmony", "vocal harmony arrangements",
+        "הקלטת שירה", "הקלטת קולות שניים", "הרמוניות שירה", "זמר לאולפן", "זמרת לאולפן",
+    ],
 }
 
 # The ISRAELI_PLATFORM_TERMS dictionary was removed from here
@@ -22,5 +36,144 @@ JOB_CATEGORIES = {
 EMAIL_SENDER = "" # Change this or use env var
 EMAIL_PASSWORD = "" # Change this or use env var
 EMAIL_RECIPIENT = "" # Change this
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+SMTP_SERVER = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+
+# --- Sources ---
+# Names of the sources (see shared/sources/__init__.py REGISTRY) crawled on every run, in order.
+# Fiverr is disabled due to persistent 403 errors and JobMaster due to persistent 404 errors;
+# if you'd like to re-enable them we may need more advanced scraping techniques (e.g., headless browsers).
+ENABLED_SOURCES = [
+    name.strip() for name in os.environ.get("JOB_BOT_SOURCES", "alljobs,janglo").split(",") if name.strip()
+]
+
+# Politeness delays between requests to the same host. Only turn these off when fetching from
+# local fixtures (shared/replay.py, shared/benchmark.py), never against the live sites.
+POLITENESS_DELAYS = os.environ.get("JOB_BOT_POLITENESS_DELAYS", "1") != "0"
+
+# --- Filtering ---
+# Languages accepted by the relevance filter (shared/utils.py rule 3). Hebrew is accepted as well
+# as English because most sources are Israeli sites searched with Hebrew terms.
+RELEVANT_LANGUAGES = [
+    code.strip() for code in os.environ.get("RELEVANT_LANGUAGES", "en,he").split(",") if code.strip()
+]
+# Minimum category score (shared/scoring.py, 0 to 1) for a job to be relevant. When set above 0 it
+# replaces the core-keyword rule (shared/utils.py rule 5); 0 keeps the keyword rule.
+RELEVANCE_MIN_SCORE = float(os.environ.get("RELEVANCE_MIN_SCORE", "0"))
+# Jobs are scored in batches of this size (one matrix product per batch) as they stream through.
+SCORING_BATCH_SIZE = int(os.environ.get("SCORING_BATCH_SIZE", "256"))
+
+# --- Local storage ---
+# Directory for the bot's on-disk state (SQLite databases, caches). On Render, point
+# JOB_BOT_DATA_DIR at a persistent disk so state survives deploys.
+DATA_DIR = os.environ.get("JOB_BOT_DATA_DIR", "data")
+
+# Seen-jobs store used for cross-run de-duplication (shared/job_store.py).
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", os.path.join(DATA_DIR, "jobs.db"))
+# Jobs not seen again for this many days are forgotten; if they reappear they count as new.
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", "90"))
+# Jobs recorded during a run are written in transactions of this many, so the store is never
+# locked for a whole run.
+JOB_STORE_BATCH_SIZE = int(os.environ.get("JOB_STORE_BATCH_SIZE", "200"))
+
+# Run history shared by the web and worker processes (shared/status_store.py).
+STATUS_STORE_PATH = os.environ.get("STATUS_STORE_PATH", os.path.join(DATA_DIR, "status.db"))
+# Number of recent runs kept and shown on the dashboard.
+STATUS_HISTORY_SIZE = int(os.environ.get("STATUS_HISTORY_SIZE", "20"))
+# Lock file that keeps the web and worker processes from crawling at the same time (shared/scan_coordinator.py).
+SCAN_LOCK_PATH = os.environ.get("SCAN_LOCK_PATH", os.path.join(DATA_DIR, "scan.lock"))
+
+# --- Query planner (shared/query_planner.py) ---
+# A term is skipped on a source when at least this share of the listings it returned recently
+# was also returned by terms that are still crawled.
+PLANNER_OVERLAP_THRESHOLD = float(os.environ.get("PLANNER_OVERLAP_THRESHOLD", "0.9"))
+# Listing history older than this is ignored when estimating overlap.
+PLANNER_HISTORY_DAYS = int(os.environ.get("PLANNER_HISTORY_DAYS", "14"))
+# A skipped term is crawled again after this many hours, so its overlap estimate stays fresh.
+PLANNER_REVALIDATE_HOURS = int(os.environ.get("PLANNER_REVALIDATE_HOURS", "72"))
+# Number of newest listing IDs remembered per (source, term) as its pagination high-water mark.
+WATERMARK_SIZE = int(os.environ.get("WATERMARK_SIZE", "200"))
+
+# --- Email delivery (shared/email_sender.py) ---
+# Digests are split into several messages so that each message, as sent (base64-encoded HTML and
+# plain-text parts plus headers), stays within this many bytes.
+EMAIL_MAX_BYTES = int(os.environ.get("EMAIL_MAX_BYTES", "500000"))
+# Messages that could not be delivered are queued here and retried at the start of the next run.
+EMAIL_OUTBOX_DIR = os.environ.get("EMAIL_OUTBOX_DIR", os.path.join(DATA_DIR, "outbox"))
+
+# --- Adaptive rate limiting and circuit breaking (shared/rate_limit.py) ---
+# Every healthy response multiplies a host's delay between requests by RATE_LIMIT_SPEEDUP (down to
+# the source's min_delay); a 429/503 multiplies it by RATE_LIMIT_BACKOFF (up to RATE_LIMIT_MAX_DELAY seconds).
+RATE_LIMIT_SPEEDUP = float(os.environ.get("RATE_LIMIT_SPEEDUP", "0.9"))
+RATE_LIMIT_BACKOFF = float(os.environ.get("RATE_LIMIT_BACKOFF", "2.0"))
+RATE_LIMIT_MAX_DELAY = float(os.environ.get("RATE_LIMIT_MAX_DELAY", "120"))
+# A Retry-After up to this many seconds is waited out; a longer one opens the host's circuit breaker instead.
+RETRY_AFTER_MAX_WAIT = float(os.environ.get("RETRY_AFTER_MAX_WAIT", "60"))
+# How often a throttled (429/503) page is retried within a run.
+THROTTLE_RETRIES = int(os.environ.get("THROTTLE_RETRIES", "1"))
+# Consecutive failed requests that open a host's circuit breaker, and how long it then stays open
+# (doubling after every failed probe, up to the maximum). The state carries over between runs.
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BREAKER_COOLDOWN_SECONDS", "900"))
+BREAKER_MAX_COOLDOWN_SECONDS = float(os.environ.get("BREAKER_MAX_COOLDOWN_SECONDS", "86400"))
+
+# --- Detail-page enrichment (shared/enrichment.py) ---
+# Off by default: when on, jobs that pass a cheap prefilter get their description from the
+# listing's detail page (for sources with detail_selectors) before the relevance filter runs.
+ENRICH_DETAILS = os.environ.get("JOB_BOT_ENRICH_DETAILS", "0") != "0"
+# Extracted detail descriptions, keyed by URL, are reused for this many hours.
+DETAIL_CACHE_PATH = os.environ.get("DETAIL_CACHE_PATH", os.path.join(DATA_DIR, "detail_cache.db"))
+DETAIL_CACHE_TTL_HOURS = int(os.environ.get("DETAIL_CACHE_TTL_HOURS", "168"))
+# At most this many detail pages are fetched per run; further jobs keep their snippet.
+ENRICH_MAX_FETCHES = int(os.environ.get("ENRICH_MAX_FETCHES", "200"))
+# At most this many jobs wait for their detail page at once; the pipeline blocks beyond that.
+ENRICH_MAX_PENDING = int(os.environ.get("ENRICH_MAX_PENDING", "16"))
+
+# --- Near-duplicate detection (shared/near_duplicates.py) ---
+# Jobs whose normalized title + description share at least this estimated fraction of their
+# character shingles (Jaccard similarity) are treated as the same posting.
+NEAR_DUP_THRESHOLD = float(os.environ.get("NEAR_DUP_THRESHOLD", "0.6"))
+# Shingle length in characters.
+NEAR_DUP_SHINGLE_SIZE = int(os.environ.get("NEAR_DUP_SHINGLE_SIZE", "5"))
+
+# --- Worker schedule (worker/app.py, shared/scheduling.py) ---
+# Every enabled source is crawled on its own schedule, with its search terms split into this many
+# groups that are scheduled separately. Start times are spread over the first interval.
+SCHEDULE_TERM_GROUPS = int(os.environ.get("SCHEDULE_TERM_GROUPS", "2"))
+# Each unit starts at SCHEDULE_INTERVAL_HOURS between runs. A run that finds new jobs multiplies its
+# interval by SCHEDULE_SPEEDUP (down to the minimum), a run that finds none by SCHEDULE_BACKOFF
+# (up to the maximum), so busy sources are crawled more often than quiet ones.
+SCHEDULE_INTERVAL_HOURS = float(os.environ.get("SCHEDULE_INTERVAL_HOURS", "6"))
+SCHEDULE_MIN_INTERVAL_HOURS = float(os.environ.get("SCHEDULE_MIN_INTERVAL_HOURS", "2"))
+SCHEDULE_MAX_INTERVAL_HOURS = float(os.environ.get("SCHEDULE_MAX_INTERVAL_HOURS", "24"))
+SCHEDULE_SPEEDUP = float(os.environ.get("SCHEDULE_SPEEDUP", "0.5"))
+SCHEDULE_BACKOFF = float(os.environ.get("SCHEDULE_BACKOFF", "1.5"))
+# Every run time is moved by up to this many seconds either way, so runs never line up exactly.
+SCHEDULE_JITTER_SECONDS = int(os.environ.get("SCHEDULE_JITTER_SECONDS", "600"))
+# Scheduled runs do not email on their own: their new jobs are held in the job store and the
+# leader sends everything held as one digest every DIGEST_INTERVAL_HOURS.
+DIGEST_INTERVAL_HOURS = float(os.environ.get("DIGEST_INTERVAL_HOURS", "12"))
+
+# --- Work queue and worker pool (shared/work_queue.py) ---
+# Durable queue of (source, term, page) units shared by every worker process. Workers on several
+# machines need this file on a shared disk whose file locking SQLite can rely on.
+WORK_QUEUE_PATH = os.environ.get("WORK_QUEUE_PATH", os.path.join(DATA_DIR, "queue.db"))
+# Threads per worker process claiming units (per-host concurrency and pacing are enforced across all of them).
+QUEUE_WORKER_THREADS = int(os.environ.get("QUEUE_WORKER_THREADS", "2"))
+# A claimed unit not finished within this many seconds (e.g. its worker crashed) is claimed again,
+# up to UNIT_MAX_ATTEMPTS times in all.
+UNIT_LEASE_SECONDS = float(os.environ.get("UNIT_LEASE_SECONDS", "300"))
+UNIT_MAX_ATTEMPTS = int(os.environ.get("UNIT_MAX_ATTEMPTS", "3"))
+# How long an idle worker, or a leader waiting for its run's units, sleeps before looking again.
+QUEUE_POLL_SECONDS = float(os.environ.get("QUEUE_POLL_SECONDS", "1"))
+# The leader (the one worker process that schedules runs and sends the digest) holds a lease this
+# long and renews it every third of it; a standby process takes over once it expires.
+LEADER_LEASE_SECONDS = float(os.environ.get("LEADER_LEASE_SECONDS", "60"))
+
+# --- Raw page archive (shared/page_archive.py) ---
+# Every fetched results page is kept gzip-compressed, stored once per distinct body, so pages can
+# be re-parsed offline after a selector fix: python -m shared.page_archive reparse
+ARCHIVE_PAGES = os.environ.get("JOB_BOT_ARCHIVE_PAGES", "1") != "0"
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", os.path.join(DATA_DIR, "archive"))
+# Archived pages older than this are forgotten, and bodies no page refers to any more are deleted.
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", "30"))
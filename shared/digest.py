@@ -0,0 +1,126 @@
+# shared/digest.py
+
+import html
+from itertools import groupby
+
+from shared import config
+
+_HTML_HEADER = "<h1>New Job Postings Found:</h1>"
+_TEXT_HEADER = "New Job Postings Found:\n\n"
+_OTHER_CATEGORY = "Other"
+
+
+class DigestBuilder:
+    """
+    Builds the job digest incrementally, as HTML and as a plain-text alternative.
+
+    Each job is rendered to its own fragments, and the fragments are joined once, so building
+    the email is linear in its size (no repeated string +=). Jobs are rendered when the digest
+    is, so sources merged into a job after it was added (its 'also_on' list, filled by
+    shared/near_duplicates.py) are listed in its entry.
+    Titles, links and descriptions are HTML-escaped in the HTML version.
+
+    Jobs scored by shared/scoring.py are grouped under their category (in config.JOB_CATEGORIES
+    order, uncategorized jobs last) and listed best score first within a group.
+    """
+
+    def __init__(self, description_chars=200):
+        self.description_chars = description_chars
+        self._jobs = []
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def add(self, job):
+        self._jobs.append(job)
+
+    def _render_job(self, job):
+        """Returns the (html, text) fragments of one job."""
+        title = job['title']
+        link = job.get('link')
+        description = job.get('description', '')[:self.description_chars]
+        also_on = job.get('also_on', ())
+
+        # Ensuring the link is present before creating the anchor tag
+        job_link_html = f"<a href='{html.escape(link, quote=True)}'>{html.escape(title)}</a>" if link else html.escape(title)
+        also_html = ""
+        also_text = ""
+        if also_on:
+            links = [
+                f"<a href='{html.escape(other['link'], quote=True)}'>{html.escape(other['platform'])}</a>"
+                if other.get('link') else html.escape(other['platform'])
+                for other in also_on
+            ]
+            also_html = f"<br>Also on: {', '.join(links)}"
+            also_text = "".join(f"  Also on {other['platform']}: {other.get('link') or ''}\n" for other in also_on)
+        return (
+            f"<li>{job_link_html}<br>{html.escape(description)}...{also_html}</li>",
+            f"* {title}\n  {link or ''}\n  {description}...\n{also_text}\n",
+        )
+
+    def _entries(self):
+        """Returns (category, html, text) per job, in digest order."""
+        order = {name: i for i, name in enumerate(config.JOB_CATEGORIES)}
+        jobs = sorted(self._jobs, key=lambda job: (order.get(job.get('category'), len(order)), -(job.get('relevance') or 0)))
+        return [(job.get('category'), *self._render_job(job)) for job in jobs]
+
+    @staticmethod
+    def _section_headings(category, grouped):
+        if not grouped:
+            return "", ""
+        name = category or _OTHER_CATEGORY
+        return f"<h2>{html.escape(name)}</h2>", f"== {name} ==\n\n"
+
+    def _join(self, entries, grouped):
+        """Renders entries to (html, text) bodies, with a heading per category if grouped."""
+        html_parts = [_HTML_HEADER]
+        text_parts = [_TEXT_HEADER]
+        for category, section in groupby(entries, key=lambda entry: entry[0]):
+            html_heading, text_heading = self._section_headings(category, grouped)
+            section = list(section)
+            html_parts.extend([html_heading, "<ul>", *(item for _, item, _ in section), "</ul>"])
+            text_parts.extend([text_heading, *(item for _, _, item in section)])
+        return "".join(html_parts), "".join(text_parts)
+
+    def subject(self):
+        return f"New Job Postings - {len(self._jobs)} jobs found!"
+
+    def render(self):
+        """Returns the full HTML body."""
+        entries = self._entries()
+        return self._join(entries, any(entry[0] for entry in entries))[0]
+
+    def render_text(self):
+        """Returns the full plain-text body."""
+        entries = self._entries()
+        return self._join(entries, any(entry[0] for entry in entries))[1]
+
+    def render_parts(self, max_bytes):
+        """
+        Splits the digest into (html, text) bodies whose combined UTF-8 size stays under max_bytes
+        (before transfer encoding). A single job larger than the cap still gets a part of its own.
+        A category split across parts gets its heading repeated.
+
+        Returns:
+            list: (html, text) tuples, at least one.
+        """
+        entries = self._entries()
+        grouped = any(entry[0] for entry in entries)
+        overhead = len((_HTML_HEADER + _TEXT_HEADER).encode("utf-8"))
+        parts = []
+        part, size = [], overhead
+
+        for entry in entries:
+            category, html_item, text_item = entry
+            item_size = len(html_item.encode("utf-8")) + len(text_item.encode("utf-8"))
+            section_size = len("".join(self._section_headings(category, grouped)).encode("utf-8")) + len("<ul></ul>")
+            opens_section = not part or part[-1][0] != category
+            if part and size + item_size + (section_size if opens_section else 0) > max_bytes:
+                parts.append(part)
+                part, size = [], overhead
+                opens_section = True
+            part.append(entry)
+            size += item_size + (section_size if opens_section else 0)
+        parts.append(part)
+
+        return [self._join(part, grouped) for part in parts]
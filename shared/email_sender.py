@@ -1,11 +1,214 @@
 import os
 import smtplib
+import time
+import uuid
+from email import message_from_string
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import getaddresses
 import logging
 
+from shared import config, metrics
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Errors after which the connection is assumed dead and worth one reconnect.
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+# Both body parts are base64-encoded: 3 bytes become 4 characters, in lines of 76 plus CRLF.
+# Headers and MIME boundaries take roughly this many bytes more per message.
+_MESSAGE_OVERHEAD = 2000
+
+
+def body_budget(max_bytes):
+    """Raw UTF-8 body bytes (HTML plus text) that fit a message of max_bytes once encoded."""
+    return max(1, (max_bytes - _MESSAGE_OVERHEAD) * 3 // 4 * 76 // 78)
+
+
+class Mailer:
+    """
+    Sends digest emails over a single authenticated SMTP connection.
+
+    The connection is opened lazily on the first send, kept for the whole run and re-opened
+    once if the server dropped it. Messages that still fail are written to an on-disk outbox
+    and retried by drain_outbox() on the next run. Use as a context manager so the connection
+    is closed at the end of the run.
+    """
+
+    def __init__(self, smtp_server=None, smtp_port=None, outbox_dir=None):
+        # Use environment variables for sensitive information (email credentials)
+        # RENDER_EMAIL_USER and RENDER_EMAIL_PASS should be set in Render environment variables
+        self.sender_email = os.environ.get("RENDER_EMAIL_USER")
+        self.sender_password = os.environ.get("RENDER_EMAIL_PASS")
+        self.smtp_server = smtp_server or config.SMTP_SERVER
+        self.smtp_port = smtp_port or config.SMTP_PORT
+        self.outbox_dir = outbox_dir or config.EMAIL_OUTBOX_DIR
+        self._server = None
+
+        if not self.sender_email or not self.sender_password:
+            logging.error("Email credentials (RENDER_EMAIL_USER, RENDER_EMAIL_PASS) are not set as environment variables. Email will not be sent.")
+            raise ValueError("Email credentials missing. Please set RENDER_EMAIL_USER and RENDER_EMAIL_PASS.")
+
+    def _connect(self):
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        try:
+            server.starttls()  # Secure the connection
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def _disconnect(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
+
+    def _deliver(self, recipients, message_string):
+        """Sends over the open connection, reconnecting once if the server dropped it."""
+        for attempt in (1, 2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.sendmail(self.sender_email, recipients, message_string)
+                return
+            except _CONNECTION_ERRORS:
+                self._server = None
+                if attempt == 2:
+                    raise
+                logging.warning("SMTP connection lost, reconnecting...")
+
+    def build_message(self, recipients, subject, body_html, body_text=None):
+        msg = MIMEMultipart("alternative")
+        msg["From"] = self.sender_email
+        msg["To"] = ", ".join(recipients)
+        msg["Subject"] = subject
+
+        # Plain text first: clients show the last alternative they can render.
+        if body_text is not None:
+            msg.attach(MIMEText(body_text, "plain", "utf-8"))
+        msg.attach(MIMEText(body_html, "html", "utf-8"))
+        return msg
+
+    def send(self, recipients, subject, body_html, body_text=None):
+        """
+        Sends one message. On failure the message is queued in the outbox.
+
+        Returns:
+            bool: True if delivered now, False if queued for a later run.
+        """
+        return self._send_message(recipients, self.build_message(recipients, subject, body_html, body_text).as_string())
+
+    def _send_message(self, recipients, message_string):
+        try:
+            logging.info(f"Attempting to send email to {', '.join(recipients)}...")
+            with metrics.timed("job_bot_email_send_seconds"):
+                self._deliver(recipients, message_string)
+            metrics.inc("job_bot_emails_total", {"result": "sent"})
+            logging.info("Email sent successfully!")
+            return True
+        except smtplib.SMTPAuthenticationError as e:
+            logging.error(f"SMTP Authentication Error: Check your email username and password (or App Password for Gmail). Error: {e}")
+            logging.error("If using Gmail, ensure 'Less secure app access' is ON (deprecated) or use an App Password.")
+        except (smtplib.SMTPException, OSError) as e:
+            logging.error(f"SMTP Error: Could not send email. Error: {e}", exc_info=True)
+        self._disconnect()
+        self.queue(message_string)
+        metrics.inc("job_bot_emails_total", {"result": "queued"})
+        return False
+
+    def build_digest_messages(self, recipients, digest, max_bytes=None):
+        """
+        Renders a DigestBuilder's content into as many messages as needed for each encoded message
+        to stay within max_bytes (config.EMAIL_MAX_BYTES by default). The body budget starts from
+        body_budget(); if a built message still comes out larger, the digest is split again with a
+        proportionally smaller budget. A single job larger than the cap still gets a message of its own.
+
+        Returns:
+            list: Message strings, ready to send.
+        """
+        max_bytes = max_bytes or config.EMAIL_MAX_BYTES
+        budget = body_budget(max_bytes)
+        subject = digest.subject()
+        for attempt in range(3):
+            parts = digest.render_parts(budget)
+            messages = [
+                self.build_message(recipients, subject if len(parts) == 1 else f"{subject} (part {i}/{len(parts)})", body_html, body_text).as_string()
+                for i, (body_html, body_text) in enumerate(parts, start=1)
+            ]
+            largest = max(len(message.encode("utf-8")) for message in messages)
+            if largest <= max_bytes or len(parts) >= len(digest):
+                break
+            budget = max(1, budget * max_bytes // largest - 1)
+        return messages
+
+    def send_digest(self, recipients, digest, max_bytes=None):
+        """
+        Sends a DigestBuilder's content, split into several messages when it exceeds max_bytes
+        (config.EMAIL_MAX_BYTES by default, measured on the encoded message, see build_digest_messages).
+        Each message carries an HTML and a plain-text part.
+
+        Returns:
+            int: Number of messages delivered now (the rest were queued).
+        """
+        delivered = 0
+        for message_string in self.build_digest_messages(recipients, digest, max_bytes):
+            if self._send_message(recipients, message_string):
+                delivered += 1
+        return delivered
+
+    def queue(self, message_string):
+        """Writes a message to the outbox directory for a later drain_outbox()."""
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        path = os.path.join(self.outbox_dir, f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.eml")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(message_string)
+        os.replace(path + ".tmp", path)
+        logging.warning(f"Email queued for retry at {path}")
+
+    def drain_outbox(self):
+        """
+        Re-sends queued messages, oldest first, deleting each once delivered.
+        Stops at the first failure so the remaining messages keep their order.
+
+        Returns:
+            int: Number of messages delivered.
+        """
+        if not os.path.isdir(self.outbox_dir):
+            return 0
+        names = sorted(name for name in os.listdir(self.outbox_dir) if name.endswith(".eml"))
+        delivered = 0
+        for name in names:
+            path = os.path.join(self.outbox_dir, name)
+            with open(path, encoding="utf-8") as f:
+                message_string = f.read()
+            recipients = [address for _, address in getaddresses([message_from_string(message_string)["To"] or ""])]
+            try:
+                self._deliver(recipients, message_string)
+            except (smtplib.SMTPException, OSError) as e:
+                logging.error(f"Could not deliver queued email {name}, will retry next run: {e}")
+                self._disconnect()
+                break
+            os.remove(path)
+            delivered += 1
+        if delivered:
+            logging.info(f"Delivered {delivered} queued email(s) from the outbox.")
+        return delivered
+
+    def close(self):
+        self._disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def send_email(recipients, subject, body_html):
     """
     Sends an email notification with job postings.
@@ -14,44 +217,12 @@ def send_email(recipients, subject, body_html):
         recipients (list): A list of email addresses to send the email to.
         subject (str): The subject line of the email.
         body_html (str): The HTML content of the email body.
-    """
-    # Use environment variables for sensitive information (email credentials)
-    # RENDER_EMAIL_USER and RENDER_EMAIL_PASS should be set in Render environment variables
-    sender_email = os.environ.get("RENDER_EMAIL_USER")
-    sender_password = os.environ.get("RENDER_EMAIL_PASS")
-    smtp_server = "smtp.gmail.com" # For Gmail. Change if using a different provider.
-    smtp_port = 587 # For TLS
-
-    if not sender_email or not sender_password:
-        logging.error("Email credentials (RENDER_EMAIL_USER, RENDER_EMAIL_PASS) are not set as environment variables. Email will not be sent.")
-        raise ValueError("Email credentials missing. Please set RENDER_EMAIL_USER and RENDER_EMAIL_PASS.")
-
-    msg = MIMEMultipart("alternative")
-    msg["From"] = sender_email
-    msg["To"] = ", ".join(recipients)
-    msg["Subject"] = subject
-
-    # Attach HTML part
-    part = MIMEText(body_html, "html")
-    msg.attach(part)
 
-    try:
-        logging.info(f"Attempting to send email to {', '.join(recipients)}...")
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()  # Secure the connection
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, recipients, msg.as_string())
-        logging.info("Email sent successfully!")
-    except smtplib.SMTPAuthenticationError as e:
-        logging.error(f"SMTP Authentication Error: Check your email username and password (or App Password for Gmail). Error: {e}")
-        logging.error("If using Gmail, ensure 'Less secure app access' is ON (deprecated) or use an App Password.")
-        raise
-    except smtplib.SMTPException as e:
-        logging.error(f"SMTP Error: Could not send email. Error: {e}", exc_info=True)
-        raise
-    except Exception as e:
-        logging.error(f"An unexpected error occurred while sending email: {e}", exc_info=True)
-        raise
+    Returns:
+        bool: True if delivered, False if the message was queued in the outbox for a later run.
+    """
+    with Mailer() as mailer:
+        return mailer.send(recipients, subject, body_html)
 
 # This part is typically for local testing, not used by Flask/Render directly
 if __name__ == '__main__':
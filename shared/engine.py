@@ -0,0 +1,257 @@
+# shared/engine.py
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+
+import requests
+
+from shared import config
+from shared.rate_limit import AdaptiveTokenBucket, CircuitBreaker, CircuitOpenError, THROTTLE_STATUSES, parse_retry_after
+from shared.sources.base import scrape_page
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# One (term, source, page) work unit and its outcome.
+# source is a shared.sources.base.SourceSpec; jobs is None when the unit failed.
+# dropped counts the page's cards rejected by their title while parsing (not in jobs).
+UnitResult = namedtuple("UnitResult", ["term", "source", "page_num", "jobs", "dropped"], defaults=(0,))
+
+
+class HostBudget:
+    """
+    Concurrency, pacing and health budget for a single host.
+
+    At most max_concurrency requests are in flight at once. Request starts are paced by an
+    AdaptiveTokenBucket that starts at the middle of delay_range (seconds between requests),
+    speeds up towards min_delay while the host answers normally and backs off on 429/503 and
+    Retry-After. A CircuitBreaker stops sending requests to a host that keeps failing, so a
+    broken source fails fast instead of costing a full delay per doomed request.
+    """
+
+    def __init__(self, host, max_concurrency=1, delay_range=(5, 10), min_delay=1.0, paced=True, state=None):
+        """
+        Args:
+            paced (bool): False disables waiting (recorded fixtures); the breaker still applies.
+            state (dict): Saved state from a previous run (see state()), to resume pace and breaker.
+        """
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.delay_range = delay_range
+        self.limiter = AdaptiveTokenBucket(sum(delay_range) / 2, min(min_delay, delay_range[0]), enabled=paced)
+        self.breaker = CircuitBreaker(host)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        if state:
+            self.restore(state)
+
+    @contextmanager
+    def slot(self, neutral_statuses=()):
+        """
+        Blocks until this host may be hit again, then holds one concurrency slot.
+        Raises CircuitOpenError at once if the host's breaker is open. The outcome of the request
+        made inside the block (an HTTPError, another RequestException, or success) feeds the
+        limiter and the breaker, except an HTTPError with one of neutral_statuses (e.g. 404 for a
+        removed listing), which says nothing about the host's health and is re-raised untouched.
+        """
+        self._semaphore.acquire()
+        try:
+            self.breaker.admit()
+            wait = self.limiter.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                yield
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code in neutral_statuses:
+                    self.breaker.released()
+                    raise
+                self._record_error(e.response)
+                raise
+            except requests.exceptions.RequestException:
+                self.breaker.failed()
+                raise
+            except Exception:
+                # The request itself went through (e.g. the page failed to parse).
+                self._record_success()
+                raise
+            except BaseException:
+                self.breaker.released()
+                raise
+            self._record_success()
+        finally:
+            self._semaphore.release()
+
+    def _record_success(self):
+        self.limiter.healthy()
+        self.breaker.succeeded()
+
+    def _record_error(self, response):
+        if response is None:
+            self.breaker.failed()
+            return
+        if response.status_code in THROTTLE_STATUSES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > config.RETRY_AFTER_MAX_WAIT:
+                # Too long to wait out within the run: stop asking until then.
+                self.limiter.throttled()
+                self.breaker.failed(open_for=retry_after)
+                return
+            self.limiter.throttled(retry_after)
+        self.breaker.failed()
+
+    def state(self):
+        """Pace and breaker state to save for the next run."""
+        return {
+            "interval": self.limiter.interval,
+            "failures": self.breaker.failures,
+            "open_until": self.breaker.open_until,
+            "cooldown": self.breaker.cooldown,
+        }
+
+    def restore(self, state):
+        self.limiter.interval = max(self.limiter.min_interval, min(state["interval"], config.RATE_LIMIT_MAX_DELAY))
+        self.breaker.failures = state["failures"]
+        self.breaker.open_until = state["open_until"]
+        self.breaker.cooldown = state["cooldown"]
+
+
+class CrawlPlan:
+    """
+    Decides what the engine fetches. The default plan crawls every term on every source
+    and follows pagination up to the source's max_pages.
+    Hooks are always called from the engine's coordinating thread, never concurrently.
+    """
+
+    def queries_for(self, source, terms):
+        """Returns the search queries to run against source, in order."""
+        return list(terms)
+
+    def should_fetch_next(self, source, query, page_num, jobs):
+        """
+        Called after a page succeeded; returns True to schedule page_num + 1.
+        jobs holds every listing on the page, including cards dropped while parsing.
+        """
+        return page_num < source.max_pages
+
+
+class ScrapeEngine:
+    """
+    Runs (term, source, page) work units concurrently.
+
+    Every host gets its own HostBudget and its own thread pool sized to that budget,
+    so a slow or heavily throttled host never occupies threads another host could use.
+    Pages of one (term, source) pair are chained: page N+1 is only scheduled after page N
+    succeeded and the CrawlPlan asks for it, which keeps the old "stop paginating on error" behaviour.
+    """
+
+    def __init__(self, sources, plan=None, host_states=None):
+        """
+        Args:
+            sources (list): SourceSpec entries to crawl; their politeness fields set the host budgets.
+            plan (CrawlPlan): Optional plan deciding queries and pagination; defaults to CrawlPlan().
+            host_states (dict): Optional {host: state} saved by a previous run (see host_states()),
+                so learned pacing and open circuit breakers carry over between runs.
+        """
+        self.sources = list(sources)
+        self.plan = plan or CrawlPlan()
+        self.budgets = {}
+        host_states = host_states or {}
+        for source in self.sources:
+            if source.host not in self.budgets:
+                self.budgets[source.host] = HostBudget(
+                    source.host, source.max_concurrency, source.delay_range, source.min_delay,
+                    paced=config.POLITENESS_DELAYS, state=host_states.get(source.host),
+                )
+        # (source name, query) -> submission order, used by scrape_all for a stable result order.
+        self._unit_order = {}
+
+    def _run_unit(self, source, term, page_num):
+        budget = self.budgets[source.host]
+        for attempt in range(config.THROTTLE_RETRIES + 1):
+            try:
+                listings = []
+                with budget.slot():
+                    jobs = scrape_page(source, term, page_num, listings)
+                return jobs, listings
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if attempt == config.THROTTLE_RETRIES or status not in THROTTLE_STATUSES:
+                    raise
+                logging.info(f"    {source.host} answered {status}; retrying '{term}' page {page_num} after backing off.")
+
+    def host_states(self):
+        """Returns {host: state} of every host budget, for the next run's ScrapeEngine."""
+        return {host: budget.state() for host, budget in self.budgets.items()}
+
+    def iter_units(self, terms):
+        """
+        Crawls the plan's queries on every source and yields a UnitResult per page as soon as it finishes.
+        Results arrive in completion order, not in term order.
+        """
+        executors = {
+            host: ThreadPoolExecutor(max_workers=budget.max_concurrency, thread_name_prefix=f"scrape-{host}")
+            for host, budget in self.budgets.items()
+        }
+        pending = {}
+        self._unit_order = {}
+
+        def submit(source, term, page_num):
+            future = executors[source.host].submit(self._run_unit, source, term, page_num)
+            pending[future] = (source, term, page_num)
+
+        try:
+            terms = list(terms)
+            queries = [self.plan.queries_for(source, terms) for source in self.sources]
+
+            # Interleave hosts so every pool starts working immediately.
+            for i in range(max((len(q) for q in queries), default=0)):
+                for source, source_queries in zip(self.sources, queries):
+                    if i < len(source_queries):
+                        self._unit_order[(source.name, source_queries[i])] = len(self._unit_order)
+                        submit(source, source_queries[i], 1)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, term, page_num = pending.pop(future)
+                    try:
+                        jobs, listings = future.result()
+                    except CircuitOpenError:
+                        logging.debug(f"  Skipped {source.name} for '{term}' on page {page_num}: circuit breaker open.")
+                        yield UnitResult(term, source, page_num, None)
+                        continue
+                    except requests.exceptions.RequestException as e:
+                        logging.error(f"  Network error scraping {source.name} for '{term}' on page {page_num}: {e}")
+                        yield UnitResult(term, source, page_num, None)
+                        continue
+                    except Exception as e:
+                        logging.error(f"  Parsing or unexpected error for {source.name} '{term}' on page {page_num}: {e}", exc_info=True)
+                        yield UnitResult(term, source, page_num, None)
+                        continue
+
+                    dropped = len(listings) - len(jobs)
+                    logging.info(f"    Found {len(listings)} raw jobs from {source.name} for '{term}' (page {page_num}), {dropped} dropped by title")
+                    if self.plan.should_fetch_next(source, term, page_num, listings):
+                        submit(source, term, page_num + 1)
+                    yield UnitResult(term, source, page_num, jobs, dropped)
+        finally:
+            for future in pending:
+                future.cancel()
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+    def scrape_all(self, terms):
+        """
+        Crawls every term on every source and returns all jobs in a stable order
+        (query order, then source order, then page order), regardless of completion order.
+        """
+        results = [r for r in self.iter_units(terms) if r.jobs]
+        results.sort(key=lambda r: (self._unit_order[(r.source.name, r.term)], r.page_num))
+
+        all_jobs = []
+        for result in results:
+            all_jobs.extend(result.jobs)
+        return all_jobs
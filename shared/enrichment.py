@@ -0,0 +1,254 @@
+# shared/enrichment.py
+
+import logging
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from bs4 import BeautifulSoup
+
+from shared import config, http_client, job_store, metrics
+from shared.parsing import HTML_PARSER, declared_encoding
+from shared.rate_limit import CircuitOpenError
+from shared.utils import generate_job_id, is_plausible_job
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Detail descriptions by listing URL. An empty description is cached too (the listing is gone or
+# its page has no description block), so such pages are not fetched again until they expire.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    url          TEXT PRIMARY KEY,
+    description  TEXT NOT NULL,
+    fetched_at   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_details_fetched_at ON details(fetched_at);
+"""
+
+# Detail pages answering with these statuses belong to removed listings, not to a failing host.
+_GONE_STATUSES = (404, 410)
+
+
+def connect(path=None):
+    """Opens the detail-page cache."""
+    path = path or config.DETAIL_CACHE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL") # A lost cache entry only costs a refetch
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def extract_description(spec, content, encoding=None):
+    """Returns the text of the first of spec.detail_selectors found on a detail page, or ''."""
+    soup = BeautifulSoup(content, HTML_PARSER, from_encoding=encoding)
+    for selector in spec.detail_selectors:
+        tag = selector.find(soup)
+        if tag:
+            return tag.get_text(" ", strip=True)
+    return ""
+
+
+def fetch_description(spec, budget, url):
+    """
+    Fetches a listing's detail page within its host's budget (pacing and circuit breaker,
+    see shared/engine.HostBudget) and returns its description ('' if the listing is gone).
+    Network errors are raised.
+    """
+    try:
+        # A removed listing is neither a success nor a failure of the host: it must not speed up
+        # the pace or reset the breaker's failure count.
+        with budget.slot(neutral_statuses=_GONE_STATUSES):
+            response = http_client.fetch(url)
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code in _GONE_STATUSES:
+            return ""
+        raise
+    return extract_description(spec, response.content, declared_encoding(response))
+
+
+class Enricher:
+    """
+    Pipeline stage that replaces a job's short card text with the description from its detail page.
+
+    Only jobs of sources with detail_selectors are considered, and only if they pass the cheap
+    title-and-snippet prefilter (utils.is_plausible_job). Detail pages are fetched on per-host
+    thread pools sized to the engine's host budgets, sharing their pacing and circuit breakers
+    with the results-page crawl. Descriptions are cached by URL for DETAIL_CACHE_TTL_HOURS, so
+    a listing seen again under another term or in a later run is not fetched twice. Nor is a
+    listing already in the job store once its description has expired: an earlier run has
+    handled it, and the job store will drop it as known.
+    Jobs whose page cannot be fetched pass through with their card text.
+    """
+
+    def __init__(self, engine, path=None, now=None, max_fetches=None, max_pending=None, job_store_path=None):
+        """
+        Args:
+            engine (ScrapeEngine): The run's engine; its sources and host budgets are used.
+            path (str): Cache database path; defaults to config.DETAIL_CACHE_PATH.
+            job_store_path (str): Job store path; defaults to config.JOB_STORE_PATH.
+            max_fetches (int): Detail pages fetched at most in this run (config.ENRICH_MAX_FETCHES).
+            max_pending (int): Jobs waiting for their detail page at most (config.ENRICH_MAX_PENDING).
+        """
+        self.now = int(now if now is not None else time.time())
+        self.max_fetches = max_fetches if max_fetches is not None else config.ENRICH_MAX_FETCHES
+        self.max_pending = max(1, max_pending if max_pending is not None else config.ENRICH_MAX_PENDING)
+        self.stats = Counter()
+        self._budgets = engine.budgets
+        self._specs = {spec.platform: spec for spec in engine.sources if spec.detail_selectors}
+        self._ttl = config.DETAIL_CACHE_TTL_HOURS * 60 * 60
+        self._executors = {}
+        self._conn = connect(path)
+        try:
+            self._job_store = job_store.connect(job_store_path)
+        except sqlite3.Error as e:
+            logging.error(f"Job store unavailable, fetching the detail pages of known jobs too: {e}", exc_info=True)
+            self._job_store = None
+
+    def _count(self, spec, result):
+        self.stats[result] += 1
+        metrics.inc("job_bot_detail_lookups_total", {"source": spec.name, "result": result})
+
+    def _cached(self, url):
+        row = self._conn.execute(
+            "SELECT description FROM details WHERE url = ? AND fetched_at >= ?", (url, self.now - self._ttl)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _is_known(self, job):
+        if self._job_store is None:
+            return False
+        row = self._job_store.execute("SELECT 1 FROM jobs WHERE job_id = ?", (generate_job_id(job),)).fetchone()
+        return row is not None
+
+    def _store(self, url, description):
+        with self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO details (url, description, fetched_at) VALUES (?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET description = excluded.description, fetched_at = excluded.fetched_at
+                """,
+                (url, description, int(time.time())),
+            )
+
+    def _submit(self, spec, url):
+        executor = self._executors.get(spec.host)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=self._budgets[spec.host].max_concurrency, thread_name_prefix=f"enrich-{spec.host}"
+            )
+            self._executors[spec.host] = executor
+        return executor.submit(fetch_description, spec, self._budgets[spec.host], url)
+
+    @staticmethod
+    def _apply(job, description):
+        if len(description) > len(job.get("description", "")):
+            return {**job, "description": description}
+        return job
+
+    def _finish(self, future, spec, job):
+        try:
+            description = future.result()
+        except CircuitOpenError:
+            self._count(spec, "skipped")
+            return job
+        except requests.exceptions.RequestException as e:
+            self._count(spec, "failed")
+            logging.warning(f"  Could not fetch the detail page of {job['link']}: {e}")
+            return job
+        except Exception as e:
+            self._count(spec, "failed")
+            logging.error(f"  Parsing or unexpected error on the detail page of {job['link']}: {e}", exc_info=True)
+            return job
+
+        self._count(spec, "fetched" if description else "empty")
+        try:
+            self._store(job["link"], description)
+        except sqlite3.Error as e:
+            logging.error(f"Detail cache write failed: {e}", exc_info=True)
+        return self._apply(job, description)
+
+    def iter_enriched(self, jobs):
+        """
+        Lazily yields every job of an iterable, enriched where possible. Jobs that need no fetch
+        are yielded at once; the others as soon as their page arrives, so the order may change.
+        """
+        pending = {}
+
+        def finished(block):
+            if block:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            else:
+                done = [future for future in pending if future.done()]
+            for future in done:
+                spec, job = pending.pop(future)
+                yield self._finish(future, spec, job)
+
+        try:
+            for job in jobs:
+                spec = self._specs.get(job.get("platform"))
+                url = job.get("link")
+                if spec is None or not url:
+                    yield job
+                    continue
+                if not is_plausible_job(job.get("title", ""), job.get("description", "")):
+                    self._count(spec, "prefiltered")
+                    yield job
+                    continue
+
+                description = self._cached(url)
+                if description is not None:
+                    self._count(spec, "cached")
+                    yield self._apply(job, description)
+                elif self._is_known(job):
+                    self._count(spec, "known")
+                    yield job
+                elif self.stats["submitted"] >= self.max_fetches:
+                    self._count(spec, "over_budget")
+                    yield job
+                else:
+                    self.stats["submitted"] += 1
+                    pending[self._submit(spec, url)] = (spec, job)
+
+                yield from finished(block=False)
+                while len(pending) >= self.max_pending:
+                    yield from finished(block=True)
+
+            while pending:
+                yield from finished(block=True)
+        finally:
+            for future in pending:
+                future.cancel()
+            for executor in self._executors.values():
+                executor.shutdown(wait=True)
+            self._executors = {}
+
+    def close(self):
+        """Drops expired cache entries and closes the cache."""
+        if self._job_store is not None:
+            self._job_store.close()
+            self._job_store = None
+        if self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.execute("DELETE FROM details WHERE fetched_at < ?", (self.now - self._ttl,))
+        except sqlite3.Error as e:
+            logging.error(f"Failed to prune the detail cache: {e}", exc_info=True)
+        finally:
+            self._conn.close()
+            self._conn = None
+        logging.info(f"Detail enrichment: {dict(self.stats)}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,122 @@
+# shared/http_client.py
+
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Browser-like headers shared by every source. The Referer is filled in per host.
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Accept-Language': 'en-US,en;q=0.9,he;q=0.8',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'DNT': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1',
+    'sec-ch-ua': '"Not/A)Brand";v="8", "Chromium";v="126", "Google Chrome";v="126"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+}
+
+# (connect, read) timeout in seconds used for every request unless a caller overrides it.
+DEFAULT_TIMEOUT = (10, 30)
+
+# Connections kept alive per host. The engine never runs more than a few requests
+# against one host at once, so a small pool is enough to make every request reuse a socket.
+POOL_MAXSIZE = 4
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Optional record/replay hooks, installed by shared/replay.py.
+# _recorder.record(url, response) is called for every response; _url_rewriter(url) maps a
+# real URL to the one actually requested (e.g. a local fixture server).
+_recorder = None
+_url_rewriter = None
+
+
+def _build_session(host):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers['Referer'] = f"https://{host}/" # Mimic coming from the main page
+
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(host):
+    """
+    Returns the pooled keep-alive Session for a host, creating it on first use.
+    One Session per host means DNS, TCP connect and the TLS handshake are paid once per
+    connection instead of once per request.
+    """
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session(host)
+                _sessions[host] = session
+    return session
+
+
+def fetch(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """
+    GETs a URL through its host's pooled Session and raises for HTTP error statuses.
+
+    Args:
+        url (str): Absolute URL to fetch.
+        timeout: Requests-style timeout; defaults to DEFAULT_TIMEOUT.
+        **kwargs: Passed through to Session.get (e.g. extra headers or params).
+
+    Returns:
+        requests.Response: The successful response.
+    """
+    host = urlsplit(url).netloc
+    request_url = _url_rewriter(url) if _url_rewriter else url
+    labels = {"host": host}
+    try:
+        with metrics.timed("job_bot_http_fetch_seconds", labels):
+            response = get_session(host).get(request_url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException:
+        metrics.inc("job_bot_http_requests_total", {**labels, "status": "error"})
+        raise
+    metrics.inc("job_bot_http_requests_total", {**labels, "status": response.status_code})
+    metrics.inc("job_bot_http_response_bytes_total", labels, len(response.content))
+    if _recorder is not None:
+        _recorder.record(url, response)
+    response.raise_for_status()
+    return response
+
+
+def set_recorder(recorder):
+    """Installs (or, with None, removes) the object whose record(url, response) sees every response."""
+    global _recorder
+    _recorder = recorder
+
+
+def set_url_rewriter(rewriter):
+    """Installs (or, with None, removes) a function mapping real URLs to the URLs actually fetched."""
+    global _url_rewriter
+    _url_rewriter = rewriter
+
+
+def close_sessions():
+    """Closes every pooled Session (and its sockets). Safe to call more than once."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
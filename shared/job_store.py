@@ -0,0 +1,366 @@
+# shared/job_store.py
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from shared import config, search_index
+from shared.utils import generate_job_id
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# SQLite caps the number of bound parameters per statement; stay well below it.
+_QUERY_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    platform    TEXT NOT NULL,
+    title       TEXT NOT NULL,
+    link        TEXT,
+    description TEXT,
+    first_seen  INTEGER NOT NULL,
+    last_seen   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_first_seen ON jobs(first_seen);
+CREATE INDEX IF NOT EXISTS idx_jobs_last_seen ON jobs(last_seen);
+CREATE TABLE IF NOT EXISTS pending_digest (
+    job_id      TEXT PRIMARY KEY,
+    job         TEXT NOT NULL,
+    added_at    INTEGER NOT NULL
+);
+"""
+
+
+def connect(path=None):
+    """
+    Opens the job store, creating the database file and schema on first use.
+    Timestamps are stored as Unix epoch seconds. The store is in WAL mode so the web app can
+    search it (shared/search_index.py) while a run is recording jobs.
+    """
+    path = path or config.JOB_STORE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # auto_vacuum must be set before the first table is created to take effect.
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(_SCHEMA)
+    search_index.install(conn)
+    return conn
+
+
+def _known_ids(conn, job_ids):
+    known_ids = set()
+    for i in range(0, len(job_ids), _QUERY_CHUNK_SIZE):
+        chunk = job_ids[i:i + _QUERY_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT job_id FROM jobs WHERE job_id IN ({placeholders})", chunk)
+        known_ids.update(row["job_id"] for row in rows)
+    return known_ids
+
+
+def known_job_ids(job_ids, path=None):
+    """Returns the subset of job_ids already in the store."""
+    conn = connect(path)
+    try:
+        return _known_ids(conn, list(job_ids))
+    finally:
+        conn.close()
+
+
+def record_jobs(jobs, path=None, now=None):
+    """
+    Records a run's jobs in the store and returns only those never seen before.
+
+    Known jobs get their last_seen bumped, new jobs are inserted with first_seen = last_seen = now.
+    Everything happens in a single transaction. Duplicates within the batch are collapsed.
+
+    Args:
+        jobs (list): Job dicts with 'platform', 'title', 'link' and 'description' keys.
+        path (str): Optional database path, defaults to config.JOB_STORE_PATH.
+        now (int): Optional epoch timestamp for the run, defaults to the current time.
+
+    Returns:
+        list: The jobs whose ID was not in the store before this call, in input order.
+    """
+    now = int(now if now is not None else time.time())
+
+    batch = {}
+    for job in jobs:
+        batch.setdefault(generate_job_id(job), job)
+    if not batch:
+        return []
+
+    conn = connect(path)
+    try:
+        with conn: # Commits on success, rolls back on error
+            known_ids = _known_ids(conn, list(batch))
+
+            conn.executemany(
+                """
+                INSERT INTO jobs (job_id, platform, title, link, description, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET last_seen = excluded.last_seen
+                """,
+                [
+                    (job_id, job["platform"], job["title"], job.get("link"), job.get("description", ""), now, now)
+                    for job_id, job in batch.items()
+                ],
+            )
+    finally:
+        conn.close()
+
+    new_jobs = [job for job_id, job in batch.items() if job_id not in known_ids]
+    logging.info(f"Job store: {len(batch)} unique jobs this run, {len(new_jobs)} not seen before.")
+    return new_jobs
+
+
+def merge_jobs(sightings, path=None, hold_new=False):
+    """
+    Records jobs seen at given times, e.g. re-parsed from archived pages (shared/page_archive.py).
+    A job's first_seen and last_seen only ever widen to cover the sightings, so merging into
+    a store that already knows the job, or in any order, is safe.
+
+    Args:
+        sightings (iterable): (job dict, first_seen, last_seen) tuples, times in epoch seconds.
+        hold_new (bool): Also hold the jobs the store did not know for the next digest (see
+            add_pending), in the same transaction, so they are never marked seen without being held.
+
+    Returns:
+        list: IDs of the merged jobs the store did not know before.
+    """
+    jobs = {generate_job_id(job): (job, int(first), int(last)) for job, first, last in sightings}
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE") # Nothing may record these jobs between the lookup and the merge
+            known = _known_ids(conn, list(jobs))
+            conn.executemany(
+                """
+                INSERT INTO jobs (job_id, platform, title, link, description, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET first_seen = MIN(first_seen, excluded.first_seen),
+                    last_seen = MAX(last_seen, excluded.last_seen)
+                """,
+                [
+                    (job_id, job["platform"], job["title"], job.get("link"), job.get("description", ""), first, last)
+                    for job_id, (job, first, last) in jobs.items()
+                ],
+            )
+            new_ids = [job_id for job_id in jobs if job_id not in known]
+            if hold_new:
+                _hold(conn, [jobs[job_id][0] for job_id in new_ids], int(time.time()))
+    finally:
+        conn.close()
+    return new_ids
+
+
+class JobRecorder:
+    """
+    Streaming counterpart of record_jobs, for pipelines that see one job at a time.
+
+    Lookups read the store directly; upserts are buffered and written in short transactions of
+    config.JOB_STORE_BATCH_SIZE jobs (and by close()), so the store's write lock is never held
+    while the crawl is waiting for pages and other writers (pruning, page re-parsing, another
+    process) get in between batches. If the store fails mid-run, the error is logged, the
+    unwritten batch is dropped and every remaining job is treated as new, so a broken store
+    never stops the digest from going out.
+
+    The batch that marks new jobs as seen also holds them for the digest (see add_pending), so
+    a run that aborts after some batches were written does not lose those jobs: a later digest
+    sends them. A run that finishes replaces these provisional entries (held_ids) with its final,
+    near-duplicate-collapsed jobs.
+    """
+
+    def __init__(self, path=None, now=None, batch_size=None):
+        self.now = int(now if now is not None else time.time())
+        self.batch_size = batch_size or config.JOB_STORE_BATCH_SIZE
+        self.seen = 0
+        self.new = 0
+        self.held_ids = [] # IDs of the new jobs written to the pending digest so far
+        self._pending = {} # job ID -> upsert row, not written yet
+        self._new_jobs = {} # job ID -> job, for the new jobs among them
+        self._conn = connect(path)
+
+    def is_new(self, job):
+        """Records one job and returns True if its ID was not in the store before."""
+        self.seen += 1
+        if self._conn is None:
+            self.new += 1
+            return True
+
+        job_id = generate_job_id(job)
+        try:
+            known = job_id in self._pending or self._conn.execute(
+                "SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone() is not None
+            self._pending[job_id] = (job_id, job["platform"], job["title"], job.get("link"), job.get("description", ""), self.now, self.now)
+            if not known:
+                self._new_jobs[job_id] = job
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+        except sqlite3.Error as e:
+            logging.error(f"Job store failed mid-run, treating remaining jobs as new: {e}", exc_info=True)
+            self._abort()
+            known = False
+
+        if not known:
+            self.new += 1
+        return not known
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self._conn: # One short write transaction per batch
+            self._conn.executemany(
+                """
+                INSERT INTO jobs (job_id, platform, title, link, description, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET last_seen = excluded.last_seen
+                """,
+                list(self._pending.values()),
+            )
+            _hold(self._conn, self._new_jobs.values(), self.now)
+        self.held_ids.extend(self._new_jobs)
+        self._pending = {}
+        self._new_jobs = {}
+
+    def iter_new(self, jobs):
+        """Lazily yields the jobs from an iterable that the store has not seen before."""
+        for job in jobs:
+            if self.is_new(job):
+                yield job
+
+    def _abort(self):
+        self._pending = {}
+        self._new_jobs = {}
+        try:
+            self._conn.rollback()
+        finally:
+            self._conn.close()
+            self._conn = None
+
+    def close(self, commit=True):
+        """Writes the last batch (or drops it, if commit is False; earlier batches are already written and their new jobs held)."""
+        if self._conn is None:
+            return
+        try:
+            if commit:
+                self._flush()
+        except sqlite3.Error as e:
+            logging.error(f"Job store failed writing the last batch: {e}", exc_info=True)
+        finally:
+            self._pending = {}
+            self._new_jobs = {}
+            self._conn.close()
+            self._conn = None
+        logging.info(f"Job store: {self.seen} jobs recorded this run, {self.new} not seen before.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+def _hold(conn, jobs, now):
+    """Writes jobs to the pending digest, in the caller's transaction. Returns the number held."""
+    rows = [(generate_job_id(job), json.dumps(job, ensure_ascii=False), now) for job in jobs]
+    conn.executemany(
+        """
+        INSERT INTO pending_digest (job_id, job, added_at) VALUES (?, ?, ?)
+        ON CONFLICT(job_id) DO UPDATE SET job = excluded.job
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+def _release(conn, job_ids):
+    job_ids = list(job_ids)
+    for i in range(0, len(job_ids), _QUERY_CHUNK_SIZE):
+        chunk = job_ids[i:i + _QUERY_CHUNK_SIZE]
+        conn.execute(f"DELETE FROM pending_digest WHERE job_id IN ({','.join('?' * len(chunk))})", chunk)
+
+
+def add_pending(jobs, path=None, now=None, replacing=()):
+    """
+    Holds new jobs for the next digest instead of emailing them right away: the next periodic digest
+    (scraper.send_pending_digest) or the next run that emails one. A job already held is replaced
+    by its latest version.
+
+    Args:
+        jobs (list): Job dicts, as they would be added to a DigestBuilder.
+        replacing (iterable): IDs of held jobs to release in the same transaction, e.g. the
+            provisional entries a JobRecorder wrote for the run whose final jobs these are.
+
+    Returns:
+        int: Number of jobs held.
+    """
+    now = int(now if now is not None else time.time())
+    conn = connect(path)
+    try:
+        with conn:
+            _release(conn, replacing)
+            return _hold(conn, jobs, now)
+    finally:
+        conn.close()
+
+
+def pending_jobs(path=None):
+    """Returns the jobs held for the next digest as {job ID: job dict}, oldest first."""
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT job_id, job FROM pending_digest ORDER BY added_at, rowid").fetchall()
+    finally:
+        conn.close()
+    return {row["job_id"]: json.loads(row["job"]) for row in rows}
+
+
+def remove_pending(job_ids, path=None):
+    """Releases held jobs once their digest has been sent (or queued in the email outbox)."""
+    conn = connect(path)
+    try:
+        with conn:
+            _release(conn, job_ids)
+    finally:
+        conn.close()
+
+
+def prune(retention_days=None, path=None, now=None):
+    """
+    Applies the retention policy: deletes jobs not seen for retention_days and
+    returns the freed pages to the filesystem with an incremental vacuum.
+
+    Returns:
+        int: Number of jobs deleted.
+    """
+    retention_days = retention_days if retention_days is not None else config.JOB_RETENTION_DAYS
+    now = int(now if now is not None else time.time())
+    cutoff = now - retention_days * 24 * 60 * 60
+
+    conn = connect(path)
+    try:
+        with conn:
+            deleted = conn.execute("DELETE FROM jobs WHERE last_seen < ?", (cutoff,)).rowcount
+        if deleted:
+            conn.execute("PRAGMA incremental_vacuum")
+            logging.info(f"Job store: pruned {deleted} jobs not seen in the last {retention_days} days.")
+    finally:
+        conn.close()
+    return deleted
+
+
+def search_jobs(query=None, platform=None, since=None, until=None, cursor=None, limit=search_index.DEFAULT_PAGE_SIZE, path=None):
+    """Full-text search over stored jobs; see search_index.search for the arguments."""
+    conn = connect(path)
+    try:
+        return search_index.search(conn, query, platform, since, until, cursor, limit)
+    finally:
+        conn.close()
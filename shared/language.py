@@ -0,0 +1,110 @@
+# shared/language.py
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from langdetect import detect, DetectorFactory
+from langdetect.lang_detect_exception import LangDetectException
+
+from shared import metrics
+
+# Ensures consistent language detection results
+DetectorFactory.seed = 0
+
+# Fast path thresholds. Text whose letters are at least this share Hebrew (or plain ASCII Latin)
+# is classified from script statistics alone; anything in between goes to langdetect.
+SCRIPT_RATIO_THRESHOLD = 0.9
+# Below this many letters the ratio is too noisy to trust.
+MIN_LETTERS = 10
+
+# Latin-script text is only called English without langdetect if it also uses an English function word,
+# so French/Spanish/German listings written in plain ASCII still get a real detection.
+_ENGLISH_FUNCTION_WORDS = re.compile(
+    r"\b(?:the|and|for|with|to|of|in|is|are|we|you|our|your|a|an|on|this|that|will|be|looking|need)\b"
+)
+
+CACHE_MAXSIZE = 4096
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"calls": 0, "fast_path": 0, "cache_hits": 0, "langdetect": 0}
+
+
+def _script_guess(text):
+    """Returns 'he' or 'en' when the script statistics are unambiguous, else None."""
+    hebrew = latin = other = 0
+    ascii_only = True
+    for ch in text:
+        if not ch.isalpha():
+            continue
+        if "\u0590" <= ch <= "\u05ff": # Hebrew block
+            hebrew += 1
+        elif ch <= "\u024f": # Basic Latin through Latin Extended-B
+            latin += 1
+            if ch > "\x7f":
+                ascii_only = False
+        else:
+            other += 1
+
+    letters = hebrew + latin + other
+    if letters < MIN_LETTERS:
+        return None
+    if hebrew / letters >= SCRIPT_RATIO_THRESHOLD:
+        return "he"
+    if latin / letters >= SCRIPT_RATIO_THRESHOLD and ascii_only and _ENGLISH_FUNCTION_WORDS.search(text.lower()):
+        return "en"
+    return None
+
+
+def detect_language(text):
+    """
+    Classifies text as a language code ('en', 'he', ...), or returns None if it cannot be determined.
+
+    Clear-cut Hebrew or English text is answered from Unicode script statistics. Only ambiguous
+    text is passed to langdetect, and its results are kept in an LRU cache keyed by a hash of the
+    text, so the same listing seen under several search terms is detected once.
+    """
+    with _lock:
+        _stats["calls"] += 1
+
+    guess = _script_guess(text)
+    if guess is not None:
+        with _lock:
+            _stats["fast_path"] += 1
+        return guess
+
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats["cache_hits"] += 1
+            return _cache[key]
+
+    try:
+        with metrics.timed("job_bot_langdetect_seconds_total"):
+            result = detect(text)
+    except LangDetectException:
+        result = None # Text too short/weird to detect
+    metrics.inc("job_bot_langdetect_calls_total")
+
+    with _lock:
+        _stats["langdetect"] += 1
+        _cache[key] = result
+        if len(_cache) > CACHE_MAXSIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def get_stats():
+    """Returns a copy of the classification counters (calls, fast_path, cache_hits, langdetect)."""
+    with _lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    """Zeroes the classification counters. The result cache is kept."""
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,228 @@
+# shared/metrics.py
+
+"""
+Process-wide counters and histograms for the scraping pipeline, rendered in the Prometheus text format.
+
+The pipeline calls inc()/observe()/timed() as it works. A run's own numbers are the difference
+between two snapshot()s; shared/status_store.py saves that difference with the run and adds it
+to cumulative totals, which web/app.py serves at /metrics for every process's runs.
+
+Work done for another process's run (a unit crawled by a queue worker, shared/work_queue.py) is
+recorded under captured() and handed to that process, which add()s it to its own registry.
+"""
+
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_PARSE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+_EMAIL_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30)
+
+_LE_PATTERN = re.compile(r'(?:^|,)le="([^"]*)"')
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+GAUGE = "gauge"
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "job_bot_http_requests_total": (COUNTER, "HTTP requests to job sites, by host and status code ('error' if no response).", None),
+    "job_bot_http_fetch_seconds": (HISTOGRAM, "Latency of HTTP requests to job sites, by host.", _FETCH_BUCKETS),
+    "job_bot_http_response_bytes_total": (COUNTER, "Response body bytes (decompressed) downloaded from job sites, by host.", None),
+    "job_bot_requests_rejected_total": (COUNTER, "Requests not sent because the host's circuit breaker was open, by host.", None),
+    "job_bot_circuit_opened_total": (COUNTER, "Times a host's circuit breaker opened, by host.", None),
+    "job_bot_parse_seconds": (HISTOGRAM, "Time to parse one results page, by source.", _PARSE_BUCKETS),
+    "job_bot_pages_parsed_total": (COUNTER, "Results pages parsed, by source.", None),
+    "job_bot_cards_dropped_total": (COUNTER, "Cards dropped while parsing because their title failed a relevance rule, by source and rule.", None),
+    "job_bot_empty_pages_total": (COUNTER, "Results pages where no card selector matched, by source.", None),
+    "job_bot_cards_found_total": (COUNTER, "Job cards found on results pages, by source.", None),
+    "job_bot_detail_lookups_total": (COUNTER, "Detail-page lookups by the enrichment stage, by source and result.", None),
+    "job_bot_scoring_seconds_total": (COUNTER, "Time spent scoring jobs against the job categories.", None),
+    "job_bot_filter_seconds_total": (COUNTER, "Time spent in the relevance filter.", None),
+    "job_bot_filter_decisions_total": (COUNTER, "Relevance filter decisions, by deciding rule ('relevant' for kept jobs).", None),
+    "job_bot_langdetect_seconds_total": (COUNTER, "Time spent in langdetect (fast-path and cached answers excluded).", None),
+    "job_bot_langdetect_calls_total": (COUNTER, "Texts passed to langdetect.", None),
+    "job_bot_email_send_seconds": (HISTOGRAM, "Time to deliver one email, including connecting.", _EMAIL_BUCKETS),
+    "job_bot_emails_total": (COUNTER, "Emails handled, by result (sent or queued).", None),
+    "job_bot_runs_total": (COUNTER, "Scan runs, by trigger and outcome.", None),
+    "job_bot_run_seconds_total": (COUNTER, "Wall time of scan runs.", None),
+    "job_bot_last_run_timestamp_seconds": (GAUGE, "Time the latest finished run ended.", None),
+    "job_bot_last_run_duration_seconds": (GAUGE, "Wall time of the latest finished run.", None),
+    "job_bot_last_run_new_jobs": (GAUGE, "New jobs found by the latest finished run.", None),
+}
+
+
+def format_labels(labels):
+    """Renders a label dict the way it appears in the exposition format: a="x",b="y" (sorted)."""
+    if not labels:
+        return ""
+    parts = []
+    for key in sorted(labels):
+        value = str(labels[key]).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return ",".join(parts)
+
+
+def _bucket_label(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Registry:
+    """Thread-safe store of series values keyed by (series name, formatted labels)."""
+
+    def __init__(self):
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels=None, amount=1):
+        key = (name, format_labels(labels))
+        with self._lock:
+            self._values[key] += amount
+
+    def observe(self, name, value, labels=None):
+        """Records one histogram observation: cumulative buckets, _sum and _count."""
+        buckets = METRICS[name][2]
+        labels = dict(labels or {})
+        updates = []
+        for bound in (*buckets, float("inf")):
+            if value <= bound:
+                updates.append((f"{name}_bucket", format_labels({**labels, "le": _bucket_label(bound)})))
+        plain = format_labels(labels)
+        with self._lock:
+            for key in updates:
+                self._values[key] += 1
+            self._values[(f"{name}_sum", plain)] += value
+            self._values[(f"{name}_count", plain)] += 1
+
+    def add(self, values):
+        """Adds series values ({(series, labels): value}) to this registry's."""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+REGISTRY = Registry()
+
+_local = threading.local()
+
+
+def _registry():
+    """The calling thread's capture registry (see captured()), or the process registry."""
+    return getattr(_local, "registry", None) or REGISTRY
+
+
+def inc(name, labels=None, amount=1):
+    _registry().inc(name, labels, amount)
+
+
+def observe(name, value, labels=None):
+    _registry().observe(name, value, labels)
+
+
+@contextmanager
+def captured():
+    """
+    Records what the calling thread adds within the block in a Registry of its own, which it
+    yields, instead of in the process registry.
+    """
+    previous = getattr(_local, "registry", None)
+    _local.registry = Registry()
+    try:
+        yield _local.registry
+    finally:
+        _local.registry = previous
+
+
+def add(values):
+    """Adds series values ({(series, labels): value}, e.g. a captured() registry's snapshot) to the process registry."""
+    REGISTRY.add(values)
+
+
+@contextmanager
+def timed(name, labels=None):
+    """Observes the elapsed time of the block in a histogram, or adds it to a *_seconds_total counter."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if METRICS[name][0] == HISTOGRAM:
+            observe(name, elapsed, labels)
+        else:
+            inc(name, labels, elapsed)
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def diff(after, before):
+    """Returns the series that changed between two snapshots, with the change as value."""
+    return {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)}
+
+
+def _base_name(series):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if series.endswith(suffix) and series[:-len(suffix)] in METRICS:
+            return series[:-len(suffix)]
+    return series
+
+
+def summarize(values):
+    """A few headline numbers from a run's series, for the run log line and the dashboard."""
+    totals = defaultdict(float)
+    for (series, _), value in values.items():
+        totals[series] += value
+    return {
+        "requests": int(totals["job_bot_http_requests_total"]),
+        "bytes": int(totals["job_bot_http_response_bytes_total"]),
+        "fetch_seconds": round(totals["job_bot_http_fetch_seconds_sum"], 3),
+        "pages_parsed": int(totals["job_bot_pages_parsed_total"]),
+        "empty_pages": int(totals["job_bot_empty_pages_total"]),
+        "cards_found": int(totals["job_bot_cards_found_total"]),
+        "cards_dropped": int(totals["job_bot_cards_dropped_total"]),
+        "parse_seconds": round(totals["job_bot_parse_seconds_sum"], 3),
+        "filter_seconds": round(totals["job_bot_filter_seconds_total"], 3),
+        "langdetect_seconds": round(totals["job_bot_langdetect_seconds_total"], 3),
+        "email_seconds": round(totals["job_bot_email_send_seconds_sum"], 3),
+    }
+
+
+def render(values):
+    """
+    Renders series values in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        values (dict): {(series name, formatted labels): value}, e.g. from snapshot().
+    """
+    by_metric = defaultdict(list)
+    for (series, labels), value in values.items():
+        by_metric[_base_name(series)].append((series, labels, value))
+
+    lines = []
+    for name in sorted(by_metric):
+        metric_type, help_text, _ = METRICS.get(name, ("untyped", "", None))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for series, labels, value in sorted(by_metric[name], key=_series_sort_key):
+            rendered = f"{series}{{{labels}}}" if labels else series
+            lines.append(f"{rendered} {value:.10g}")
+    return "\n".join(lines) + "\n"
+
+
+def _series_sort_key(item):
+    series, labels, _ = item
+    # Keep histogram buckets in bound order, with +Inf last, as Prometheus expects.
+    match = _LE_PATTERN.search(labels)
+    if match is None:
+        return (series, labels, 0.0)
+    bound = float("inf") if match.group(1) == "+Inf" else float(match.group(1))
+    return (series, _LE_PATTERN.sub("", labels), bound)
@@ -0,0 +1,228 @@
+# shared/near_duplicates.py
+
+import hashlib
+import logging
+import operator
+import re
+import struct
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from shared import config, job_store
+from shared.utils import generate_job_id
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Near-duplicate postings: the same job posted on several sites (or reposted) with slightly
+# different wording. Each job's normalized title + description is reduced to a MinHash signature
+# of its character shingles; signatures are split into bands and every band is hashed into an
+# LSH bucket, so a new job is only compared with the jobs sharing a bucket with it.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_signatures (
+    job_id     TEXT PRIMARY KEY,
+    signature  BLOB NOT NULL,
+    seen_at    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_signatures_seen_at ON job_signatures(seen_at);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band    INTEGER NOT NULL,
+    bucket  INTEGER NOT NULL,
+    job_id  TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, job_id)
+) WITHOUT ROWID;
+"""
+
+# Signature layout. 16 bands of 4 rows make jobs with a similarity of 0.5 candidates ~65% of the
+# time, 0.6 ~89% and 0.7 ~99%. Changing these invalidates the stored index (clear both tables).
+_NUM_BINS = 64
+_ROWS_PER_BAND = 4
+_BANDS = _NUM_BINS // _ROWS_PER_BAND
+# A job is compared with at most this many candidates: those sharing the most bands with it.
+_MAX_CANDIDATES = 16
+# Bin values are below 2**64 / _NUM_BINS; an empty bin borrowing a value d bins away adds d steps,
+# which keeps every value within 64 bits (see signature()).
+_DENSIFY_STEP = 2 ** 64 // _NUM_BINS
+
+_COMBINING_MARKS = re.compile(r"[\u0591-\u05c7]") # Hebrew niqqud and cantillation marks
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def connect(path=None):
+    """Opens the job store database with the near-duplicate index tables created."""
+    conn = job_store.connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def normalize(text):
+    """Lowercases text and reduces it to words separated by single spaces (Hebrew vowel marks removed)."""
+    text = _COMBINING_MARKS.sub("", (text or "").lower())
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def _hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def signature(text, shingle_size=None):
+    """
+    Returns the MinHash signature (a tuple of _NUM_BINS ints) of the text's character shingles,
+    or None if the text has no words.
+
+    One-permutation hashing: every shingle is hashed once, the hash picks a bin and the smallest
+    remainder per bin is kept. Bins no shingle fell into borrow the value of the next non-empty
+    bin, offset by the distance, so two signatures agree on a bin with probability close to the
+    Jaccard similarity of the two shingle sets.
+    """
+    text = normalize(text)
+    if not text:
+        return None
+    shingle_size = shingle_size or config.NEAR_DUP_SHINGLE_SIZE
+    shingles = {text[i:i + shingle_size] for i in range(max(1, len(text) - shingle_size + 1))}
+
+    bins = [None] * _NUM_BINS
+    for shingle in shingles:
+        value = _hash(shingle.encode("utf-8"))
+        index, value = value % _NUM_BINS, value // _NUM_BINS
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    filled = list(bins)
+    for i in range(_NUM_BINS):
+        if bins[i] is None:
+            distance = 1
+            while bins[(i + distance) % _NUM_BINS] is None:
+                distance += 1
+            filled[i] = bins[(i + distance) % _NUM_BINS] + distance * _DENSIFY_STEP
+    return tuple(filled)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(map(operator.eq, a, b)) / _NUM_BINS
+
+
+def band_buckets(sig):
+    """Returns the (band, bucket) pairs of a signature's LSH bands."""
+    buckets = []
+    for band in range(_BANDS):
+        rows = sig[band * _ROWS_PER_BAND:(band + 1) * _ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f"<{_ROWS_PER_BAND}Q", *rows), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+
+def _pack(sig):
+    return array("Q", sig).tobytes()
+
+
+def _unpack(blob):
+    return tuple(array("Q", blob))
+
+
+class NearDuplicateIndex:
+    """
+    Pipeline stage that collapses near-duplicate postings.
+
+    A job whose signature is at least NEAR_DUP_THRESHOLD similar to a job found earlier in the same
+    run is merged into that job: its platform and link are appended to the first job's 'also_on'
+    list, so the digest shows one entry linking to every source. A job similar to one indexed by an
+    earlier run was already emailed in another wording and is dropped.
+
+    The index lives in the job store. Like the query planner's history it is loaded once when the
+    run starts and this run's additions are written by save(), after the job recorder has committed,
+    so looking up a job never waits on the database.
+    """
+
+    def __init__(self, path=None, now=None):
+        self.path = path
+        self.now = int(now if now is not None else time.time())
+        self.stats = Counter()
+        self._buckets = defaultdict(set) # (band, bucket) -> job IDs
+        self._signatures = {} # job ID -> signature
+        self._run_ids = [] # job IDs indexed by this run, to save
+        self._primaries = {} # job ID -> the job dict (of this run) it was merged into
+        self._load()
+
+    def _load(self):
+        conn = connect(self.path)
+        try:
+            for row in conn.execute("SELECT job_id, signature FROM job_signatures"):
+                self._signatures[row["job_id"]] = _unpack(row["signature"])
+            for row in conn.execute("SELECT band, bucket, job_id FROM lsh_buckets"):
+                self._buckets[(row["band"], row["bucket"])].add(row["job_id"])
+        finally:
+            conn.close()
+
+    def find(self, sig, buckets=None):
+        """Returns (job ID, similarity) of the most similar indexed job at or above the threshold, or None."""
+        shared_bands = Counter()
+        for key in buckets or band_buckets(sig):
+            shared_bands.update(self._buckets.get(key, ()))
+
+        best = None
+        for job_id, _ in shared_bands.most_common(_MAX_CANDIDATES):
+            score = similarity(sig, self._signatures[job_id])
+            if score >= config.NEAR_DUP_THRESHOLD and (best is None or score > best[1]):
+                best = (job_id, score)
+        return best
+
+    def _index(self, job_id, sig, buckets):
+        if job_id not in self._signatures:
+            self._run_ids.append(job_id)
+        self._signatures[job_id] = sig
+        for key in buckets:
+            self._buckets[key].add(job_id)
+
+    def iter_collapsed(self, jobs):
+        """Lazily yields the jobs of an iterable that are not near-duplicates of an earlier one."""
+        for job in jobs:
+            sig = signature(f"{job.get('title', '')} {job.get('description', '')}")
+            if sig is None:
+                yield job
+                continue
+
+            job_id = generate_job_id(job)
+            buckets = band_buckets(sig)
+            match = self.find(sig, buckets)
+            self._index(job_id, sig, buckets)
+            if match is None:
+                self._primaries[job_id] = job
+                yield job
+                continue
+
+            match_id, score = match
+            primary = self._primaries.get(match_id)
+            if primary is not None:
+                primary.setdefault("also_on", []).append({"platform": job["platform"], "link": job.get("link")})
+                self._primaries[job_id] = primary
+                self.stats["merged"] += 1
+                logging.info(f"  '{job['title']}' on {job['platform']} is a near-duplicate ({score:.0%}) of '{primary['title']}' on {primary['platform']}; merged.")
+            else:
+                self.stats["seen_before"] += 1
+                logging.info(f"  '{job['title']}' on {job['platform']} is a near-duplicate ({score:.0%}) of a job emailed by an earlier run; dropped.")
+
+    def save(self):
+        """Writes this run's signatures and buckets, and drops entries older than JOB_RETENTION_DAYS."""
+        cutoff = self.now - config.JOB_RETENTION_DAYS * 24 * 60 * 60
+        conn = connect(self.path)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO job_signatures (job_id, signature, seen_at) VALUES (?, ?, ?)",
+                    [(job_id, _pack(self._signatures[job_id]), self.now) for job_id in self._run_ids],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO lsh_buckets (band, bucket, job_id) VALUES (?, ?, ?)",
+                    [(band, bucket, job_id) for job_id in self._run_ids for band, bucket in band_buckets(self._signatures[job_id])],
+                )
+                conn.execute(
+                    "DELETE FROM lsh_buckets WHERE job_id IN (SELECT job_id FROM job_signatures WHERE seen_at < ?)", (cutoff,)
+                )
+                conn.execute("DELETE FROM job_signatures WHERE seen_at < ?", (cutoff,))
+        finally:
+            conn.close()
+
+        if self.stats:
+            logging.info(f"Near-duplicates: {dict(self.stats)}")
@@ -0,0 +1,289 @@
+# shared/page_archive.py
+
+"""
+Compressed, content-addressed archive of every fetched results page.
+
+Bodies are stored gzip-compressed under ARCHIVE_DIR/objects/, named by their SHA-256, so a page
+that did not change between fetches is stored once. An SQLite index (ARCHIVE_DIR/index.db)
+records every fetch: source, term, page, URL, time and body hash.
+
+Re-parse archived pages with the current selectors and merge the relevant jobs into the job store,
+without any network traffic:
+    python -m shared.page_archive reparse [--sources alljobs ...] [--since-days 7] [--store PATH] [--unsent] [--dry-run]
+
+Merged jobs count as seen, so no later run emails them. With --unsent, the jobs the store did not
+know yet (e.g. cards a broken selector missed) are also held for the next digest.
+"""
+
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+from shared import config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+INDEX_FILE = "index.db"
+OBJECTS_DIR = "objects"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    source      TEXT NOT NULL,
+    term        TEXT NOT NULL,
+    page_num    INTEGER NOT NULL,
+    url         TEXT NOT NULL,
+    fetched_at  INTEGER NOT NULL,
+    sha256      TEXT NOT NULL,
+    encoding    TEXT,
+    size        INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_source ON pages(source, term, page_num, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_pages_fetched_at ON pages(fetched_at);
+CREATE INDEX IF NOT EXISTS idx_pages_sha256 ON pages(sha256);
+"""
+
+
+class PageArchive:
+    """
+    The page archive in one directory. Safe to share between threads (each gets its own index
+    connection) and between processes (bodies are written atomically, the index is in WAL mode).
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or config.ARCHIVE_DIR
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, INDEX_FILE), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL") # A lost index row only loses one archived fetch
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, OBJECTS_DIR, digest[:2], digest[2:] + ".gz")
+
+    def store(self, spec, term, page_num, url, content, encoding=None, now=None):
+        """
+        Archives one fetched results page and returns its body hash. The body is only written
+        if no earlier fetch had the same one.
+        """
+        now = int(now if now is not None else time.time())
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a private name and renamed, so readers never see a partial body.
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(gzip.compress(content, mtime=0))
+            os.replace(temp_path, path)
+
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO pages (source, term, page_num, url, fetched_at, sha256, encoding, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (spec.name, term, page_num, url, now, digest, encoding, len(content)),
+            )
+        return digest
+
+    def read(self, digest):
+        """Returns the archived body with this hash."""
+        with gzip.open(self._blob_path(digest), "rb") as f:
+            return f.read()
+
+    def pages(self, source_names=None, since=None):
+        """Returns the index rows (dicts) of archived fetches, oldest first, optionally filtered."""
+        query = "SELECT * FROM pages WHERE fetched_at >= ?"
+        params = [since or 0]
+        if source_names:
+            query += f" AND source IN ({','.join('?' * len(source_names))})"
+            params.extend(source_names)
+        return [dict(row) for row in self._conn().execute(query + " ORDER BY fetched_at, page_id", params)]
+
+    def prune(self, retention_days=None, now=None):
+        """
+        Forgets fetches older than retention_days (config.ARCHIVE_RETENTION_DAYS) and deletes the
+        bodies no remaining fetch refers to.
+
+        Returns:
+            int: Number of bodies deleted.
+        """
+        retention_days = retention_days if retention_days is not None else config.ARCHIVE_RETENTION_DAYS
+        now = int(now if now is not None else time.time())
+        conn = self._conn()
+        with conn:
+            forgotten = conn.execute("DELETE FROM pages WHERE fetched_at < ?", (now - retention_days * 24 * 60 * 60,)).rowcount
+        if not forgotten:
+            return 0
+
+        referenced = {row[0] for row in conn.execute("SELECT DISTINCT sha256 FROM pages")}
+        deleted = 0
+        objects_dir = os.path.join(self.directory, OBJECTS_DIR)
+        for prefix in os.listdir(objects_dir) if os.path.isdir(objects_dir) else ():
+            for name in os.listdir(os.path.join(objects_dir, prefix)):
+                if name.endswith(".gz") and prefix + name[:-3] not in referenced:
+                    os.remove(os.path.join(objects_dir, prefix, name))
+                    deleted += 1
+        logging.info(f"Page archive: forgot {forgotten} fetches older than {retention_days} days, deleted {deleted} bodies.")
+        return deleted
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def get_archive(directory=None):
+    """Returns the process-wide PageArchive for a directory (config.ARCHIVE_DIR by default)."""
+    directory = directory or config.ARCHIVE_DIR
+    with _archives_lock:
+        archive = _archives.get(directory)
+        if archive is None:
+            archive = PageArchive(directory)
+            _archives[directory] = archive
+        return archive
+
+
+def archive_page(spec, term, page_num, url, content, encoding=None):
+    """
+    Archives a fetched results page if config.ARCHIVE_PAGES is on. A failing archive is logged
+    and otherwise ignored, so it never costs a page.
+    """
+    if not config.ARCHIVE_PAGES:
+        return
+    try:
+        get_archive().store(spec, term, page_num, url, content, encoding)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"    Could not archive {url}: {e}")
+
+
+def reparse(archive, source_names=None, since=None, store_path=None, dry_run=False, unsent=False):
+    """
+    Runs the current selectors over archived pages and merges the relevant jobs into the job store,
+    with the times their pages were fetched (see job_store.merge_jobs). Each distinct body is parsed
+    once, however often it was fetched.
+
+    Merged jobs count as seen by the scraper, so they are never emailed; with unsent, the jobs the
+    store did not know before are also held for the next digest (job_store.add_pending).
+
+    Returns:
+        dict: {source name: Counter} of pages, bodies, empty bodies, jobs parsed and kept, kept jobs
+        new to the store, and parse seconds.
+    """
+    # Imported here: parsing pulls in the sources and the scoring model, which the archive itself
+    # (used by every fetch) does not need.
+    from shared import job_store, sources
+    from shared.scoring import CategoryScorer
+    from shared.sources.base import parse_results
+    from shared.utils import generate_job_id, iter_relevant_jobs
+
+    fetches = defaultdict(list) # (source, sha256) -> index rows
+    for row in archive.pages(source_names, since):
+        fetches[(row["source"], row["sha256"])].append(row)
+
+    report = defaultdict(Counter)
+    sightings = {} # job ID -> [job, first_seen, last_seen]
+    sources_of = defaultdict(set) # job ID -> names of the sources it was found on
+    scorer = CategoryScorer()
+    for (source_name, digest), rows in fetches.items():
+        stats = report[source_name]
+        stats["pages"] += len(rows)
+        stats["bodies"] += 1
+        spec = sources.REGISTRY.get(source_name)
+        if spec is None:
+            logging.warning(f"Archived pages of unknown source '{source_name}'; skipping them.")
+            continue
+        try:
+            content = archive.read(digest)
+        except OSError as e:
+            logging.error(f"Archived body {digest} of {source_name} is unreadable: {e}")
+            stats["unreadable"] += 1
+            continue
+
+        first = rows[0]
+        start = time.perf_counter()
+        jobs = parse_results(spec, content, first["encoding"], first["term"], first["page_num"])
+        stats["parse_seconds"] += time.perf_counter() - start
+        stats["jobs"] += len(jobs)
+        if not jobs:
+            stats["empty"] += 1
+
+        kept = list(iter_relevant_jobs(scorer.iter_scored(jobs)))
+        stats["relevant"] += len(kept)
+        first_seen, last_seen = rows[0]["fetched_at"], rows[-1]["fetched_at"]
+        for job in kept:
+            sighting = sightings.setdefault(generate_job_id(job), [job, first_seen, last_seen])
+            sighting[1] = min(sighting[1], first_seen)
+            sighting[2] = max(sighting[2], last_seen)
+            sources_of[generate_job_id(job)].add(source_name)
+
+    if dry_run or not sightings:
+        known = job_store.known_job_ids(sightings, store_path)
+        unknown = [job_id for job_id in sightings if job_id not in known]
+    else:
+        # Merged and (with unsent) held in one transaction: a failure leaves the recovered jobs unseen.
+        unknown = job_store.merge_jobs(sightings.values(), store_path, hold_new=unsent)
+        logging.info(f"Merged {len(sightings)} re-parsed jobs into the job store.")
+        if unsent and unknown:
+            logging.info(f"Held {len(unknown)} jobs new to the store for the next digest.")
+    for job_id in unknown:
+        for source_name in sources_of[job_id]:
+            report[source_name]["new"] += 1
+    return report
+
+
+def format_report(report):
+    lines = [f"{'source':<12} {'pages':>7} {'bodies':>7} {'empty':>7} {'jobs':>7} {'relevant':>9} {'new':>7} {'parse s':>9}"]
+    for source_name, stats in sorted(report.items()):
+        lines.append(
+            f"{source_name:<12} {stats['pages']:>7} {stats['bodies']:>7} {stats['empty']:>7} "
+            f"{stats['jobs']:>7} {stats['relevant']:>9} {stats['new']:>7} {stats['parse_seconds']:>9.3f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline tools for the raw page archive.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reparse_parser = subparsers.add_parser(
+        "reparse", help="Re-parse archived pages and merge the relevant jobs into the job store.",
+        description="Re-parse archived pages and merge the relevant jobs into the job store. Merged jobs "
+                    "count as already seen, so no later run emails them unless --unsent is given.",
+    )
+    reparse_parser.add_argument("--archive-dir", help="Archive directory (default: ARCHIVE_DIR).")
+    reparse_parser.add_argument("--sources", nargs="+", help="Only pages of these sources.")
+    reparse_parser.add_argument("--since-days", type=float, help="Only pages fetched in the last N days.")
+    reparse_parser.add_argument("--store", help="Job store to merge into (default: JOB_STORE_PATH).")
+    reparse_parser.add_argument("--unsent", action="store_true",
+                                help="Also hold the jobs the store did not know yet for the next digest.")
+    reparse_parser.add_argument("--dry-run", action="store_true", help="Only report what the current selectors find.")
+
+    prune_parser = subparsers.add_parser("prune", help="Apply ARCHIVE_RETENTION_DAYS now.")
+    prune_parser.add_argument("--archive-dir", help="Archive directory (default: ARCHIVE_DIR).")
+    args = parser.parse_args(argv)
+
+    archive = PageArchive(args.archive_dir)
+    if args.command == "prune":
+        archive.prune()
+        return
+
+    since = time.time() - args.since_days * 24 * 60 * 60 if args.since_days else None
+    report = reparse(archive, args.sources, since, args.store, args.dry_run, args.unsent)
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# shared/parsing.py
+
+import logging
+from collections import namedtuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# lxml is an optional, much faster tree builder. Install it to enable the fast path;
+# without it we fall back to Python's built-in html.parser.
+try:
+    import lxml # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# A listing-card selector: an element name plus one CSS class it must carry,
+# i.e. the equivalent of soup.find_all(tag, class_=css_class).
+CardSelector = namedtuple("CardSelector", ["tag", "css_class"])
+
+
+def _classes(attrs):
+    value = attrs.get("class") or ()
+    return value.split() if isinstance(value, str) else value
+
+
+def _selector_index(selectors, name, attrs):
+    """Returns the index of the first selector matching the element, or None."""
+    for i, selector in enumerate(selectors):
+        if name == selector.tag and selector.css_class in _classes(attrs):
+            return i
+    return None
+
+
+def declared_encoding(response):
+    """
+    Returns the charset the server declared in its Content-Type header, or None.
+    requests falls back to ISO-8859-1 for any text/* response without a charset, which would
+    garble Hebrew pages; returning None instead lets BeautifulSoup read the page's <meta charset>.
+    """
+    if "charset" in response.headers.get("Content-Type", "").lower():
+        return response.encoding
+    return None
+
+
+def parse_cards(content, selectors, encoding=None):
+    """
+    Parses only the listing-card subtrees of a results page.
+
+    All fallback selectors are tried in one pass: a SoupStrainer keeps every element matching
+    any of them (with its subtree) and skips building the rest of the page. The raw response
+    bytes are decoded once, by the parser itself. As with the old find_all/fallback chain,
+    cards of the first selector that matched anything win.
+
+    Args:
+        content (bytes): The raw response body.
+        selectors (list): CardSelector entries, in fallback order.
+        encoding (str): Optional declared encoding (see declared_encoding).
+
+    Returns:
+        list: bs4 Tag objects, one per card. Empty if no selector matched.
+    """
+    def keep(name, attrs):
+        # Called by the parser for every start tag; attrs is the raw attribute dict.
+        return isinstance(name, str) and _selector_index(selectors, name, attrs) is not None
+
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=SoupStrainer(keep), from_encoding=encoding)
+
+    # Matched subtrees are appended at the top level of the strained soup, but a card may also be
+    # nested inside another matched element, so the whole strained tree is walked (document order).
+    by_selector = [[] for _ in selectors]
+    for element in soup.find_all(True):
+        index = _selector_index(selectors, element.name, element.attrs)
+        if index is not None:
+            by_selector[index].append(element)
+
+    for cards in by_selector:
+        if cards:
+            return cards
+    return []
@@ -0,0 +1,228 @@
+# shared/profiling.py
+
+"""
+Profiling run mode for the scraper entry point:
+
+    python -m shared.scraper --profile [--fixtures fixtures/] [--sources alljobs] [--terms "piano recording"]
+
+Runs the pipeline once under cProfile and tracemalloc and writes to the report directory:
+    hot_functions.txt   functions sorted by cumulative and by own time
+    profile.pstats      the raw profile, for pstats or snakeviz
+    allocations.txt     the top allocation sites at the end of the run, and the peak
+    sources.txt         per-source breakdown: requests, status codes, bytes, fetch and parse time, cards
+                        (and those dropped by the title prefilter while parsing)
+    summary.json        the above numbers in machine-readable form
+
+With --fixtures, pages are replayed from recorded or synthesized fixtures (shared/replay.py) in the
+same scratch environment as shared/benchmark.py: no politeness sleeps, a throwaway job store and
+no real email.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import nullcontext
+
+from shared import config, metrics, scraper, sources
+from shared.benchmark import offline_environment
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Worker threads of shared/engine.py are named after this prefix; only they (and the calling
+# thread) are profiled, not e.g. the fixture server's request threads.
+_PROFILED_THREAD_PREFIX = "scrape-"
+
+
+class ThreadProfiler:
+    """
+    cProfile across the calling thread and the scrape engine's worker threads.
+
+    Before Python 3.12 a cProfile.Profile only sees the thread that enabled it, so every worker
+    thread started while profiling gets its own profiler and the results are merged at the end.
+    From 3.12 on one profiler sees every thread.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self._lock = threading.Lock()
+
+    def _enable_new(self):
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append(profile)
+        profile.enable()
+
+    def _bootstrap(self, frame, event, arg):
+        # First profiling event of a new thread: replace this hook with a real profiler.
+        sys.setprofile(None)
+        if threading.current_thread().name.startswith(_PROFILED_THREAD_PREFIX):
+            self._enable_new()
+
+    def start(self):
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._bootstrap)
+        self._enable_new()
+
+    def stop(self):
+        threading.setprofile(None)
+        for profile in self.profiles:
+            profile.disable()
+
+    def stats(self):
+        return pstats.Stats(*self.profiles)
+
+
+def _source_breakdown(run_metrics):
+    """Groups a run's metric series by source (hosts are mapped to the source crawling them)."""
+    source_by_host = {spec.host: spec.name for spec in sources.REGISTRY.values()}
+    breakdown = defaultdict(lambda: defaultdict(float))
+    statuses = defaultdict(dict)
+
+    for (series, labels), value in run_metrics.items():
+        fields = dict(part.split("=", 1) for part in labels.split(",")) if labels else {}
+        fields = {key: raw.strip('"') for key, raw in fields.items()}
+        if "host" in fields:
+            source = source_by_host.get(fields["host"], fields["host"])
+        elif "source" in fields:
+            source = fields["source"]
+        else:
+            continue
+
+        if series == "job_bot_http_requests_total":
+            statuses[source][fields["status"]] = int(value)
+            breakdown[source]["requests"] += value
+        elif series == "job_bot_http_response_bytes_total":
+            breakdown[source]["bytes"] += value
+        elif series == "job_bot_http_fetch_seconds_sum":
+            breakdown[source]["fetch_seconds"] += value
+        elif series == "job_bot_parse_seconds_sum":
+            breakdown[source]["parse_seconds"] += value
+        elif series == "job_bot_pages_parsed_total":
+            breakdown[source]["pages"] += value
+        elif series == "job_bot_empty_pages_total":
+            breakdown[source]["empty_pages"] += value
+        elif series == "job_bot_cards_found_total":
+            breakdown[source]["cards"] += value
+        elif series == "job_bot_cards_dropped_total":
+            breakdown[source]["dropped"] += value
+
+    result = {}
+    for source, numbers in sorted(breakdown.items()):
+        requests = numbers["requests"] or 1
+        result[source] = {
+            "requests": int(numbers["requests"]),
+            "statuses": statuses[source],
+            "bytes": int(numbers["bytes"]),
+            "fetch_seconds": round(numbers["fetch_seconds"], 3),
+            "mean_fetch_seconds": round(numbers["fetch_seconds"] / requests, 3),
+            "pages": int(numbers["pages"]),
+            "empty_pages": int(numbers["empty_pages"]),
+            "cards": int(numbers["cards"]),
+            "dropped": int(numbers["dropped"]),
+            "parse_seconds": round(numbers["parse_seconds"], 3),
+        }
+    return result
+
+
+def _format_sources(breakdown):
+    lines = [f"{'source':<12} {'requests':>8} {'bytes':>10} {'fetch s':>8} {'mean s':>7} {'pages':>6} {'empty':>6} {'cards':>6} {'dropped':>7} {'parse s':>8}  statuses"]
+    for source, row in breakdown.items():
+        statuses = " ".join(f"{status}:{count}" for status, count in sorted(row["statuses"].items()))
+        lines.append(
+            f"{source:<12} {row['requests']:>8} {row['bytes']:>10} {row['fetch_seconds']:>8.3f} {row['mean_fetch_seconds']:>7.3f} "
+            f"{row['pages']:>6} {row['empty_pages']:>6} {row['cards']:>6} {row['dropped']:>7} {row['parse_seconds']:>8.3f}  {statuses}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _format_hot_functions(stats, top):
+    out = io.StringIO()
+    stats.stream = out
+    out.write(f"=== Top {top} functions by cumulative time ===\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    out.write(f"\n=== Top {top} functions by own time ===\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+    return out.getvalue()
+
+
+def _format_allocations(snapshot, peak, top):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+    statistics = snapshot.statistics("lineno")
+    lines = [
+        f"Peak traced memory: {peak / 1024 / 1024:.2f} MiB",
+        f"Still allocated at the end of the run: {sum(stat.size for stat in statistics) / 1024 / 1024:.2f} MiB",
+        "",
+        f"=== Top {top} allocation sites ===",
+    ]
+    lines.extend(str(stat) for stat in statistics[:top])
+    return "\n".join(lines) + "\n"
+
+
+def profile_run(report_dir=None, fixture_dir=None, terms=None, source_names=None, top=40):
+    """
+    Runs the pipeline once under the profilers and writes the reports into report_dir
+    (a timestamped directory under DATA_DIR/profiles by default).
+
+    Returns:
+        str: The report directory.
+    """
+    report_dir = report_dir or os.path.join(config.DATA_DIR, "profiles", time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(report_dir, exist_ok=True)
+
+    environment = offline_environment(fixture_dir) if fixture_dir else nullcontext()
+    profiler = ThreadProfiler()
+    with environment:
+        before = metrics.snapshot()
+        tracemalloc.start()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            jobs = scraper.run_scraper_and_email(terms=terms, source_names=source_names)
+        finally:
+            profiler.stop()
+            wall = time.perf_counter() - start
+            allocations = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        run_metrics = metrics.diff(metrics.snapshot(), before)
+
+    stats = profiler.stats()
+    stats.dump_stats(os.path.join(report_dir, "profile.pstats"))
+    breakdown = _source_breakdown(run_metrics)
+    reports = {
+        "hot_functions.txt": _format_hot_functions(stats, top),
+        "allocations.txt": _format_allocations(allocations, peak, top),
+        "sources.txt": _format_sources(breakdown),
+    }
+    for name, text in reports.items():
+        with open(os.path.join(report_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    summary = {
+        "wall_seconds": round(wall, 3),
+        "peak_memory_bytes": peak,
+        "new_jobs": len(jobs),
+        "fixtures": fixture_dir,
+        "terms": terms,
+        "sources": source_names or config.ENABLED_SOURCES,
+        "profiled_threads": len(profiler.profiles),
+        "stages": metrics.summarize(run_metrics),
+        "per_source": breakdown,
+    }
+    with open(os.path.join(report_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    logging.info(f"Profile of a {wall:.1f}s run written to '{report_dir}'.")
+    return report_dir
@@ -0,0 +1,196 @@
+# shared/query_planner.py
+
+import json
+import logging
+import sqlite3
+import time
+from collections import Counter, defaultdict
+
+from shared import config, job_store
+from shared.engine import CrawlPlan
+from shared.utils import generate_job_id
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS term_results (
+    source  TEXT NOT NULL,
+    term    TEXT NOT NULL,
+    job_id  TEXT NOT NULL,
+    seen_at INTEGER NOT NULL,
+    PRIMARY KEY (source, term, job_id)
+);
+CREATE INDEX IF NOT EXISTS idx_term_results_seen_at ON term_results(seen_at);
+CREATE TABLE IF NOT EXISTS term_fetches (
+    source       TEXT NOT NULL,
+    term         TEXT NOT NULL,
+    last_fetched INTEGER NOT NULL,
+    PRIMARY KEY (source, term)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    source     TEXT NOT NULL,
+    term       TEXT NOT NULL,
+    job_ids    TEXT NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (source, term)
+);
+"""
+
+
+def connect(path=None):
+    """Opens the job store database with the planner's tables created."""
+    conn = job_store.connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class QueryPlanner(CrawlPlan):
+    """
+    Cuts redundant requests across overlapping search terms.
+
+    - Before the run, a term is skipped on a source when the listings it returned recently
+      are (almost) all covered by terms already planned for that source. Skipped terms are
+      re-crawled every PLANNER_REVALIDATE_HOURS so the overlap estimate never goes stale.
+    - Where a source supports combined queries (SourceSpec.query_joiner), the remaining
+      terms are merged into as few searches as the source allows.
+    - During the run, pagination of a (source, term) stops as soon as a page returns only
+      listings another term already returned in this run.
+    - Pagination is incremental: each (source, query) keeps a high-water mark of the newest
+      listing IDs it returned. A page made only of known listings ends the crawl, an entirely
+      new page lets it go deeper than max_pages (up to the source's max_depth), and a mixed
+      page follows the usual max_pages limit.
+    - After the run, save() records which listings each term returned, for the next plan.
+    """
+
+    def __init__(self, path=None, now=None):
+        self.path = path
+        self.now = int(now if now is not None else time.time())
+        self.stats = Counter()
+        self._history = defaultdict(lambda: defaultdict(set)) # source -> term -> job IDs
+        self._last_fetched = {} # (source, term) -> epoch seconds
+        self._merged_queries = set() # (source, query) pairs that combine several terms
+        self._seen_this_run = defaultdict(set) # source -> job IDs returned so far
+        self._run_results = defaultdict(set) # (source, term) -> job IDs returned this run
+        self._watermarks = {} # (source, query) -> newest job IDs, newest first
+        self._run_pages = defaultdict(dict) # (source, query) -> page number -> job IDs in page order
+        self._load()
+
+    def _load(self):
+        since = self.now - config.PLANNER_HISTORY_DAYS * 24 * 60 * 60
+        try:
+            conn = connect(self.path)
+            try:
+                for row in conn.execute("SELECT source, term, job_id FROM term_results WHERE seen_at >= ?", (since,)):
+                    self._history[row["source"]][row["term"]].add(row["job_id"])
+                for row in conn.execute("SELECT source, term, last_fetched FROM term_fetches"):
+                    self._last_fetched[(row["source"], row["term"])] = row["last_fetched"]
+                for row in conn.execute("SELECT source, term, job_ids FROM watermarks"):
+                    self._watermarks[(row["source"], row["term"])] = json.loads(row["job_ids"])
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logging.error(f"Query planner could not load term history, crawling every term: {e}")
+
+    def queries_for(self, source, terms):
+        history = self._history.get(source.name, {})
+        revalidate_after = config.PLANNER_REVALIDATE_HOURS * 60 * 60
+
+        kept = []
+        covered = set()
+        for term in dict.fromkeys(terms): # Drop repeated terms, keep order
+            ids = history.get(term)
+            last_fetched = self._last_fetched.get((source.name, term))
+            fresh = last_fetched is not None and self.now - last_fetched < revalidate_after
+            if ids and fresh and covered:
+                overlap = len(ids & covered) / len(ids)
+                if overlap >= config.PLANNER_OVERLAP_THRESHOLD:
+                    logging.info(f"  Planner: skipping '{term}' on {source.name}, {overlap:.0%} of its recent listings are covered by other terms.")
+                    self.stats["terms_skipped"] += 1
+                    continue
+            kept.append(term)
+            if ids:
+                covered |= ids
+
+        if not source.query_joiner or source.max_terms_per_query <= 1:
+            return kept
+
+        queries = []
+        for i in range(0, len(kept), source.max_terms_per_query):
+            group = kept[i:i + source.max_terms_per_query]
+            query = source.query_joiner.join(group)
+            if len(group) > 1:
+                self._merged_queries.add((source.name, query))
+                self.stats["terms_merged"] += len(group) - 1
+            queries.append(query)
+        return queries
+
+    def should_fetch_next(self, source, query, page_num, jobs):
+        ordered_ids = list(dict.fromkeys(generate_job_id(job) for job in jobs))
+        ids = set(ordered_ids)
+        seen = self._seen_this_run[source.name]
+        new_ids = ids - seen
+        seen |= ids
+        self._run_results[(source.name, query)] |= ids
+        self._run_pages[(source.name, query)][page_num] = ordered_ids
+
+        if ids and not new_ids:
+            logging.info(f"  Planner: page {page_num} of '{query}' on {source.name} only repeated listings; not fetching page {page_num + 1}.")
+            self.stats["pages_skipped"] += 1
+            return False
+
+        watermark = self._watermarks.get((source.name, query))
+        if watermark is None:
+            # First crawl of this (source, query): no history to compare against.
+            return page_num < source.max_pages
+
+        known = ids & set(watermark)
+        if not ids or known == ids:
+            if page_num < source.max_pages:
+                logging.info(f"  Planner: page {page_num} of '{query}' on {source.name} has no listings newer than the last run; stopping.")
+                self.stats["pages_skipped"] += 1
+            return False
+        if not known:
+            # Entirely new page: there may be more new listings further down.
+            if page_num >= source.max_pages and page_num < source.max_depth:
+                logging.info(f"  Planner: page {page_num} of '{query}' on {source.name} is entirely new; going deeper.")
+                self.stats["pages_deepened"] += 1
+            return page_num < max(source.max_pages, source.max_depth)
+        return page_num < source.max_pages
+
+    def _next_watermark(self, source, query):
+        """This run's listings in page order, followed by the previous mark, capped at WATERMARK_SIZE."""
+        pages = self._run_pages[(source, query)]
+        ordered = [job_id for page_num in sorted(pages) for job_id in pages[page_num]]
+        ordered.extend(self._watermarks.get((source, query), ()))
+        return list(dict.fromkeys(ordered))[:config.WATERMARK_SIZE]
+
+    def save(self):
+        """
+        Records this run's per-term listings, fetch times and high-water marks, and drops history older than
+        PLANNER_HISTORY_DAYS. Merged queries are not recorded, since their listings cannot be
+        attributed to a single term.
+        """
+        since = self.now - config.PLANNER_HISTORY_DAYS * 24 * 60 * 60
+        single_term = [key for key in self._run_results if key not in self._merged_queries]
+
+        conn = connect(self.path)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO term_results (source, term, job_id, seen_at) VALUES (?, ?, ?, ?)",
+                    [(source, term, job_id, self.now) for source, term in single_term for job_id in self._run_results[(source, term)]],
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO term_fetches (source, term, last_fetched) VALUES (?, ?, ?)",
+                    [(source, term, self.now) for source, term in single_term],
+                )
+                conn.execute("DELETE FROM term_results WHERE seen_at < ?", (since,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO watermarks (source, term, job_ids, updated_at) VALUES (?, ?, ?, ?)",
+                    [(source, query, json.dumps(self._next_watermark(source, query)), self.now) for source, query in self._run_pages],
+                )
+        finally:
+            conn.close()
+
+        if self.stats:
+            logging.info(f"Query planner: {dict(self.stats)}")
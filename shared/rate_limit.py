@@ -0,0 +1,191 @@
+# shared/rate_limit.py
+
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from shared import config, job_store, metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Responses that mean "slow down" rather than "broken".
+THROTTLE_STATUSES = (429, 503)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS host_health (
+    host         TEXT PRIMARY KEY,
+    interval     REAL NOT NULL,
+    failures     INTEGER NOT NULL,
+    open_until   REAL NOT NULL,
+    cooldown     REAL NOT NULL,
+    updated_at   INTEGER NOT NULL
+);
+"""
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request to a host whose circuit breaker is open."""
+
+
+def parse_retry_after(value, now=None):
+    """Returns the delay in seconds requested by a Retry-After header (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now if now is not None else time.time()
+    return max(0.0, when.timestamp() - now)
+
+
+class AdaptiveTokenBucket:
+    """
+    Paces requests to one host. Tokens refill at 1/interval per second up to `capacity`; every
+    request takes a token, waiting for it if the bucket is empty. Each request costs a random
+    0.8-1.2 tokens, so the cadence is not a fixed beat.
+
+    The interval adapts: every healthy response shortens it by RATE_LIMIT_SPEEDUP down to
+    min_interval, and a throttling response (429/503) lengthens it by RATE_LIMIT_BACKOFF up to
+    RATE_LIMIT_MAX_DELAY and empties the bucket. A Retry-After delay holds every request until it passes.
+    """
+
+    def __init__(self, interval, min_interval, capacity=1.0, enabled=True):
+        self.min_interval = min_interval
+        self.interval = max(min_interval, min(interval, config.RATE_LIMIT_MAX_DELAY))
+        self.capacity = capacity
+        self.enabled = enabled
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns how long the caller must wait before sending (seconds)."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) / self.interval)
+            self._last = now
+            self._tokens -= random.uniform(0.8, 1.2)
+            wait = -self._tokens * self.interval if self._tokens < 0 else 0.0
+            return max(wait, self._not_before - now)
+
+    def healthy(self):
+        with self._lock:
+            self.interval = max(self.min_interval, self.interval * config.RATE_LIMIT_SPEEDUP)
+
+    def throttled(self, retry_after=None):
+        with self._lock:
+            self.interval = min(config.RATE_LIMIT_MAX_DELAY, self.interval * config.RATE_LIMIT_BACKOFF)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._not_before = max(self._not_before, time.monotonic() + retry_after)
+
+    def hold_remaining(self):
+        """Seconds until a Retry-After hold passes (0 if there is none)."""
+        with self._lock:
+            return max(0.0, self._not_before - time.monotonic())
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host that keeps failing.
+
+    Closed: requests pass; BREAKER_FAILURE_THRESHOLD consecutive failures (4xx/5xx responses or
+    no response at all) open the breaker. Open: requests are rejected at once until the cooldown
+    ends. Half-open: a single probe request is let through; success closes the breaker, failure
+    opens it again with the cooldown doubled (up to BREAKER_MAX_COOLDOWN_SECONDS).
+    Times are wall-clock epoch seconds so the state can be saved and restored by the next run.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = config.BREAKER_COOLDOWN_SECONDS
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.open_until > 0
+
+    def admit(self):
+        """Raises CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if not self.is_open:
+                return
+            if time.time() < self.open_until or self._probing:
+                metrics.inc("job_bot_requests_rejected_total", {"host": self.host})
+                raise CircuitOpenError(f"Circuit breaker open for {self.host}")
+            self._probing = True
+            logging.info(f"Circuit breaker for {self.host}: cooldown over, sending a probe request.")
+
+    def succeeded(self):
+        with self._lock:
+            if self.is_open:
+                logging.info(f"Circuit breaker for {self.host} closed: probe succeeded.")
+            self.failures = 0
+            self.open_until = 0.0
+            self.cooldown = config.BREAKER_COOLDOWN_SECONDS
+            self._probing = False
+
+    def failed(self, open_for=None):
+        """Counts a failure. open_for forces the breaker open for that long (e.g. a long Retry-After)."""
+        with self._lock:
+            self.failures += 1
+            if self._probing:
+                self.cooldown = min(self.cooldown * 2, config.BREAKER_MAX_COOLDOWN_SECONDS)
+            if self._probing or open_for or self.failures >= config.BREAKER_FAILURE_THRESHOLD:
+                duration = max(open_for or 0, self.cooldown)
+                self.open_until = time.time() + duration
+                metrics.inc("job_bot_circuit_opened_total", {"host": self.host})
+                logging.warning(f"Circuit breaker for {self.host} open for {duration:.0f}s after {self.failures} consecutive failures.")
+            self._probing = False
+
+    def released(self):
+        """Ends a probe whose request never got an answer either way."""
+        with self._lock:
+            self._probing = False
+
+
+def load_host_states(path=None):
+    """Returns the saved {host: state dict} from the job store."""
+    conn = job_store.connect(path)
+    try:
+        conn.executescript(_SCHEMA)
+        return {row["host"]: dict(row) for row in conn.execute("SELECT * FROM host_health")}
+    finally:
+        conn.close()
+
+
+def save_host_states(states, path=None, now=None):
+    """Saves {host: state dict} (see HostBudget.state) into the job store."""
+    now = int(now if now is not None else time.time())
+    conn = job_store.connect(path)
+    try:
+        conn.executescript(_SCHEMA)
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO host_health (host, interval, failures, open_until, cooldown, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(host) DO UPDATE SET interval = excluded.interval, failures = excluded.failures,
+                    open_until = excluded.open_until, cooldown = excluded.cooldown, updated_at = excluded.updated_at
+                """,
+                [
+                    (host, state["interval"], state["failures"], state["open_until"], state["cooldown"], now)
+                    for host, state in states.items()
+                ],
+            )
+    finally:
+        conn.close()
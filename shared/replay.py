@@ -0,0 +1,281 @@
+# shared/replay.py
+
+"""
+Offline record/replay of listing-page HTTP traffic.
+
+Record real responses into a fixture directory:
+    python -m shared.replay record fixtures/ [--terms "piano recording" ...] [--sources alljobs ...]
+
+Or generate a small deterministic set without network access (results pages built from each
+source's selectors, with listings repeated across terms and pages like the real sites do):
+    python -m shared.replay synthesize fixtures/ [--pages 5] [--cards 20] [--sources alljobs ...]
+
+Serve them from a local stand-in server (with optional latency and error injection):
+    python -m shared.replay serve fixtures/ --port 8765 --latency 0.05 0.2 --error-rate 0.1
+
+shared/benchmark.py uses the same pieces to run the whole pipeline without network access.
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from shared import http_client
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+INDEX_FILE = "index.json"
+
+# Words of the synthesized listings: relevant to the search terms, so most listings pass the filter.
+_SYNTHETIC_WORDS = ["we", "are", "looking", "for", "the", "english", "hebrew", "translator", "lyrics", "song", "piano",
+                    "session", "recording", "vocal", "harmony", "needed"]
+
+
+def load_index(fixture_dir):
+    """Returns the fixture index: {url: {"file", "status", "content_type"}}."""
+    path = os.path.join(fixture_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fixture_file(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:20] + ".html"
+
+
+def _write_index(fixture_dir, index):
+    # Written atomically so an interrupted recording never leaves it half-written.
+    index_path = os.path.join(fixture_dir, INDEX_FILE)
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(index_path + ".tmp", index_path)
+
+
+class FixtureRecorder:
+    """
+    Saves every response seen by http_client.fetch into fixture_dir.
+    Bodies are stored as raw bytes, one file per URL, plus an index.json mapping URL to file.
+    """
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+        self._index = load_index(fixture_dir)
+        self._lock = threading.Lock()
+
+    def record(self, url, response):
+        file_name = _fixture_file(url)
+        with open(os.path.join(self.fixture_dir, file_name), "wb") as f:
+            f.write(response.content)
+        with self._lock:
+            self._index[url] = {
+                "file": file_name,
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", "text/html"),
+            }
+            _write_index(self.fixture_dir, self._index)
+
+
+class FixtureServer:
+    """
+    Local HTTP stand-in for the job sites, serving recorded fixtures.
+
+    A real URL https://host/path?query is served at http://127.0.0.1:port/host/path?query;
+    use install() to make http_client.fetch rewrite URLs accordingly.
+    Unknown URLs get a 404. latency is a (min, max) range in seconds added to every response,
+    and error_rate is the probability of answering 503 instead of the fixture.
+    """
+
+    def __init__(self, fixture_dir, host="127.0.0.1", port=0, latency=(0, 0), error_rate=0.0, seed=None):
+        self.fixture_dir = fixture_dir
+        self.index = load_index(fixture_dir)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests_served = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Fixture server: {format % args}")
+
+        return Handler
+
+    def _handle(self, handler):
+        with self._lock:
+            self.requests_served += 1
+            delay = self._random.uniform(*self.latency)
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        host, _, rest = handler.path.lstrip("/").partition("/")
+        entry = self.index.get(f"https://{host}/{rest}")
+        if fail or entry is None:
+            status = 503 if fail else 404
+            handler.send_response(status)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+
+        with open(os.path.join(self.fixture_dir, entry["file"]), "rb") as f:
+            body = f.read()
+        handler.send_response(entry["status"])
+        handler.send_header("Content-Type", entry["content_type"])
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def rewrite_url(self, url):
+        parts = urlsplit(url)
+        rewritten = f"{self.base_url}/{parts.netloc}{parts.path}"
+        return f"{rewritten}?{parts.query}" if parts.query else rewritten
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Fixture server serving {len(self.index)} fixtures from '{self.fixture_dir}' at {self.base_url}")
+        return self
+
+    def install(self):
+        """Routes every http_client.fetch through this server."""
+        http_client.set_url_rewriter(self.rewrite_url)
+
+    def stop(self):
+        http_client.set_url_rewriter(None)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        self.install()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def record(fixture_dir, terms=None, source_names=None):
+    """Crawls the live sites (politely) and records every listing response into fixture_dir."""
+    from shared import sources
+    from shared.engine import ScrapeEngine
+    from shared.scraper import SCRAPE_TERMS
+
+    http_client.set_recorder(FixtureRecorder(fixture_dir))
+    try:
+        engine = ScrapeEngine(sources.enabled_sources(source_names))
+        jobs = engine.scrape_all(terms or SCRAPE_TERMS)
+    finally:
+        http_client.set_recorder(None)
+    logging.info(f"Recorded {len(load_index(fixture_dir))} responses ({len(jobs)} jobs) into '{fixture_dir}'.")
+
+
+def _first(alternatives):
+    return alternatives if isinstance(alternatives, str) else alternatives[0]
+
+
+def _element(selector, content, attrs=""):
+    return f'<{_first(selector.tags)} class="{_first(selector.classes)}"{attrs}>{content}</{_first(selector.tags)}>'
+
+
+def synthesize(fixture_dir, terms=None, source_names=None, pages=5, cards=20, listings=300, seed=1):
+    """
+    Writes deterministic results pages for every (source, term, page) into fixture_dir, marked up
+    with each source's first card and field selectors and padded to the weight of a real page.
+    Each card links to one of listings per source with a freshly worded title and description, so
+    listings recur across terms and pages, as reposts and reworded ads do on the live sites.
+    """
+    from shared import sources
+    from shared.scraper import SCRAPE_TERMS
+    from shared.sources.base import build_search_url
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    rng = random.Random(seed)
+    padding = "<p>filler</p>" * 500
+    index = load_index(fixture_dir)
+    for spec in sources.enabled_sources(source_names):
+        card_tag, card_class = spec.card_selectors[0]
+        for term in terms or SCRAPE_TERMS:
+            for page_num in range(1, pages + 1):
+                body = []
+                for _ in range(cards):
+                    listing = rng.randrange(listings)
+                    title = " ".join(rng.choice(_SYNTHETIC_WORDS) for _ in range(5)) + f" {listing}"
+                    description = " ".join(rng.choice(_SYNTHETIC_WORDS) for _ in range(30))
+                    fields = _element(spec.title_selectors[0], html.escape(title))
+                    fields += _element(spec.link_selectors[0], "x", f' href="/listing/{listing}"')
+                    if spec.description_selectors:
+                        fields += _element(spec.description_selectors[0], html.escape(description))
+                    body.append(f'<{card_tag} class="{card_class}">{fields}</{card_tag}>')
+
+                url = build_search_url(spec, term, page_num)
+                with open(os.path.join(fixture_dir, _fixture_file(url)), "w", encoding="utf-8") as f:
+                    f.write(f'<html><head><meta charset="utf-8"></head><body>{padding}{"".join(body)}</body></html>')
+                index[url] = {"file": _fixture_file(url), "status": 200, "content_type": "text/html; charset=utf-8"}
+    _write_index(fixture_dir, index)
+    logging.info(f"Synthesized {len(index)} responses into '{fixture_dir}'.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or replay job-site responses.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Crawl the live sites and save responses as fixtures.")
+    record_parser.add_argument("fixture_dir")
+    record_parser.add_argument("--terms", nargs="+", help="Search terms (default: all SCRAPE_TERMS).")
+    record_parser.add_argument("--sources", nargs="+", help="Source names (default: ENABLED_SOURCES).")
+
+    synthesize_parser = subparsers.add_parser("synthesize", help="Generate deterministic fixtures offline.")
+    synthesize_parser.add_argument("fixture_dir")
+    synthesize_parser.add_argument("--terms", nargs="+", help="Search terms (default: all SCRAPE_TERMS).")
+    synthesize_parser.add_argument("--sources", nargs="+", help="Source names (default: ENABLED_SOURCES).")
+    synthesize_parser.add_argument("--pages", type=int, default=5, help="Results pages per term and source.")
+    synthesize_parser.add_argument("--cards", type=int, default=20, help="Cards per results page.")
+    synthesize_parser.add_argument("--listings", type=int, default=300, help="Distinct listings per source.")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve recorded fixtures over local HTTP.")
+    serve_parser.add_argument("fixture_dir")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency", type=float, nargs=2, default=(0, 0), metavar=("MIN", "MAX"))
+    serve_parser.add_argument("--error-rate", type=float, default=0.0)
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        record(args.fixture_dir, args.terms, args.sources)
+    elif args.command == "synthesize":
+        synthesize(args.fixture_dir, args.terms, args.sources, args.pages, args.cards, args.listings)
+    else:
+        server = FixtureServer(args.fixture_dir, port=args.port, latency=tuple(args.latency), error_rate=args.error_rate)
+        server.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# shared/scan_coordinator.py
+
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from shared import config, status_store
+from shared.scraper import run_scraper_and_email, send_pending_digest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ScanLock:
+    """
+    Cross-process lock held for the duration of a scan, so the web and worker processes never crawl
+    at the same time. It is an flock on config.SCAN_LOCK_PATH: the OS releases it if the holder dies,
+    so a crashed scan never leaves the lock stuck. It may be released from a different thread than
+    the one that acquired it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.SCAN_LOCK_PATH
+        self._file = None
+
+    def acquire(self):
+        """Takes the lock without waiting. Returns False if another scan holds it."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def _start_locked_run(trigger):
+    """
+    Registers a new run in the status store; the caller must hold the scan lock.
+    Runs left in the running state by a process that died are closed first.
+    Returns the run ID, or None if the status store is unavailable.
+    """
+    try:
+        interrupted = status_store.abandon_running_runs()
+        if interrupted:
+            logging.warning(f"Marked {interrupted} run(s) left over from a dead process as interrupted.")
+        return status_store.start_run(trigger)
+    except sqlite3.Error as e:
+        logging.error(f"Status store unavailable, this run will not be recorded: {e}", exc_info=True)
+        return None
+
+
+def _run_scan(trigger, run_id, terms=None, source_names=None, queue=None, lease=None, defer_digest=False):
+    with status_store.tracked_run(trigger, run_id=run_id) as run:
+        run.jobs = len(run_scraper_and_email(on_unit=run.unit_done, terms=terms, source_names=source_names,
+                                              queue=queue, lease=lease, defer_digest=defer_digest))
+    return run.jobs
+
+
+def run_exclusive(trigger, terms=None, source_names=None, queue=None, lease=None, defer_digest=False):
+    """
+    Runs one scan in the calling thread, unless another process or thread is already scanning.
+    terms, source_names, queue, lease and defer_digest are passed on to run_scraper_and_email (default: the full crawl,
+    in this process).
+
+    Returns:
+        int: Number of new jobs found, or None if the scan was skipped.
+    """
+    lock = ScanLock()
+    if not lock.acquire():
+        logging.info(f"Skipping {trigger} scan: another scan is already in progress.")
+        return None
+    try:
+        return _run_scan(trigger, _start_locked_run(trigger), terms, source_names, queue, lease, defer_digest)
+    finally:
+        lock.release()
+
+
+def send_digest_exclusive(lease=None):
+    """
+    Sends the jobs held for the digest (see scraper.send_pending_digest) under the scan lock, so it
+    never runs next to a scan: a scan that emails its digest sends the held jobs itself, and two
+    senders would both email them.
+
+    Returns:
+        int: Number of jobs sent, or None if skipped because a scan is in progress.
+    """
+    lock = ScanLock()
+    if not lock.acquire():
+        logging.info("Skipping the digest: a scan is in progress.")
+        return None
+    try:
+        return send_pending_digest(lease)
+    finally:
+        lock.release()
+
+
+class ScanCoordinator:
+    """
+    Single-flight entry point for on-demand scans (the web app's /trigger_scan).
+
+    A trigger while a scan is in flight, in this process or in another one (e.g. the worker's
+    scheduled run), joins that scan instead of starting a new one. Scans run on a one-thread
+    executor, so a process never runs more than one at a time.
+    """
+
+    def __init__(self, trigger="manual"):
+        self.trigger_name = trigger
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan")
+        self._lock = threading.Lock()
+        self._future = None
+        self._run_id = None
+
+    def trigger(self):
+        """
+        Starts a scan, or joins the one in flight.
+
+        Returns:
+            tuple: (scan_id, started). scan_id is the status store's run ID (None if it is unknown,
+            e.g. the status store is unavailable); started is False when an existing scan was joined.
+        """
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                return self._run_id, False
+
+            lock = ScanLock()
+            if not lock.acquire():
+                try:
+                    running = status_store.running_run()
+                except sqlite3.Error:
+                    running = None
+                return (running["run_id"] if running else None), False
+
+            try:
+                run_id = _start_locked_run(self.trigger_name)
+                self._future = self._executor.submit(self._run, run_id, lock)
+            except Exception:
+                lock.release()
+                raise
+            self._run_id = run_id
+            return run_id, True
+
+    def _run(self, run_id, lock):
+        try:
+            jobs = _run_scan(self.trigger_name, run_id)
+            logging.info(f"{self.trigger_name.capitalize()} scan {run_id} completed. Found {jobs} jobs.")
+        except Exception as e:
+            logging.error(f"Error during {self.trigger_name} scan {run_id}: {e}", exc_info=True)
+        finally:
+            lock.release()
@@ -0,0 +1,113 @@
+# shared/scheduling.py
+
+import logging
+import sqlite3
+import time
+
+from shared import config, sources, status_store
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _clamp(interval):
+    return min(max(interval, config.SCHEDULE_MIN_INTERVAL_HOURS * 60 * 60), config.SCHEDULE_MAX_INTERVAL_HOURS * 60 * 60)
+
+
+def term_groups(terms, count):
+    """Splits terms into at most count contiguous groups of near-equal size, keeping their order."""
+    count = max(1, min(count, len(terms)))
+    size, extra = divmod(len(terms), count)
+    groups = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(list(terms[start:end]))
+        start = end
+    return groups
+
+
+class ScheduledUnit:
+    """
+    One independently scheduled slice of the crawl: one source and a group of search terms.
+
+    Its interval between runs adapts to what its runs find: a run with new jobs shortens it by
+    config.SCHEDULE_SPEEDUP, a run without any lengthens it by config.SCHEDULE_BACKOFF, within
+    SCHEDULE_MIN_INTERVAL_HOURS and SCHEDULE_MAX_INTERVAL_HOURS. The cadence is saved in the status
+    store (save()) and picked up again by plan_units, so it survives a restart of the worker.
+    """
+
+    def __init__(self, source_name, group, terms, interval=None, last_new_jobs=None, last_run_at=None):
+        """
+        Args:
+            source_name (str): Name of the source (see shared/sources REGISTRY).
+            group (int): Index of the term group, part of the unit's ID.
+            terms (list): The search terms crawled on the source by this unit.
+            interval (float): Starting interval in seconds; defaults to config.SCHEDULE_INTERVAL_HOURS.
+            last_new_jobs (int): New jobs found by the unit's last run, if known.
+            last_run_at (float): When the unit's last run finished, if known.
+        """
+        self.source_name = source_name
+        self.group = group
+        self.terms = terms
+        self.interval = interval if interval is not None else config.SCHEDULE_INTERVAL_HOURS * 60 * 60
+        self.last_new_jobs = last_new_jobs
+        self.last_run_at = last_run_at
+        self.id = f"{source_name}-{group}"
+
+    def record(self, new_jobs, now=None):
+        """
+        Adapts the interval to the outcome of a run. new_jobs is None for a run that was skipped
+        or failed, which leaves the interval unchanged.
+
+        Returns:
+            bool: True if the interval changed.
+        """
+        if new_jobs is None:
+            return False
+        self.last_new_jobs = new_jobs
+        self.last_run_at = now if now is not None else time.time()
+        factor = config.SCHEDULE_SPEEDUP if new_jobs > 0 else config.SCHEDULE_BACKOFF
+        interval = _clamp(self.interval * factor)
+        changed = interval != self.interval
+        self.interval = interval
+        return changed
+
+    def save(self, next_run_at=None):
+        """Saves the unit's cadence (and its next run time, if given) in the status store."""
+        status_store.save_schedule_unit(self.id, self.interval, self.last_new_jobs, self.last_run_at, next_run_at)
+
+    def __repr__(self):
+        return f"ScheduledUnit({self.id}, {len(self.terms)} terms, every {self.interval / 3600:.1f}h)"
+
+
+def plan_units(terms, source_names=None, groups=None):
+    """
+    Returns the ScheduledUnits of the crawl: every enabled source (config.ENABLED_SOURCES by default)
+    times every group of terms (config.SCHEDULE_TERM_GROUPS groups), interleaved by group so that
+    consecutive start times go to different sources.
+
+    Units saved by an earlier worker (ScheduledUnit.save) resume their interval, within the current
+    SCHEDULE_MIN/MAX_INTERVAL_HOURS, and their last outcome.
+    """
+    try:
+        saved = status_store.schedule_units()
+    except sqlite3.Error as e:
+        logging.error(f"Could not load the saved schedule, every unit starts at the default interval: {e}", exc_info=True)
+        saved = {}
+
+    specs = sources.enabled_sources(source_names)
+    grouped = term_groups(list(terms), groups or config.SCHEDULE_TERM_GROUPS)
+    units = []
+    for i, group in enumerate(grouped):
+        for spec in specs:
+            state = saved.get(f"{spec.name}-{i}")
+            if state is None:
+                units.append(ScheduledUnit(spec.name, i, group))
+            else:
+                units.append(ScheduledUnit(spec.name, i, group, _clamp(state["interval"]), state["last_new_jobs"], state["last_run_at"]))
+    return units
+
+
+def start_offsets(units):
+    """Returns, per unit, the delay in seconds before its first run, spread evenly over its interval."""
+    return [(i + 1) * unit.interval / len(units) for i, unit in enumerate(units)]
@@ -0,0 +1,124 @@
+# shared/scoring.py
+
+import logging
+import math
+import re
+import time
+
+import numpy as np
+
+from shared import config, metrics
+from shared.search_index import word_variants
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_WORD_PATTERN = re.compile(r"\w+")
+# Words that carry no meaning in the category phrases ("piano for song", "English to Hebrew").
+_STOPWORDS = {"a", "an", "and", "for", "in", "of", "on", "the", "to", "with", "את", "של", "עם"}
+# Two-word phrases are more specific than single words and weigh this much more.
+_BIGRAM_WEIGHT = 2.0
+
+
+def _word_forms(text):
+    """Returns, per word of the text, the set of its forms (itself and its Hebrew stems)."""
+    return [
+        {word, *word_variants(word)}
+        for word in _WORD_PATTERN.findall(text.lower())
+        if word not in _STOPWORDS
+    ]
+
+
+def terms(text):
+    """Returns the set of single words and adjacent word pairs of a text, in every form."""
+    forms = _word_forms(text)
+    found = set()
+    for i, current in enumerate(forms):
+        found |= current
+        if i + 1 < len(forms):
+            found |= {f"{a} {b}" for a in current for b in forms[i + 1]}
+    return found
+
+
+class CategoryScorer:
+    """
+    Scores jobs against the phrases of config.JOB_CATEGORIES.
+
+    The phrases are turned once into a weight matrix (categories x terms): every word and word pair
+    of a category's phrases gets an inverse-category-frequency weight (a term used by every category,
+    like "recording", tells little), word pairs weigh _BIGRAM_WEIGHT times more, and each category's
+    weights sum to 1. A batch of jobs becomes a 0/1 matrix (jobs x terms) of the terms found in their
+    title and description, and one matrix product scores every job against every category.
+
+    A job's score for a category is the weighted share of the category's terms it mentions (0 to 1);
+    its category is the best-scoring one, or None if no term matched.
+    """
+
+    def __init__(self, categories=None):
+        categories = categories if categories is not None else config.JOB_CATEGORIES
+        self.names = list(categories)
+        category_terms = [set().union(*(self._phrase_terms(phrase) for phrase in phrases)) for phrases in categories.values()]
+
+        vocabulary = sorted(set().union(*category_terms))
+        self.columns = {term: i for i, term in enumerate(vocabulary)}
+        weights = np.zeros((len(self.names), len(vocabulary)), dtype=np.float32)
+        for row, found in enumerate(category_terms):
+            for term in found:
+                frequency = sum(1 for other in category_terms if term in other)
+                idf = math.log((1 + len(self.names)) / (1 + frequency)) + 1
+                weights[row, self.columns[term]] = idf * (_BIGRAM_WEIGHT if " " in term else 1.0)
+        totals = weights.sum(axis=1, keepdims=True)
+        self.weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+
+    @staticmethod
+    def _phrase_terms(phrase):
+        # Phrases are matched by their words and pairs in their own form; the jobs' text is expanded.
+        words = [word for word in _WORD_PATTERN.findall(phrase.lower()) if word not in _STOPWORDS]
+        return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+    def vectorize(self, jobs):
+        """Returns the (jobs x terms) 0/1 matrix of the category terms each job's title and description mention."""
+        matrix = np.zeros((len(jobs), len(self.columns)), dtype=np.float32)
+        for row, job in enumerate(jobs):
+            found = terms(f"{job.get('title', '')}\n{job.get('description', '')}")
+            columns = [self.columns[term] for term in found if term in self.columns]
+            matrix[row, columns] = 1.0
+        return matrix
+
+    def score(self, jobs):
+        """
+        Scores a batch of jobs against every category.
+
+        Returns:
+            tuple: (categories, scores): per job, the best category's name (None if nothing matched)
+                and its score.
+        """
+        if not jobs:
+            return [], []
+        scores = self.vectorize(jobs) @ self.weights.T # jobs x categories
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(jobs)), best]
+        categories = [self.names[i] if s > 0 else None for i, s in zip(best, best_scores)]
+        return categories, [round(float(s), 4) for s in best_scores]
+
+    def annotate(self, jobs):
+        """Sets 'category' and 'relevance' (the score) on every job of a batch, in place."""
+        start = time.perf_counter()
+        categories, scores = self.score(jobs)
+        for job, category, score in zip(jobs, categories, scores):
+            job["category"] = category
+            job["relevance"] = score
+        metrics.inc("job_bot_scoring_seconds_total", amount=time.perf_counter() - start)
+
+    def iter_scored(self, jobs, batch_size=None):
+        """Lazily annotates a stream of jobs in batches of batch_size (config.SCORING_BATCH_SIZE)."""
+        batch_size = batch_size or config.SCORING_BATCH_SIZE
+        batch = []
+        for job in jobs:
+            batch.append(job)
+            if len(batch) >= batch_size:
+                self.annotate(batch)
+                yield from batch
+                batch = []
+        if batch:
+            self.annotate(batch)
+            yield from batch
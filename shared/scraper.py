@@ -1,12 +1,19 @@
 # shared/scraper.py
 
 import logging
-# from shared.sources import upwork # Upwork is disabled due to persistent 403 errors
-from shared.sources import alljobs
-# from shared.sources import fiverr # Fiverr is disabled due to persistent 403 errors
-# from shared.sources import jobmaster # JobMaster is disabled due to persistent 404 errors
-from shared.sources import janglo
-from shared.email_sender import send_email # Ensure this is the correct email sender utility
+import sqlite3
+from collections import Counter
+
+from shared.email_sender import Mailer
+from shared.engine import ScrapeEngine
+from shared.enrichment import Enricher
+from shared.near_duplicates import NearDuplicateIndex
+from shared.scoring import CategoryScorer
+from shared.work_queue import QueuedEngine
+from shared.query_planner import QueryPlanner
+from shared import config, job_store, page_archive, rate_limit, sources
+from shared.digest import DigestBuilder
+from shared.utils import generate_job_id, iter_relevant_jobs
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -49,56 +56,231 @@ SCRAPE_TERMS = [
     "זמרת לאולפן"
 ]
 
-def run_scraper_and_email():
+def iter_scraped_jobs(engine, terms, stats, on_unit=None):
     """
-    Orchestrates the scraping process, aggregates jobs, and sends email notifications.
+    Stage 1: yields every job from every (term, source, page) unit as soon as the unit finishes.
+    on_unit, if given, is called with each UnitResult (failed units included) to report progress.
+    """
+    for result in engine.iter_units(terms):
+        if on_unit is not None:
+            on_unit(result)
+        stats["dropped"] += result.dropped
+        if result.jobs is not None:
+            stats["scraped"] += len(result.jobs) + result.dropped
+        if result.jobs:
+            yield from result.jobs
+
+
+def iter_unique_jobs(jobs, stats):
+    """Stage 2: drops repeats of a job already yielded in this run (e.g. found under several terms)."""
+    seen_ids = set()
+    for job in jobs:
+        job_id = generate_job_id(job)
+        if job_id in seen_ids:
+            stats["duplicates"] += 1
+            continue
+        seen_ids.add(job_id)
+        yield job
+
+
+def _email_digest(digest):
+    """
+    Sends a digest over one SMTP connection: first any digests queued by an earlier failed run,
+    then this one (if it has jobs), split into several messages if it exceeds config.EMAIL_MAX_BYTES.
+
+    Returns:
+        bool: True unless the digest could not be sent or queued in the outbox.
+    """
+    try:
+        with Mailer() as mailer:
+            mailer.drain_outbox()
+            if len(digest):
+                delivered = mailer.send_digest(EMAIL_RECIPIENTS, digest)
+                logging.info(f"Digest of {len(digest)} job postings: {delivered} message(s) sent to {', '.join(EMAIL_RECIPIENTS)}.")
+            else:
+                logging.info("No new job postings found. Email not sent.")
+        return True
+    except Exception as e:
+        logging.error(f"Failed to send email: {e}", exc_info=True)
+        return False
+
+
+def run_scraper_and_email(on_unit=None, terms=None, source_names=None, queue=None, lease=None, defer_digest=False):
+    """
+    Orchestrates the scraping process, filters and de-duplicates jobs, and sends email notifications.
+    Only relevant jobs not seen by a previous run are emailed and returned.
+    on_unit, if given, is called with every finished (term, source, page) unit, e.g. to record progress.
+    terms and source_names restrict the run to a subset of SCRAPE_TERMS and ENABLED_SOURCES
+    (e.g. to profile one source on its own).
+    queue, if given, is the work queue (shared/work_queue.py): pages are then crawled by the
+    worker pool rather than in this process, and everything after the crawl still runs here.
+    lease, the leader lease of a queued run, aborts the run with work_queue.LeadershipLost if
+    another process takes it over before the crawl is done.
+    defer_digest holds the new jobs in the job store for the next send_pending_digest instead of
+    emailing them now, so the worker's many small scheduled runs make one periodic digest. A run
+    that emails its digest sends the jobs held so far along with it.
+
+    The stages are chained generators: scrape -> in-run dedup -> (optional) detail enrichment ->
+    category scoring -> relevance filter -> cross-run dedup -> near-duplicate collapsing -> digest. Jobs flow downstream as soon as their page is parsed, so filtering starts
+    before the last fetch finishes, and only the kept jobs are held in memory.
     """
-    all_found_jobs = []
-    
     logging.info("Starting job scraping process...")
 
-    # Iterate over each search term and scrape from defined sources
-    for term in SCRAPE_TERMS:
-        logging.info(f"Scraping for term: '{term}'")
-
-        # --- AllJobs Scraping ---
-        logging.info(f"  Scraping 'alljobs.co.il' for term: '{term}'")
-        alljobs_jobs = alljobs.scrape_alljobs(term)
-        logging.info(f"    Found {len(alljobs_jobs)} raw jobs from alljobs.co.il for '{term}'")
-        all_found_jobs.extend(alljobs_jobs)
-
-        # --- Janglo Scraping ---
-        logging.info(f"  Scraping 'janglo.net' for term: '{term}'")
-        janglo_jobs = janglo.scrape_janglo(term)
-        logging.info(f"    Found {len(janglo_jobs)} raw jobs from janglo.net for '{term}'")
-        all_found_jobs.extend(janglo_jobs)
-
-        # Note: Upwork, Fiverr, and JobMaster are temporarily disabled due to persistent scraping issues.
-        # If you'd like to re-enable them in the future, we may need to explore more advanced
-        # scraping techniques (e.g., headless browsers) or debug their specific site structures.
-
-    logging.info(f"Total jobs found across all sources and terms: {len(all_found_jobs)}")
-
-    if all_found_jobs:
-        email_body_html = "<h1>New Job Postings Found:</h1><ul>"
-        for job in all_found_jobs:
-            # Ensuring the link is present before creating the anchor tag
-            job_link_html = f"<a href='{job['link']}'>{job['title']}</a>" if job.get('link') else job['title']
-            email_body_html += f"<li>{job_link_html}<br>{job['description'][:200]}...</li>"
-        email_body_html += "</ul>"
-        
-        subject = f"New Job Postings - {len(all_found_jobs)} jobs found!"
-        
-        try:
-            send_email(EMAIL_RECIPIENTS, subject, email_body_html)
-            logging.info(f"Email sent to {', '.join(EMAIL_RECIPIENTS)} with {len(all_found_jobs)} job postings.")
-        except Exception as e:
-            logging.error(f"Failed to send email: {e}", exc_info=True)
+    # Every (term, source, page) unit is scheduled on the engine. Different hosts run
+    # side by side, so the run takes roughly as long as the slowest single host.
+    # Which sources run is configured in shared/config.py (ENABLED_SOURCES).
+    # The query planner skips terms whose listings other terms already cover and stops
+    # paginating when a page only repeats listings seen earlier in the run.
+    # Each host's learned pace and circuit breaker carry over from the previous run, so a host
+    # that is down costs one probe request per cooldown rather than a full crawl of failures.
+    planner = QueryPlanner()
+    try:
+        host_states = rate_limit.load_host_states()
+    except sqlite3.Error as e:
+        logging.error(f"Failed to load host health, starting every host afresh: {e}", exc_info=True)
+        host_states = {}
+    if queue is not None:
+        engine = QueuedEngine(queue, sources.enabled_sources(source_names), planner, host_states, lease)
     else:
-        logging.info("No new job postings found. Email not sent.")
+        engine = ScrapeEngine(sources.enabled_sources(source_names), planner, host_states)
+
+    stats = Counter()
+    filter_stats = Counter()
+    stream = iter_scraped_jobs(engine, terms or SCRAPE_TERMS, stats, on_unit)
+    stream = iter_unique_jobs(stream, stats)
+
+    # Optionally read the full description from each plausible job's detail page before filtering.
+    enricher = None
+    if config.ENRICH_DETAILS:
+        try:
+            enricher = Enricher(engine)
+        except sqlite3.Error as e:
+            logging.error(f"Detail cache unavailable, filtering on card text only: {e}", exc_info=True)
+    if enricher is not None:
+        stream = enricher.iter_enriched(stream)
+
+    # Every job gets a category and a relevance score, scored in batches; the digest is grouped
+    # and ranked by them, and the filter can use the score (config.RELEVANCE_MIN_SCORE).
+    stream = CategoryScorer().iter_scored(stream)
+    stream = iter_relevant_jobs(stream, filter_stats)
+
+    # Only email jobs that no earlier run has seen.
+    try:
+        recorder = job_store.JobRecorder()
+    except sqlite3.Error as e:
+        logging.error(f"Job store unavailable, emailing every relevant job found this run: {e}", exc_info=True)
+        recorder = None
+    if recorder is not None:
+        stream = recorder.iter_new(stream)
+
+    # The same posting on several sites (or reworded) becomes one digest entry linking to each.
+    try:
+        near_duplicates = NearDuplicateIndex()
+    except sqlite3.Error as e:
+        logging.error(f"Near-duplicate index unavailable, emailing near-duplicates separately: {e}", exc_info=True)
+        near_duplicates = None
+    if near_duplicates is not None:
+        stream = near_duplicates.iter_collapsed(stream)
+
+    digest = DigestBuilder()
+    new_jobs = []
+    completed = False
+    try:
+        for job in stream:
+            digest.add(job)
+            new_jobs.append(job)
+        completed = True
+    finally:
+        # An aborted run (e.g. work_queue.LeadershipLost) drops its unwritten batch, whose jobs stay
+        # new for the next run; the batches already written hold their jobs for a later digest.
+        if recorder is not None:
+            recorder.close(commit=completed)
+        if enricher is not None:
+            enricher.close()
+
+    # Each piece of crawl history is saved on its own, so one failing save does not cost the others
+    # (e.g. unsaved near-duplicate signatures would let the next run email the same postings again).
+    saves = [
+        ("query planner history", planner.save),
+        ("host health", lambda: rate_limit.save_host_states(engine.host_states())),
+    ]
+    if near_duplicates is not None:
+        saves.append(("near-duplicate index", near_duplicates.save))
+    if recorder is not None:
+        saves.append(("job store pruning", job_store.prune))
+    if config.ARCHIVE_PAGES:
+        saves.append(("page archive pruning", page_archive.get_archive().prune))
+    for name, save in saves:
+        try:
+            save()
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Failed to save {name}: {e}", exc_info=True)
+
+    logging.info(f"Total jobs found across all sources and terms: {stats['scraped']} "
+                 f"({stats['dropped']} dropped by title while parsing, {stats['duplicates']} repeats within the run, "
+                 f"filter: {dict(filter_stats)}, {len(new_jobs)} new).")
+
+    # The run's final jobs are held for the digest in place of the entries the recorder held as it
+    # went. The digest then goes out from the held jobs, with any held earlier (by scheduled runs,
+    # by a run that aborted, or recovered from the page archive), unless it is deferred.
+    try:
+        job_store.add_pending(new_jobs, replacing=recorder.held_ids if recorder is not None else ())
+    except sqlite3.Error as e:
+        logging.error(f"Could not hold the new jobs for the digest, emailing them now: {e}", exc_info=True)
+        _email_digest(digest)
+        return new_jobs
 
-    return all_found_jobs
+    if defer_digest:
+        logging.info(f"{len(new_jobs)} new job postings held for the next digest.")
+        return new_jobs
+    try:
+        send_pending_digest()
+    except sqlite3.Error as e:
+        logging.error(f"Failed to send the held jobs: {e}", exc_info=True)
+    return new_jobs
+
+
+def send_pending_digest(lease=None):
+    """
+    Emails the jobs held by runs with defer_digest as one digest, and releases them once it has
+    been sent or queued in the outbox. lease, if given, must still be held (see
+    work_queue.LeaderLease.check), so only the leader sends.
+
+    Returns:
+        int: Number of jobs in the digest.
+    """
+    pending = job_store.pending_jobs()
+    if lease is not None:
+        lease.check()
+    digest = DigestBuilder()
+    for job in pending.values():
+        digest.add(job)
+    if _email_digest(digest) and pending:
+        job_store.remove_pending(pending)
+    return len(pending)
 
 if __name__ == '__main__':
-    logging.info("Running scraper manually (for testing purposes).")
-    run_scraper_and_email()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the scraper once.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run under cProfile and tracemalloc and write reports (see shared/profiling.py).")
+    parser.add_argument("--fixtures", metavar="DIR",
+                        help="Replay recorded fixtures (shared/replay.py) instead of the live sites, without politeness "
+                             "delays, with a scratch job store and no real email.")
+    parser.add_argument("--report-dir", help="Where --profile writes its reports (default: DATA_DIR/profiles/<timestamp>).")
+    parser.add_argument("--terms", nargs="+", help="Only these search terms (default: all SCRAPE_TERMS).")
+    parser.add_argument("--sources", nargs="+", help="Only these sources (default: ENABLED_SOURCES).")
+    parser.add_argument("--top", type=int, default=40, help="Number of functions and allocation sites in the reports.")
+    args = parser.parse_args()
+
+    if args.profile:
+        from shared.profiling import profile_run
+        profile_run(args.report_dir, args.fixtures, args.terms, args.sources, args.top)
+    elif args.fixtures:
+        from shared.benchmark import offline_environment
+        with offline_environment(args.fixtures):
+            run_scraper_and_email(terms=args.terms, source_names=args.sources)
+    else:
+        logging.info("Running scraper manually (for testing purposes).")
+        run_scraper_and_email(terms=args.terms, source_names=args.sources)
@@ -0,0 +1,185 @@
+# shared/search_index.py
+
+import base64
+import logging
+import re
+import sqlite3
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Full-text index over the job store's jobs table (shared/job_store.py installs it on connect).
+# Rows are keyed by jobs.rowid and kept in sync by triggers; the jobs table is only ever
+# vacuumed incrementally, which keeps rowids stable. After a full VACUUM, call rebuild().
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+    title, description,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts (rowid, title, description)
+    VALUES (new.rowid, search_text(new.title), search_text(new.description));
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF title, description ON jobs BEGIN
+    UPDATE jobs_fts SET title = search_text(new.title), description = search_text(new.description)
+    WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+    DELETE FROM jobs_fts WHERE rowid = old.rowid;
+END;
+"""
+
+_WORD_PATTERN = re.compile(r"\w+")
+# Hebrew attaches one-letter prepositions, conjunctions and the article to the next word
+# (e.g. "באולפן" = "in the studio"). Words are indexed with up to two of them stripped as well.
+_HEBREW_PROCLITICS = "ובהלמשכ"
+_HEBREW_WORD = re.compile(r"^[\u05d0-\u05ea\u05f0-\u05f2]+$")
+_MIN_STEM_LENGTH = 3
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def word_variants(word):
+    """Returns a Hebrew word without its leading proclitics (up to two), e.g. "באולפן" -> ["אולפן"]."""
+    if not _HEBREW_WORD.match(word):
+        return []
+    variants = []
+    stem = word
+    for _ in range(2):
+        if stem[0] in _HEBREW_PROCLITICS and len(stem) - 1 >= _MIN_STEM_LENGTH:
+            stem = stem[1:]
+            variants.append(stem)
+        else:
+            break
+    return variants
+
+
+def search_text(text):
+    """
+    Returns the text to index for a title or description: the text itself, followed by the
+    variants of its Hebrew words without leading proclitics, so "אולפן" finds "באולפן".
+    """
+    if not text:
+        return text or ""
+    variants = [variant for word in _WORD_PATTERN.findall(text) for variant in word_variants(word)]
+    return f"{text} {' '.join(variants)}" if variants else text
+
+
+def install(conn):
+    """
+    Creates the index and its triggers on a job store connection and registers the search_text()
+    SQL function the triggers call. Every connection that writes to jobs needs this, which
+    job_store.connect() does. The index is filled from the existing jobs the first time.
+
+    Returns:
+        bool: False if this SQLite build has no FTS5 (jobs are then stored but not searchable).
+    """
+    conn.create_function("search_text", 1, search_text, deterministic=True)
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'jobs_fts'").fetchone() is not None
+    try:
+        conn.executescript(_SCHEMA)
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Full-text search unavailable (SQLite built without FTS5?): {e}")
+        return False
+    if not exists:
+        rebuild(conn)
+    return True
+
+
+def rebuild(conn):
+    """Re-indexes every job from scratch."""
+    with conn:
+        conn.execute("DELETE FROM jobs_fts")
+        conn.execute(
+            "INSERT INTO jobs_fts (rowid, title, description) "
+            "SELECT rowid, search_text(title), search_text(description) FROM jobs"
+        )
+
+
+def build_match_query(query):
+    """
+    Turns free text into an FTS5 query: every word must match, each as a prefix
+    (so "record" also finds "recording"). Returns None if the text has no words.
+    """
+    words = _WORD_PATTERN.findall(query or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _encode_cursor(first_seen, rowid):
+    return base64.urlsafe_b64encode(f"{first_seen}:{rowid}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        first_seen, rowid = base64.urlsafe_b64decode(padded).decode("ascii").split(":")
+        return int(first_seen), int(rowid)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def search(conn, query=None, platform=None, since=None, until=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Searches the stored jobs, newest first (by the time they were first seen).
+
+    Args:
+        conn (sqlite3.Connection): A job store connection (job_store.connect()).
+        query (str): Keywords, matched against title and description. Empty lists every job.
+        platform (str): Only jobs from this platform, e.g. "AllJobs".
+        since (int): Only jobs first seen at or after this epoch timestamp.
+        until (int): Only jobs first seen before this epoch timestamp.
+        cursor (str): The next_cursor of the previous page, to continue from there.
+        limit (int): Page size, capped at MAX_PAGE_SIZE.
+
+    Returns:
+        dict: {"jobs": [job dicts], "next_cursor": str or None when there are no more results}.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    clauses, params = [], []
+
+    match_query = build_match_query(query)
+    if match_query is not None:
+        source = "jobs_fts JOIN jobs ON jobs.rowid = jobs_fts.rowid"
+        clauses.append("jobs_fts MATCH ?")
+        params.append(match_query)
+    else:
+        source = "jobs"
+    if platform:
+        clauses.append("jobs.platform = ?")
+        params.append(platform)
+    if since is not None:
+        clauses.append("jobs.first_seen >= ?")
+        params.append(int(since))
+    if until is not None:
+        clauses.append("jobs.first_seen < ?")
+        params.append(int(until))
+    if cursor:
+        clauses.append("(jobs.first_seen, jobs.rowid) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"""
+        SELECT jobs.rowid AS row_id, jobs.job_id, jobs.platform, jobs.title, jobs.link, jobs.description,
+               jobs.first_seen, jobs.last_seen
+        FROM {source} {where}
+        ORDER BY jobs.first_seen DESC, jobs.rowid DESC
+        LIMIT ?
+        """,
+        params + [limit + 1],
+    ).fetchall()
+
+    jobs = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = jobs[-1]
+        next_cursor = _encode_cursor(last["first_seen"], last["row_id"])
+    for job in jobs:
+        del job["row_id"]
+    return {"jobs": jobs, "next_cursor": next_cursor}
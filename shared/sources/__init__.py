@@ -0,0 +1,32 @@
+# shared/sources/__init__.py
+
+import logging
+
+from shared import config
+from shared.sources import alljobs, fiverr, janglo, jobmaster
+
+# Every known source, keyed by SourceSpec.name. To add a site, write a SourceSpec
+# module next to the others and list it here; to turn one on or off, edit
+# config.ENABLED_SOURCES (or the JOB_BOT_SOURCES environment variable).
+REGISTRY = {spec.name: spec for spec in (alljobs.SPEC, janglo.SPEC, fiverr.SPEC, jobmaster.SPEC)}
+
+
+def get_source(name):
+    """Returns the SourceSpec registered under name (raises KeyError if unknown)."""
+    return REGISTRY[name]
+
+
+def enabled_sources(names=None):
+    """
+    Returns the SourceSpecs to crawl, in configured order.
+    Unknown names are logged and skipped rather than failing the whole run.
+    """
+    names = names if names is not None else config.ENABLED_SOURCES
+    specs = []
+    for name in names:
+        spec = REGISTRY.get(name)
+        if spec is None:
+            logging.warning(f"Unknown source '{name}' in ENABLED_SOURCES; skipping it.")
+            continue
+        specs.append(spec)
+    return specs
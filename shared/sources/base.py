@@ -0,0 +1,180 @@
+# shared/sources/base.py
+
+import logging
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import requests
+
+from shared import http_client, metrics, page_archive
+from shared.parsing import CardSelector, parse_cards, declared_encoding
+from shared.utils import reject_early
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+@dataclass(frozen=True)
+class FieldSelector:
+    """
+    Locates one field inside a listing card: card.find(tags, class_=classes).
+    tags and classes may each be a single string or a tuple of alternatives.
+    """
+    tags: object
+    classes: object
+
+    def find(self, card):
+        return card.find(self.tags, class_=self.classes)
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    """
+    Declarative description of a job site. Everything site-specific lives here;
+    fetching, parsing and normalizing are done by the shared functions in this module.
+    """
+    name: str # Registry key, e.g. "alljobs"
+    platform: str # Stored on every job; part of the job ID used for de-duplication
+    base_url: str # Prepended to relative links
+    search_url: str # Template with {query} and (optionally) {page} placeholders
+    card_selectors: tuple # CardSelector entries, in fallback order
+    title_selectors: tuple # FieldSelector entries, first hit wins
+    link_selectors: tuple
+    description_selectors: tuple = ()
+    # Use the title as description (search pages without body text, e.g. Fiverr).
+    description_from_title: bool = False
+    # FieldSelector entries locating the full description on a listing's own page, first hit wins.
+    # Only sources with detail selectors are enriched (shared/enrichment.py, config.ENRICH_DETAILS).
+    detail_selectors: tuple = ()
+    # Query encoding: replace spaces with '+' before quoting, and which characters quote() leaves alone.
+    space_as_plus: bool = True
+    quote_safe: str = "/"
+    # Combined queries: if the site's search understands an OR-style operator, set query_joiner
+    # (e.g. " OR ") and the query planner may merge up to max_terms_per_query terms into one search.
+    query_joiner: str = ""
+    max_terms_per_query: int = 1
+    # --- Politeness budget (enforced by shared/engine.py) ---
+    max_pages: int = 1
+    # Hard cap for incremental crawling: when every listing on a page is new since the last run,
+    # the query planner keeps paginating past max_pages up to this depth. Leave at 1 for sites
+    # whose search URL has no {page} placeholder.
+    max_depth: int = 1
+    max_concurrency: int = 1
+    # Seconds between requests: pacing starts at the middle of delay_range and adapts to the host
+    # (shared/rate_limit.py), speeding up to min_delay while responses are healthy.
+    delay_range: tuple = (3, 7)
+    min_delay: float = 1.0
+    # Free-form notes (e.g. why a source is disabled); not used by the engine.
+    notes: str = field(default="", compare=False)
+
+    @property
+    def host(self):
+        return urlsplit(self.base_url).netloc
+
+
+def build_search_url(spec, search_term, page_num=1):
+    """Builds the results-page URL for a term and 1-based page number."""
+    query = search_term.replace(" ", "+") if spec.space_as_plus else search_term
+    query = requests.utils.quote(query, safe=spec.quote_safe)
+    return spec.search_url.format(query=query, page=page_num)
+
+
+def _first_match(card, selectors):
+    for selector in selectors:
+        tag = selector.find(card)
+        if tag:
+            return tag
+    return None
+
+
+def iter_results(spec, content, encoding=None, search_term="", page_num=1, listings=None):
+    """
+    Extracts normalized job dicts from a results page body, yielding each job
+    as soon as its card has been read.
+
+    The relevance rules that a title alone can decide (utils.reject_early) are applied here:
+    such cards are dropped before their description is extracted and never reach the filter.
+
+    Args:
+        listings (list): Optional list receiving every listing on the page, dropped or not, in page
+            order, as a job dict without description. The query planner needs all of them.
+
+    Yields:
+        dict: Job dicts with 'title', 'description', 'link' and 'platform' keys.
+    """
+    job_listings = parse_cards(content, spec.card_selectors, encoding)
+    labels = {"source": spec.name}
+    metrics.inc("job_bot_pages_parsed_total", labels)
+    metrics.inc("job_bot_cards_found_total", labels, len(job_listings))
+
+    if not job_listings:
+        metrics.inc("job_bot_empty_pages_total", labels)
+        logging.warning(f"    No job listings found on {spec.platform} for '{search_term}' on page {page_num}. HTML might have changed or content loaded via JS.")
+        return
+
+    for job_card in job_listings:
+        title_tag = _first_match(job_card, spec.title_selectors)
+        link_tag = _first_match(job_card, spec.link_selectors)
+
+        if title_tag and link_tag:
+            job_title = title_tag.get_text(strip=True)
+            job_link = link_tag.get('href')
+            if job_link and not job_link.startswith('http'):
+                # Links are often relative, need to prepend base URL
+                job_link = spec.base_url + job_link
+            if listings is not None:
+                listings.append({"title": job_title, "link": job_link, "platform": spec.platform})
+
+            rejection = reject_early(job_title)
+            if rejection is not None:
+                metrics.inc("job_bot_cards_dropped_total", {**labels, "rule": rejection.rule})
+                continue
+
+            if spec.description_from_title:
+                full_description = job_title
+            else:
+                description_tag = _first_match(job_card, spec.description_selectors)
+                full_description = description_tag.get_text(strip=True) if description_tag else ""
+
+            yield {
+                "title": job_title,
+                "description": full_description,
+                "link": job_link,
+                "platform": spec.platform,
+            }
+        else:
+            logging.debug(f"    Skipping malformed job card on {spec.platform}: {job_card.get_text(strip=True)[:100]}...")
+
+
+def parse_results(spec, content, encoding=None, search_term="", page_num=1, listings=None):
+    """List form of iter_results."""
+    return list(iter_results(spec, content, encoding, search_term, page_num, listings))
+
+
+def scrape_page(spec, search_term, page_num=1, listings=None):
+    """
+    Fetches and parses a single results page.
+    Does not sleep and does not swallow network errors, so the caller decides
+    on pacing and on whether to continue with the next page.
+    listings, if given, receives every listing on the page (see iter_results).
+    The page is archived (shared/page_archive.py) before it is parsed, so it can be re-parsed later.
+    """
+    url = build_search_url(spec, search_term, page_num)
+    logging.info(f"  Attempting to scrape {spec.platform} URL: {url}")
+    response = http_client.fetch(url)
+    encoding = declared_encoding(response)
+    page_archive.archive_page(spec, search_term, page_num, url, response.content, encoding)
+    with metrics.timed("job_bot_parse_seconds", {"source": spec.name}):
+        return parse_results(spec, response.content, encoding, search_term, page_num, listings)
+
+
+def scrape(spec, search_term):
+    """
+    Scrapes every page of a source for one term, one page after the other, paced and guarded
+    like a full run (see shared/engine.py).
+    """
+    # Imported here: shared.engine imports this module.
+    from shared.engine import ScrapeEngine
+
+    jobs = ScrapeEngine([spec]).scrape_all([search_term])
+    logging.info(f"  Finished scraping {spec.platform} for '{search_term}'. Found {len(jobs)} raw jobs.")
+    return jobs
@@ -0,0 +1,373 @@
+# shared/status_store.py
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from shared import config, metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RUNNING = "running"
+SUCCEEDED = "ok"
+FAILED = "error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    trigger     TEXT NOT NULL,
+    state       TEXT NOT NULL,
+    started_at  REAL NOT NULL,
+    finished_at REAL,
+    jobs        INTEGER,
+    message     TEXT,
+    updated_at  REAL NOT NULL,
+    metrics     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_updated_at ON runs(updated_at);
+CREATE TABLE IF NOT EXISTS run_units (
+    run_id      INTEGER NOT NULL,
+    term        TEXT NOT NULL,
+    source      TEXT NOT NULL,
+    page_num    INTEGER NOT NULL,
+    jobs        INTEGER,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_run_units_run_id ON run_units(run_id);
+CREATE TABLE IF NOT EXISTS metric_totals (
+    series TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value  REAL NOT NULL,
+    PRIMARY KEY (series, labels)
+);
+CREATE TABLE IF NOT EXISTS schedule_units (
+    unit_id       TEXT PRIMARY KEY,
+    interval      REAL NOT NULL,
+    last_new_jobs INTEGER,
+    last_run_at   REAL,
+    next_run_at   REAL,
+    updated_at    REAL NOT NULL
+);
+"""
+
+
+def connect(path=None):
+    """
+    Opens the run-status store shared by the web and worker processes.
+
+    The database is in WAL mode, so the dashboard's reads never wait on a run being recorded
+    and a run being recorded never waits on the dashboard.
+    """
+    path = path or config.STATUS_STORE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL") # Durable enough for status rows, and cheaper to commit
+    conn.executescript(_SCHEMA)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+    if "metrics" not in columns: # Stores created before runs kept their metrics
+        conn.execute("ALTER TABLE runs ADD COLUMN metrics TEXT")
+    return conn
+
+
+def start_run(trigger, path=None, now=None):
+    """
+    Records the start of a scan and returns its run ID.
+
+    Args:
+        trigger (str): What started the run, e.g. "manual" or "scheduled".
+    """
+    now = now if now is not None else time.time()
+    conn = connect(path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (trigger, state, started_at, updated_at) VALUES (?, ?, ?, ?)",
+                (trigger, RUNNING, now, now),
+            )
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def _metrics_record(series):
+    """The per-run metrics record: headline numbers plus every series, keyed as they are exposed."""
+    return {
+        "summary": metrics.summarize(series),
+        "series": {f"{name}{{{labels}}}" if labels else name: value for (name, labels), value in sorted(series.items())},
+    }
+
+
+def finish_run(run_id, jobs=None, error=None, path=None, now=None, run_metrics=None):
+    """
+    Records the outcome of a run and trims the history to config.STATUS_HISTORY_SIZE runs.
+
+    Args:
+        run_id (int): ID returned by start_run.
+        jobs (int): Number of new jobs found, if the run succeeded.
+        error (str): Error message, if the run failed.
+        run_metrics (dict): The run's metric series ({(series, labels): value}, see shared/metrics.py).
+            They are saved with the run and added to the cumulative totals served at /metrics.
+    """
+    now = now if now is not None else time.time()
+    state = FAILED if error is not None else SUCCEEDED
+    conn = connect(path)
+    try:
+        with conn:
+            row = conn.execute("SELECT trigger, started_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            series = dict(run_metrics or {})
+            if row is not None:
+                series[("job_bot_runs_total", metrics.format_labels({"trigger": row["trigger"], "state": state}))] = 1
+                series[("job_bot_run_seconds_total", "")] = now - row["started_at"]
+
+            conn.execute(
+                "UPDATE runs SET state = ?, finished_at = ?, jobs = ?, message = ?, updated_at = ?, metrics = ? WHERE run_id = ?",
+                (state, now, jobs, error, now, json.dumps(_metrics_record(series), ensure_ascii=False), run_id),
+            )
+            conn.executemany(
+                """
+                INSERT INTO metric_totals (series, labels, value) VALUES (?, ?, ?)
+                ON CONFLICT(series, labels) DO UPDATE SET value = value + excluded.value
+                """,
+                [(name, labels, value) for (name, labels), value in series.items()],
+            )
+            conn.execute(
+                "DELETE FROM runs WHERE run_id <= (SELECT MAX(run_id) FROM runs) - ?",
+                (config.STATUS_HISTORY_SIZE,),
+            )
+            conn.execute("DELETE FROM run_units WHERE run_id NOT IN (SELECT run_id FROM runs)")
+    finally:
+        conn.close()
+
+
+def abandon_running_runs(path=None, now=None):
+    """
+    Marks every run still in the running state as failed. Only call this while holding the scan
+    lock (shared/scan_coordinator.py): no scan can be running then, so such rows were left behind
+    by a process that died mid-run.
+
+    Returns:
+        int: Number of runs marked as interrupted.
+    """
+    now = now if now is not None else time.time()
+    conn = connect(path)
+    try:
+        with conn:
+            return conn.execute(
+                "UPDATE runs SET state = ?, finished_at = ?, message = ?, updated_at = ? WHERE state = ?",
+                (FAILED, now, "interrupted", now, RUNNING),
+            ).rowcount
+    finally:
+        conn.close()
+
+
+def running_run(path=None):
+    """Returns the newest run still in the running state as a dict, or None."""
+    conn = connect(path)
+    try:
+        row = conn.execute("SELECT * FROM runs WHERE state = ? ORDER BY run_id DESC LIMIT 1", (RUNNING,)).fetchone()
+        return dict(row) if row is not None else None
+    finally:
+        conn.close()
+
+
+class _RunHandle:
+    """Handed out by tracked_run: collects the run's job count and records its completed units."""
+
+    def __init__(self, path=None):
+        self.run_id = None
+        self.jobs = None
+        self._path = path
+        self._conn = None
+
+    def unit_done(self, result):
+        """Records one finished (term, source, page) unit; `result` is a shared.engine.UnitResult."""
+        if self.run_id is None:
+            return
+        try:
+            if self._conn is None:
+                self._conn = connect(self._path)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO run_units (run_id, term, source, page_num, jobs, finished_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.run_id, result.term, result.source.name, result.page_num,
+                     len(result.jobs) if result.jobs is not None else None, time.time()),
+                )
+        except sqlite3.Error as e:
+            logging.warning(f"Could not record progress of run {self.run_id}: {e}")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+@contextmanager
+def tracked_run(trigger, path=None, run_id=None):
+    """
+    Context manager that records a run around its body. Set `run.jobs` to the number of jobs found
+    and pass `run.unit_done` as the scraper's on_unit callback to record progress; an exception
+    escaping the body marks the run as failed and is re-raised.
+
+        with status_store.tracked_run("scheduled") as run:
+            run.jobs = len(run_scraper_and_email(on_unit=run.unit_done))
+
+    Pass run_id to track a run already registered with start_run.
+    A status store that cannot be written is logged and otherwise ignored, so it never stops a scan.
+    """
+    run = _RunHandle(path)
+    run.run_id = run_id
+    before = metrics.snapshot()
+    if run.run_id is None:
+        try:
+            run.run_id = start_run(trigger, path)
+        except sqlite3.Error as e:
+            logging.error(f"Status store unavailable, this run will not be recorded: {e}", exc_info=True)
+
+    error = None
+    try:
+        yield run
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        raise
+    finally:
+        run.close()
+        run_metrics = metrics.diff(metrics.snapshot(), before)
+        logging.info(f"Run metrics: {metrics.summarize(run_metrics)}")
+        if run.run_id is not None:
+            try:
+                finish_run(run.run_id, jobs=run.jobs, error=error, path=path, run_metrics=run_metrics)
+            except sqlite3.Error as e:
+                logging.error(f"Failed to record the outcome of run {run.run_id}: {e}", exc_info=True)
+
+
+def version(path=None):
+    """
+    Returns a cheap token that changes whenever a run or a unit's schedule is recorded:
+    (last update time, latest run ID). Readers compare it with the token of their cached
+    snapshot before reading the history.
+    """
+    conn = connect(path)
+    try:
+        row = conn.execute(
+            """
+            SELECT MAX(COALESCE((SELECT MAX(updated_at) FROM runs), 0),
+                       COALESCE((SELECT MAX(updated_at) FROM schedule_units), 0)) AS updated_at,
+                   (SELECT MAX(run_id) FROM runs) AS run_id
+            """
+        ).fetchone()
+        return (row["updated_at"] or 0.0, row["run_id"] or 0)
+    finally:
+        conn.close()
+
+
+def recent_runs(limit=None, path=None):
+    """
+    Returns the most recent runs as dicts, newest first, with a 'duration' in seconds for finished runs
+    and their 'metrics' record ({"summary": ..., "series": ...}) decoded.
+    """
+    limit = limit or config.STATUS_HISTORY_SIZE
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+
+    runs = []
+    for row in rows:
+        run = dict(row)
+        run["duration"] = run["finished_at"] - run["started_at"] if run["finished_at"] is not None else None
+        run["metrics"] = json.loads(run["metrics"]) if run["metrics"] else None
+        runs.append(run)
+    return runs
+
+
+def run_progress(run_id, path=None):
+    """
+    Returns a run and its completed (term, source, page) units as a dict, or None if the run is unknown.
+    Units whose page failed have jobs = None.
+    """
+    conn = connect(path)
+    try:
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        units = conn.execute(
+            "SELECT term, source, page_num, jobs FROM run_units WHERE run_id = ? ORDER BY rowid", (run_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    progress = dict(row)
+    progress["metrics"] = json.loads(progress["metrics"]) if progress["metrics"] else None
+    progress["units"] = [dict(unit) for unit in units]
+    progress["units_completed"] = len(units)
+    progress["units_failed"] = sum(1 for unit in units if unit["jobs"] is None)
+    return progress
+
+
+def metric_totals(path=None):
+    """
+    Returns the cumulative metric series of every recorded run, plus gauges for the latest
+    finished run, as {(series, labels): value} ready for metrics.render().
+    """
+    conn = connect(path)
+    try:
+        values = {(row["series"], row["labels"]): row["value"] for row in conn.execute("SELECT * FROM metric_totals")}
+        last = conn.execute(
+            "SELECT * FROM runs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT 1"
+        ).fetchone()
+    finally:
+        conn.close()
+
+    if last is not None:
+        values[("job_bot_last_run_timestamp_seconds", "")] = last["finished_at"]
+        values[("job_bot_last_run_duration_seconds", "")] = last["finished_at"] - last["started_at"]
+        values[("job_bot_last_run_new_jobs", "")] = last["jobs"] or 0
+    return values
+
+
+def save_schedule_unit(unit_id, interval, last_new_jobs=None, last_run_at=None, next_run_at=None, path=None, now=None):
+    """
+    Records the cadence of one scheduled unit (shared/scheduling.py), so a restarted worker resumes
+    it and the dashboard can show it.
+
+    Args:
+        unit_id (str): The unit's ID, e.g. "alljobs-0".
+        interval (float): Current interval between its runs, in seconds.
+        last_new_jobs (int): New jobs found by its last run.
+        last_run_at (float): When its last run finished.
+        next_run_at (float): When it is due next.
+    """
+    now = now if now is not None else time.time()
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO schedule_units (unit_id, interval, last_new_jobs, last_run_at, next_run_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(unit_id) DO UPDATE SET interval = excluded.interval, last_new_jobs = excluded.last_new_jobs,
+                    last_run_at = excluded.last_run_at, next_run_at = excluded.next_run_at, updated_at = excluded.updated_at
+                """,
+                (unit_id, interval, last_new_jobs, last_run_at, next_run_at, now),
+            )
+    finally:
+        conn.close()
+
+
+def schedule_units(path=None):
+    """Returns the saved cadence of every scheduled unit as {unit ID: dict}, ordered by next run."""
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT * FROM schedule_units ORDER BY next_run_at IS NULL, next_run_at, unit_id").fetchall()
+    finally:
+        conn.close()
+    return {row["unit_id"]: dict(row) for row in rows}
@@ -1,91 +1,215 @@
 import re
-from langdetect import detect, DetectorFactory
 import hashlib
+import time
+from collections import namedtuple
 
-# Ensures consistent language detection results
-DetectorFactory.seed = 0
+from shared import config, metrics
+from shared.language import detect_language
 
-def is_relevant_job(job_title, job_description, platform_name):
+# --- Relevance rules ---
+# Rule 1: Eliminate "I will..." or "I offer..." type posts (seller offers)
+# These are common patterns for providers offering services, not clients seeking them.
+SELLER_PATTERNS = [
+    r"i will\s+\w+",
+    r"i offer\s+\w+",
+    r"i provide\s+\w+",
+    r"offering\s+\w+",
+    r"provide\s+\w+\s+service",
+    r"אני אתרגם", # Hebrew seller patterns
+    r"מציע שירותי",
+    r"למתן שירותי"
+]
+
+# Rule 2: Fiverr is notorious for seller gigs. We look for phrases indicating a client need.
+BUYER_PATTERNS = [r"i need", r"looking for", r"seeking", r"require", r"want to hire"]
+
+# Rule 4: Keywords that often indicate irrelevance, regardless of seller patterns
+IRRELEVANT_KEYWORDS = [
+    "gig", "kwork", "profile creation", "resume writing", "data entry",
+    "virtual assistant", "web research", "pdf conversion", "typing",
+    "lead generation", "social media manager", "content writer", # Exclude general content writing, focus on translation
+    "logo design", "web development", "app development", "marketing",
+    "אייפון", "אנדרואיד", "עיצוב", "קידום אתרים", "בינה מלאכותית", "בונה אתרים"
+]
+
+# Rule 5: At least one core category keyword must be present (positive filtering)
+RELEVANT_CORE_KEYWORDS = [
+    "translate", "translation", "translator", "localization", "hebrew", "english",
+    "song", "lyrics", "music", "piano", "pianist", "recording", "session", "vocal", "harmony", "singer"
+]
+
+# All keyword rules compiled once into a single alternation, one named group per rule.
+# The alternation sits inside a lookahead so finditer reports a match at every position,
+# including matches that overlap each other; a field is therefore classified in one scan.
+_RULE_MATCHER = re.compile(
+    "(?=(?:"
+    + "|".join([
+        "(?P<seller>" + "|".join(SELLER_PATTERNS) + ")",
+        "(?P<buyer>" + "|".join(BUYER_PATTERNS) + ")",
+        "(?P<irrelevant>" + "|".join(re.escape(k) for k in IRRELEVANT_KEYWORDS) + ")",
+        "(?P<core>" + "|".join(re.escape(k) for k in RELEVANT_CORE_KEYWORDS) + ")",
+    ])
+    + "))"
+)
+
+# Outcome of classify_job. rule is None for relevant jobs, otherwise the name of the rule
+# that rejected the job; match is the text that triggered it (if any).
+FilterResult = namedtuple("FilterResult", ["relevant", "rule", "match"])
+
+RULE_SELLER = "seller_pattern"
+RULE_NO_BUYER_INTENT = "fiverr_no_buyer_intent"
+RULE_IRRELEVANT = "irrelevant_keyword"
+RULE_NO_CORE_KEYWORD = "no_core_keyword"
+RULE_LANGUAGE = "language"
+RULE_LOW_SCORE = "low_score"
+
+
+def _scan_field(text):
     """
-    Applies smart filtering to eliminate irrelevant gigs based on common patterns.
+    Runs the combined matcher over one (lowercased) field.
+    Returns {group name: first matched text}. Stops early on a seller match,
+    since that rejects the job regardless of anything else.
+    """
+    found = {}
+    for m in _RULE_MATCHER.finditer(text):
+        group = m.lastgroup
+        if group not in found:
+            found[group] = m.group(group)
+            if group == "seller":
+                break
+    return found
+
+
+def classify_job(job_title, job_description, platform_name, score=None):
+    """
+    Applies smart filtering to eliminate irrelevant gigs based on common patterns,
+    and reports which rule decided.
+
+    Each field is scanned once by a precompiled matcher covering every keyword rule.
+    The cheap keyword rules are evaluated before language detection, so langdetect
+    only runs for jobs that passed everything else.
+
+    score is the job's category score (shared/scoring.py); with config.RELEVANCE_MIN_SCORE set,
+    it replaces the core-keyword rule.
+
+    Returns:
+        FilterResult: (relevant, rule, match).
     """
     title = job_title.lower()
     description = job_description.lower()
 
-    # Rule 1: Eliminate "I will..." or "I offer..." type posts (seller offers)
-    # These are common patterns for providers offering services, not clients seeking them.
-    seller_patterns = [
-        r"i will\s+\w+",
-        r"i offer\s+\w+",
-        r"i provide\s+\w+",
-        r"offering\s+\w+",
-        r"provide\s+\w+\s+service",
-        r"אני אתרגם", # Hebrew seller patterns
-        r"מציע שירותי",
-        r"למתן שירותי"
-    ]
-    for pattern in seller_patterns:
-        if re.search(pattern, title) or re.search(pattern, description):
-            return False
+    title_hits = _scan_field(title)
+    description_hits = title_hits if "seller" in title_hits else _scan_field(description)
+
+    def hit(group):
+        return title_hits.get(group) or description_hits.get(group)
+
+    # Rule 1: seller offers
+    if hit("seller"):
+        return FilterResult(False, RULE_SELLER, hit("seller"))
 
     # Rule 2: Specific Fiverr seller filter (client seeks provider)
-    # Fiverr is notorious for seller gigs. We look for phrases indicating a client need.
-    if platform_name.lower() == "fiverr":
-        if not (re.search(r"i need|looking for|seeking|require|want to hire", title) or \
-                re.search(r"i need|looking for|seeking|require|want to hire", description)):
-            return False
+    if platform_name.lower() == "fiverr" and not hit("buyer"):
+        return FilterResult(False, RULE_NO_BUYER_INTENT, None)
+
+    # Rule 4: irrelevant keywords
+    if hit("irrelevant"):
+        return FilterResult(False, RULE_IRRELEVANT, hit("irrelevant"))
+
+    # Rule 5: Ensure the job is about one of the categories (positive filtering)
+    # This helps catch jobs that slipped through other filters but are generally off-topic.
+    # With a score threshold configured, the category score decides; otherwise a core keyword must be present.
+    if config.RELEVANCE_MIN_SCORE > 0 and score is not None:
+        if score < config.RELEVANCE_MIN_SCORE:
+            return FilterResult(False, RULE_LOW_SCORE, score)
+    elif not hit("core"):
+        return FilterResult(False, RULE_NO_CORE_KEYWORD, None)
 
     # Rule 3: Basic language detection (if description is long enough)
     # Only try to detect language if there's enough text to go on.
-    # If detection fails or isn't English, filter it out.
+    # If the text is not in one of config.RELEVANT_LANGUAGES, filter it out.
+    # Language detection goes through shared/language.py, which answers clear Hebrew/English
+    # text from script statistics and caches langdetect results for everything else.
+    # A None result means detection failed (e.g., text too short/weird): don't filter based on it.
     if len(description) > 50: # Arbitrary length for more reliable detection
-        try:
-            if detect(description) != 'en':
-                return False
-        except Exception:
-            # If language detection fails (e.g., text too short/weird), don't filter based on it
-            pass
+        language = detect_language(description)
     elif len(title) > 20: # Try with title if description is too short
-        try:
-            if detect(title) != 'en':
-                return False
-        except Exception:
-            pass
-
-
-    # Rule 4: Keywords that often indicate irrelevance, regardless of seller patterns
-    irrelevant_keywords = [
-        "gig", "kwork", "profile creation", "resume writing", "data entry",
-        "virtual assistant", "web research", "pdf conversion", "typing",
-        "lead generation", "social media manager", "content writer", # Exclude general content writing, focus on translation
-        "logo design", "web development", "app development", "marketing",
-        "אייפון", "אנדרואיד", "עיצוב", "קידום אתרים", "בינה מלאכותית", "בונה אתרים"
-    ]
-    for keyword in irrelevant_keywords:
-        if keyword in title or keyword in description:
-            return False
-
-    # Rule 5: Ensure at least one core category keyword is present (positive filtering)
-    # This helps catch jobs that slipped through other filters but are generally off-topic.
-    # We define relevant keywords from the categories.
-    relevant_core_keywords = [
-        "translate", "translation", "translator", "localization", "hebrew", "english",
-        "song", "lyrics", "music", "piano", "pianist", "recording", "session", "vocal", "harmony", "singer"
-    ]
-    found_relevant_keyword = False
-    for keyword in relevant_core_keywords:
-        if keyword in title or keyword in description:
-            found_relevant_keyword = True
-            break
-    if not found_relevant_keyword:
-        return False
-
-    return True
+        language = detect_language(title)
+    else:
+        language = None
+    if language is not None and language not in config.RELEVANT_LANGUAGES:
+        return FilterResult(False, RULE_LANGUAGE, language)
+
+    return FilterResult(True, None, None)
+
+
+def reject_early(job_title, job_description=""):
+    """
+    Applies the rules that can reject a job from partial text: a seller pattern or an irrelevant
+    keyword. More text can never undo those two rules, so they are checked on a card's title while
+    parsing (shared/sources/base.py) and before fetching a detail page (shared/enrichment.py),
+    skipping the description extraction, language detection and fetches such a job would cost.
+
+    Returns:
+        FilterResult: The rejection, or None if the text given does not reject the job.
+    """
+    hits = _scan_field(job_title.lower())
+    if "seller" not in hits and job_description:
+        hits = {**_scan_field(job_description.lower()), **hits}
+    if "seller" in hits:
+        return FilterResult(False, RULE_SELLER, hits["seller"])
+    if "irrelevant" in hits:
+        return FilterResult(False, RULE_IRRELEVANT, hits["irrelevant"])
+    return None
+
+
+def is_plausible_job(job_title, job_description):
+    """True unless the title or snippet already rejects the job (see reject_early)."""
+    return reject_early(job_title, job_description) is None
+
+
+def is_relevant_job(job_title, job_description, platform_name):
+    """
+    Applies smart filtering to eliminate irrelevant gigs based on common patterns.
+    """
+    return classify_job(job_title, job_description, platform_name).relevant
+
+
+def iter_relevant_jobs(jobs, stats=None):
+    """
+    Lazily filters a stream of scraped job dicts, yielding only the relevant ones.
+
+    Args:
+        jobs (iterable): Job dicts with 'title', 'description' and 'platform' keys
+            (and 'relevance' if scored, see shared/scoring.py).
+        stats (collections.Counter): Optional counter incremented per rejecting rule
+            (and under 'relevant' for kept jobs).
+    """
+    for job in jobs:
+        start = time.perf_counter()
+        result = classify_job(job.get("title", ""), job.get("description", ""), job.get("platform", ""), job.get("relevance"))
+        metrics.inc("job_bot_filter_seconds_total", amount=time.perf_counter() - start)
+        metrics.inc("job_bot_filter_decisions_total", {"rule": result.rule or "relevant"})
+        if stats is not None:
+            stats[result.rule or "relevant"] += 1
+        if result.relevant:
+            yield job
+
+
+def filter_jobs(jobs, stats=None):
+    """
+    Batch version of is_relevant_job for a list of scraped job dicts.
+    See iter_relevant_jobs for the arguments.
+
+    Returns:
+        list: The relevant jobs, in input order.
+    """
+    return list(iter_relevant_jobs(jobs, stats))
 
 def generate_job_id(job_data):
     """Generates a unique ID for a job based on its key attributes."""
     # Using a hash of concatenated key fields to create a consistent, unique ID
-    # This helps in de-duplication across sessions if we add persistent storage.
+    # The same ID keys the persistent seen-jobs store (shared/job_store.py).
     unique_string = f"{job_data['platform']}-{job_data['title']}-{job_data['link']}".encode('utf-8')
     return hashlib.md5(unique_string).hexdigest()
 
@@ -93,7 +217,7 @@ def remove_duplicates(jobs):
     """
     Removes duplicate jobs from a list based on a generated unique ID.
     This handles de-duplication within a single scraping run.
-    For cross-run de-duplication, a persistent storage would be needed.
+    For cross-run de-duplication, see shared/job_store.record_jobs.
     """
     unique_jobs = []
     seen_ids = set()
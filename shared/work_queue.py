@@ -0,0 +1,532 @@
+# shared/work_queue.py
+
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+import requests
+
+from shared import config, metrics, sources
+from shared.engine import HostBudget, ScrapeEngine, UnitResult
+from shared.rate_limit import CircuitOpenError, THROTTLE_STATUSES
+from shared.sources.base import scrape_page
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+# Durable queue of (source, term, page) units shared by every worker process. A run's units are
+# enqueued by the leader, claimed by any worker under a lease, and deleted once the leader has
+# collected their result. hosts holds each host's shared pacing (the earliest time the next unit
+# may start) and its learned state (HostBudget.state()), so the per-host budget holds across workers.
+# A unit's metrics are those its workers recorded crawling it, for the leader's run (see metrics.captured).
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    leader      TEXT NOT NULL,
+    started_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    unit_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id      INTEGER NOT NULL,
+    source      TEXT NOT NULL,
+    host        TEXT NOT NULL,
+    term        TEXT NOT NULL,
+    page_num    INTEGER NOT NULL,
+    state       TEXT NOT NULL,
+    worker      TEXT,
+    lease_token TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    metrics     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_units_state ON units(state, unit_id);
+CREATE INDEX IF NOT EXISTS idx_units_run_id ON units(run_id, state);
+CREATE TABLE IF NOT EXISTS hosts (
+    host        TEXT PRIMARY KEY,
+    next_start  REAL NOT NULL,
+    state       TEXT
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name        TEXT PRIMARY KEY,
+    holder      TEXT NOT NULL,
+    lease_until REAL NOT NULL
+);
+"""
+
+# A unit claimed by a worker. source is a SourceSpec; host_state is the host's shared state, or None.
+# lease_token is unique to this claim: only its holder may finish the unit, even if another thread
+# of the same worker process reclaims the unit after the lease expired.
+ClaimedUnit = namedtuple("ClaimedUnit", ["unit_id", "run_id", "source", "term", "page_num", "attempts", "host_state", "lease_token"])
+
+
+def default_worker_id():
+    """Identifies this process among the workers: host name and process ID."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def connect(path=None):
+    """
+    Opens the work queue. Transactions are started explicitly (see _immediate), so the
+    connection is in autocommit mode.
+    """
+    path = path or config.WORK_QUEUE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(_SCHEMA)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(units)")}
+    if "lease_token" not in columns: # Queues created before claims carried a token
+        conn.execute("ALTER TABLE units ADD COLUMN lease_token TEXT")
+    if "metrics" not in columns:
+        conn.execute("ALTER TABLE units ADD COLUMN metrics TEXT")
+    return conn
+
+
+def _dump_metrics(values):
+    return json.dumps([[series, labels, value] for (series, labels), value in values.items()], ensure_ascii=False)
+
+
+def _load_metrics(text):
+    return {(series, labels): value for series, labels, value in json.loads(text)} if text else {}
+
+
+@contextmanager
+def _immediate(conn):
+    """Write transaction that takes the database's write lock up front, so claims never race."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class WorkQueue:
+    """
+    The work queue database, used by the leader (runs, enqueueing, collecting results), by workers
+    (claiming and finishing units) and by the leader lease. Each thread gets its own connection.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    # --- Leader side ---
+
+    def start_run(self, leader, now=None):
+        """
+        Registers a new run and returns its ID. Units of older runs are deleted: only the leader
+        enqueues, so they were left behind by a leader that died mid-run.
+        """
+        now = now if now is not None else time.time()
+        conn = self._conn()
+        with _immediate(conn):
+            orphaned = conn.execute("DELETE FROM units").rowcount
+            conn.execute("DELETE FROM runs")
+            run_id = conn.execute("INSERT INTO runs (leader, started_at) VALUES (?, ?)", (leader, now)).lastrowid
+        if orphaned:
+            logging.warning(f"Dropped {orphaned} unit(s) left in the work queue by an earlier leader.")
+        return run_id
+
+    def enqueue(self, run_id, source, term, page_num):
+        conn = self._conn()
+        with _immediate(conn):
+            conn.execute(
+                "INSERT INTO units (run_id, source, host, term, page_num, state) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, source.name, source.host, term, page_num, QUEUED),
+            )
+
+    def open_units(self, run_id):
+        """Number of the run's units not finished yet (queued or leased)."""
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM units WHERE run_id = ? AND state IN (?, ?)", (run_id, QUEUED, LEASED)
+        ).fetchone()
+        return row[0]
+
+    def collect(self, run_id):
+        """
+        Removes the run's finished units from the queue and returns them as dicts with the unit's
+        source, term and page_num, its jobs and listings (None for a failed unit), and the metrics
+        its workers recorded ({(series, labels): value}).
+        """
+        conn = self._conn()
+        with _immediate(conn):
+            rows = conn.execute(
+                "SELECT * FROM units WHERE run_id = ? AND state IN (?, ?) ORDER BY unit_id", (run_id, DONE, FAILED)
+            ).fetchall()
+            conn.executemany("DELETE FROM units WHERE unit_id = ?", [(row["unit_id"],) for row in rows])
+
+        finished = []
+        for row in rows:
+            result = json.loads(row["result"]) if row["state"] == DONE else {}
+            finished.append({
+                "source": row["source"], "term": row["term"], "page_num": row["page_num"],
+                "jobs": result.get("jobs"), "listings": result.get("listings"),
+                "metrics": _load_metrics(row["metrics"]),
+            })
+        return finished
+
+    def end_run(self, run_id):
+        """Deletes whatever is left of a run (e.g. after the leader stopped consuming it)."""
+        conn = self._conn()
+        with _immediate(conn):
+            conn.execute("DELETE FROM units WHERE run_id = ?", (run_id,))
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    def seed_hosts(self, host_states):
+        """Gives hosts the queue does not know yet their state saved by earlier runs (see rate_limit.load_host_states)."""
+        conn = self._conn()
+        with _immediate(conn):
+            conn.executemany(
+                "INSERT INTO hosts (host, next_start, state) VALUES (?, 0, ?) ON CONFLICT(host) DO NOTHING",
+                [(host, json.dumps(state)) for host, state in host_states.items()],
+            )
+
+    def host_states(self):
+        """Returns {host: state} as last saved by the workers."""
+        rows = self._conn().execute("SELECT host, state FROM hosts WHERE state IS NOT NULL").fetchall()
+        return {row["host"]: json.loads(row["state"]) for row in rows}
+
+    # --- Worker side ---
+
+    def claim(self, worker, now=None):
+        """
+        Leases the oldest claimable unit to worker and returns it as a ClaimedUnit, or None.
+
+        A unit is claimable when it is queued, or leased with an expired lease (its worker died),
+        and its host may start a request: fewer than the source's max_concurrency units of that host
+        are leased and the host's pacing interval has passed. Claiming reserves the host's next
+        start, so workers in every process share one pace per host.
+        """
+        now = now if now is not None else time.time()
+        conn = self._conn()
+        with _immediate(conn):
+            active = dict(conn.execute(
+                "SELECT host, COUNT(*) FROM units WHERE state = ? AND lease_until >= ? GROUP BY host", (LEASED, now)
+            ).fetchall())
+            rows = conn.execute(
+                """
+                SELECT units.*, hosts.state AS host_state FROM units LEFT JOIN hosts ON hosts.host = units.host
+                WHERE (units.state = ? OR (units.state = ? AND units.lease_until < ?)) AND COALESCE(hosts.next_start, 0) <= ?
+                ORDER BY units.unit_id LIMIT 100
+                """,
+                (QUEUED, LEASED, now, now),
+            ).fetchall()
+
+            for row in rows:
+                spec = sources.REGISTRY.get(row["source"])
+                if spec is None or row["attempts"] >= config.UNIT_MAX_ATTEMPTS:
+                    error = "unknown source" if spec is None else "lease expired on its last attempt"
+                    conn.execute("UPDATE units SET state = ?, error = ? WHERE unit_id = ?", (FAILED, error, row["unit_id"]))
+                    continue
+                if active.get(row["host"], 0) >= spec.max_concurrency:
+                    continue
+
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE units SET state = ?, worker = ?, lease_token = ?, lease_until = ?, attempts = attempts + 1 WHERE unit_id = ?",
+                    (LEASED, worker, token, now + config.UNIT_LEASE_SECONDS, row["unit_id"]),
+                )
+                host_state = json.loads(row["host_state"]) if row["host_state"] else None
+                interval = host_state["interval"] if host_state else sum(spec.delay_range) / 2
+                pace = interval * random.uniform(0.8, 1.2) if config.POLITENESS_DELAYS else 0.0
+                conn.execute(
+                    "INSERT INTO hosts (host, next_start) VALUES (?, ?) ON CONFLICT(host) DO UPDATE SET next_start = excluded.next_start",
+                    (spec.host, now + pace),
+                )
+                return ClaimedUnit(row["unit_id"], row["run_id"], spec, row["term"], row["page_num"], row["attempts"] + 1, host_state, token)
+        return None
+
+    def _finish(self, conn, unit, state, host_state, unit_metrics, hold=0.0, result=None, error=None):
+        # The metrics of earlier attempts (e.g. throttled requests) add up with this one's.
+        row = conn.execute(
+            "SELECT metrics FROM units WHERE unit_id = ? AND lease_token = ? AND state = ?", (unit.unit_id, unit.lease_token, LEASED)
+        ).fetchone()
+        if row is not None:
+            values = _load_metrics(row["metrics"])
+            for key, value in unit_metrics.items():
+                values[key] = values.get(key, 0) + value
+            conn.execute(
+                "UPDATE units SET state = ?, result = ?, error = ?, metrics = ?, lease_until = NULL WHERE unit_id = ?",
+                (state, result, error, _dump_metrics(values), unit.unit_id),
+            )
+        conn.execute(
+            "UPDATE hosts SET state = ?, next_start = MAX(next_start, ?) WHERE host = ?",
+            (json.dumps(host_state), time.time() + hold, unit.source.host),
+        )
+        if row is None:
+            logging.warning(f"  Unit {unit.unit_id} was reclaimed after its lease expired; dropping this worker's result.")
+
+    def complete(self, unit, jobs, listings, host_state, unit_metrics):
+        """Stores a crawled unit's jobs, listings and metrics, and its host's state after the request."""
+        conn = self._conn()
+        with _immediate(conn):
+            result = json.dumps({"jobs": jobs, "listings": listings}, ensure_ascii=False)
+            self._finish(conn, unit, DONE, host_state, unit_metrics, result=result)
+
+    def fail(self, unit, error, host_state, unit_metrics):
+        conn = self._conn()
+        with _immediate(conn):
+            self._finish(conn, unit, FAILED, host_state, unit_metrics, error=error)
+
+    def retry(self, unit, error, host_state, unit_metrics, hold=0.0):
+        """Queues a throttled unit again (or fails it after UNIT_MAX_ATTEMPTS), holding its host for hold seconds."""
+        state = QUEUED if unit.attempts < config.UNIT_MAX_ATTEMPTS else FAILED
+        conn = self._conn()
+        with _immediate(conn):
+            self._finish(conn, unit, state, host_state, unit_metrics, hold=hold, error=error)
+            if state == QUEUED:
+                conn.execute("UPDATE units SET worker = NULL, lease_token = NULL WHERE unit_id = ? AND lease_token = ?",
+                             (unit.unit_id, unit.lease_token))
+        return state == QUEUED
+
+    # --- Leases ---
+
+    def acquire_lease(self, name, holder, ttl, now=None):
+        """Takes or renews the named lease for ttl seconds. Returns False if another holder's lease is still valid."""
+        now = now if now is not None else time.time()
+        conn = self._conn()
+        with _immediate(conn):
+            row = conn.execute("SELECT holder, lease_until FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row["holder"] != holder and row["lease_until"] >= now:
+                return False
+            conn.execute(
+                "INSERT INTO leases (name, holder, lease_until) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, lease_until = excluded.lease_until",
+                (name, holder, now + ttl),
+            )
+        return True
+
+    def lease_holder(self, name, now=None):
+        """Returns the holder of the named lease, or None if nobody holds a valid one."""
+        now = now if now is not None else time.time()
+        row = self._conn().execute("SELECT holder, lease_until FROM leases WHERE name = ?", (name,)).fetchone()
+        return row["holder"] if row is not None and row["lease_until"] >= now else None
+
+    def release_lease(self, name, holder):
+        conn = self._conn()
+        with _immediate(conn):
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+
+class LeadershipLost(Exception):
+    """Raised in the leader's run when another process has taken over the leader lease."""
+
+
+class LeaderLease:
+    """
+    The leader lock: among all worker processes, only the holder schedules runs and sends the digest.
+    It is a lease in the work queue rather than a file lock, so it works for workers on several
+    machines; if the leader dies, a standby takes over once the lease expires.
+    """
+
+    NAME = "leader"
+
+    def __init__(self, queue, holder=None, ttl=None):
+        self.queue = queue
+        self.holder = holder or default_worker_id()
+        self.ttl = ttl or config.LEADER_LEASE_SECONDS
+
+    def acquire(self):
+        """Takes or renews the lease. Returns False if another process leads."""
+        return self.queue.acquire_lease(self.NAME, self.holder, self.ttl)
+
+    def check(self):
+        """Raises LeadershipLost unless this process still holds the lease."""
+        if self.queue.lease_holder(self.NAME) != self.holder:
+            raise LeadershipLost(f"{self.holder} no longer holds the leader lease")
+
+    def release(self):
+        self.queue.release_lease(self.NAME, self.holder)
+
+
+class QueueWorker:
+    """
+    Claims units from the work queue and crawls them, on config.QUEUE_WORKER_THREADS threads.
+
+    The queue paces hosts across every worker, so this worker's host budgets do not wait; they
+    still adapt the pace (written back to the queue with each result) and apply the circuit breaker.
+    A throttled page is queued again behind its host's backoff; other failures are reported as
+    failed units, like failed units of ScrapeEngine. What a unit records in metrics goes to the
+    queue with its result rather than into this process's registry, so it counts in the leader's run.
+    """
+
+    def __init__(self, queue, worker_id=None, threads=None):
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.threads = threads or config.QUEUE_WORKER_THREADS
+        self._budgets = {}
+        self._budgets_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _budget(self, spec):
+        with self._budgets_lock:
+            budget = self._budgets.get(spec.host)
+            if budget is None:
+                budget = HostBudget(spec.host, spec.max_concurrency, spec.delay_range, spec.min_delay, paced=False)
+                self._budgets[spec.host] = budget
+            return budget
+
+    def work_one(self):
+        """Claims and crawls one unit. Returns False if no unit was claimable."""
+        unit = self.queue.claim(self.worker_id)
+        if unit is None:
+            return False
+        self._process(unit)
+        return True
+
+    def _process(self, unit):
+        spec, term, page_num = unit.source, unit.term, unit.page_num
+        budget = self._budget(spec)
+        if unit.host_state:
+            budget.restore(unit.host_state)
+
+        listings = []
+        with metrics.captured() as recorded:
+            try:
+                with budget.slot():
+                    jobs = scrape_page(spec, term, page_num, listings)
+            except CircuitOpenError as e:
+                logging.debug(f"  Skipped {spec.name} for '{term}' on page {page_num}: circuit breaker open.")
+                self.queue.fail(unit, str(e), budget.state(), recorded.snapshot())
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status in THROTTLE_STATUSES and self.queue.retry(unit, str(e), budget.state(), recorded.snapshot(),
+                                                                    budget.limiter.hold_remaining()):
+                    logging.info(f"    {spec.host} answered {status}; '{term}' page {page_num} queued again after backing off.")
+                else:
+                    if status not in THROTTLE_STATUSES:
+                        self.queue.fail(unit, str(e), budget.state(), recorded.snapshot())
+                    logging.error(f"  Network error scraping {spec.name} for '{term}' on page {page_num}: {e}")
+            except requests.exceptions.RequestException as e:
+                logging.error(f"  Network error scraping {spec.name} for '{term}' on page {page_num}: {e}")
+                self.queue.fail(unit, str(e), budget.state(), recorded.snapshot())
+            except Exception as e:
+                logging.error(f"  Parsing or unexpected error for {spec.name} '{term}' on page {page_num}: {e}", exc_info=True)
+                self.queue.fail(unit, str(e) or type(e).__name__, budget.state(), recorded.snapshot())
+            else:
+                self.queue.complete(unit, jobs, listings, budget.state(), recorded.snapshot())
+
+    def run(self):
+        """Works units until stop() is called, sleeping QUEUE_POLL_SECONDS whenever none is claimable."""
+        while not self._stop.is_set():
+            try:
+                worked = self.work_one()
+            except sqlite3.Error as e:
+                logging.error(f"Work queue unavailable: {e}", exc_info=True)
+                worked = False
+            if not worked:
+                self._stop.wait(config.QUEUE_POLL_SECONDS)
+
+    def start(self):
+        """Starts the worker threads in the background."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self.run, name=f"queue-worker-{i}", daemon=True) for i in range(self.threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+class QueuedEngine(ScrapeEngine):
+    """
+    ScrapeEngine whose units are crawled by the worker pool instead of its own thread pools.
+
+    iter_units enqueues the plan's queries as a new run of the work queue and yields each unit's
+    UnitResult as its result is collected; the CrawlPlan still decides pagination here, in the
+    leader, and next pages are enqueued like first ones. The metrics the workers recorded for each
+    unit are added to this process's registry, so the run's own metrics cover them. The host
+    budgets of this engine are only used by the other stages of the run (detail enrichment);
+    host_states() returns the state the workers learned.
+
+    If lease (a LeaderLease) is given, it is checked whenever the engine waits for results and once
+    the crawl is done: a leader that lost it raises LeadershipLost, so the run stops before its
+    digest can go out next to the new leader's.
+    """
+
+    def __init__(self, queue, sources, plan=None, host_states=None, lease=None):
+        super().__init__(sources, plan, host_states)
+        self.queue = queue
+        self.lease = lease
+        self.leader = lease.holder if lease is not None else default_worker_id()
+        self.queue.seed_hosts(host_states or {})
+
+    def host_states(self):
+        states = super().host_states()
+        learned = self.queue.host_states()
+        states.update({host: state for host, state in learned.items() if host in states})
+        return states
+
+    def iter_units(self, terms):
+        """Crawls the plan's queries on every source through the work queue and yields a UnitResult per page."""
+        run_id = self.queue.start_run(self.leader)
+        by_name = {source.name: source for source in self.sources}
+        self._unit_order = {}
+        try:
+            terms = list(terms)
+            queries = [self.plan.queries_for(source, terms) for source in self.sources]
+            for i in range(max((len(q) for q in queries), default=0)):
+                for source, source_queries in zip(self.sources, queries):
+                    if i < len(source_queries):
+                        self._unit_order[(source.name, source_queries[i])] = len(self._unit_order)
+                        self.queue.enqueue(run_id, source, source_queries[i], 1)
+
+            while True:
+                # Counting first: a unit finishing between the two calls is then still collected.
+                open_units = self.queue.open_units(run_id)
+                finished = self.queue.collect(run_id)
+                if not finished:
+                    if self.lease is not None:
+                        self.lease.check()
+                    if not open_units:
+                        break
+                    time.sleep(config.QUEUE_POLL_SECONDS)
+                    continue
+
+                for unit in finished:
+                    source, term, page_num = by_name[unit["source"]], unit["term"], unit["page_num"]
+                    jobs, listings = unit["jobs"], unit["listings"]
+                    metrics.add(unit["metrics"])
+                    if jobs is None:
+                        yield UnitResult(term, source, page_num, None)
+                        continue
+                    dropped = len(listings) - len(jobs)
+                    logging.info(f"    Found {len(listings)} raw jobs from {source.name} for '{term}' (page {page_num}), {dropped} dropped by title")
+                    if self.plan.should_fetch_next(source, term, page_num, listings):
+                        self.queue.enqueue(run_id, source, term, page_num + 1)
+                    yield UnitResult(term, source, page_num, jobs, dropped)
+        finally:
+            self.queue.end_run(run_id)
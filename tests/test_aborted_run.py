@@ -0,0 +1,88 @@
+# tests/test_aborted_run.py
+
+import email
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from shared import config, job_store, scraper
+from shared.benchmark import SinkSMTP, offline_environment
+from shared.engine import UnitResult
+from shared.work_queue import LeadershipLost
+
+_WORDS = ["translation", "hebrew", "english", "piano", "recording", "song", "vocal", "singer", "studio", "mixing",
+          "guitar", "drums", "voice", "lyrics", "editing", "podcast", "album", "jingle", "choir", "orchestra"]
+
+
+def _jobs(count, seed=0):
+    """Distinct, relevant job dicts, each with a unique link."""
+    rng = random.Random(seed)
+    return [
+        {
+            "platform": "AllJobs",
+            "title": f"Looking for {rng.choice(_WORDS)} {rng.choice(_WORDS)} job {i}",
+            "description": " ".join(rng.choice(_WORDS) for _ in range(30)),
+            "link": f"https://example.com/job/{i}",
+        }
+        for i in range(count)
+    ]
+
+
+class _StubEngine:
+    """Stands in for ScrapeEngine: yields fixed pages, and loses the leader lease after abort_after pages."""
+
+    pages = []
+    abort_after = None
+
+    def __init__(self, sources, plan=None, host_states=None):
+        self.source = sources[0] if sources else None
+
+    def iter_units(self, terms):
+        for i, jobs in enumerate(self.pages):
+            if self.abort_after is not None and i == self.abort_after:
+                raise LeadershipLost("stub no longer holds the leader lease")
+            yield UnitResult("term", self.source, i + 1, [dict(job) for job in jobs])
+
+    def host_states(self):
+        return {}
+
+
+def _emailed_links():
+    links = set()
+    for message_string in SinkSMTP.messages:
+        for part in email.message_from_string(message_string).walk():
+            if part.get_content_type() == "text/plain":
+                text = part.get_payload(decode=True).decode("utf-8")
+                links.update(line.strip() for line in text.splitlines() if line.strip().startswith("https://example.com/"))
+    return links
+
+
+class AbortedRunTest(unittest.TestCase):
+
+    def test_jobs_of_an_aborted_run_are_emailed_by_the_next_run(self):
+        jobs = _jobs(30)
+        pages = [jobs[i:i + 5] for i in range(0, len(jobs), 5)]
+
+        with tempfile.TemporaryDirectory() as fixture_dir, offline_environment(fixture_dir), \
+                mock.patch.object(config, "ENRICH_DETAILS", False), \
+                mock.patch.object(config, "ARCHIVE_PAGES", False), \
+                mock.patch.object(config, "SCORING_BATCH_SIZE", 5), \
+                mock.patch.object(config, "JOB_STORE_BATCH_SIZE", 4), \
+                mock.patch.object(scraper, "ScrapeEngine", _StubEngine), \
+                mock.patch.object(_StubEngine, "pages", pages):
+            # The first run loses its lease after 4 pages: several batches of jobs are already recorded.
+            with mock.patch.object(_StubEngine, "abort_after", 4):
+                with self.assertRaises(LeadershipLost):
+                    scraper.run_scraper_and_email(source_names=["alljobs"])
+            self.assertEqual(SinkSMTP.messages, [])
+            self.assertTrue(job_store.pending_jobs())
+
+            scraper.run_scraper_and_email(source_names=["alljobs"])
+
+            self.assertEqual(_emailed_links(), {job["link"] for job in jobs})
+            self.assertEqual(job_store.pending_jobs(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,70 +1,211 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, make_response, request
 import os
 import logging
+import sqlite3
 import threading
 import datetime
 import pytz
 
-# Import the scraper function from the shared module
-from shared.scraper import run_scraper_and_email
+# Scans run through the shared scan coordinator and report to the shared status store
+from shared import config, job_store, metrics, search_index, status_store
+from shared.scan_coordinator import ScanCoordinator
 
 app = Flask(__name__, template_folder='templates')
 
 # Set up logging for the web service
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# This is a global variable to store the last run status.
-# It will be updated by the manual trigger but won't automatically reflect
-# the worker's scheduled runs without a shared persistent storage.
-job_counts = {"last_run_jobs": 0, "last_run_timestamp": "N/A", "status_message": "Ready"}
+IDT = pytz.timezone('Asia/Jerusalem')
+
+# Run status lives in the shared status store (shared/status_store.py), written by both this app's
+# manual scans and the worker's scheduled runs, so every gunicorn worker sees the same status.
+# The rendered snapshot is cached per process and rebuilt only when the store's version changes.
+_status_cache = {"version": None, "snapshot": None}
+_status_lock = threading.Lock()
+
+# One scan at a time per process; the coordinator's file lock also keeps out the worker's runs.
+scan_coordinator = ScanCoordinator("manual")
+
+
+def _format_time(epoch):
+    return datetime.datetime.fromtimestamp(epoch, IDT).strftime('%Y-%m-%d %H:%M:%S IDT')
+
+
+def _build_snapshot(runs, units=None):
+    """
+    Turns recent runs (newest first) and the worker's scheduled units (see status_store.schedule_units)
+    into the job_counts dict the dashboard expects.
+    """
+    job_counts = {"last_run_jobs": 0, "last_run_timestamp": "N/A", "status_message": "Ready"}
+    latest = runs[0] if runs else None
+    last_finished = next((run for run in runs if run["state"] != status_store.RUNNING), None)
+
+    if last_finished is not None:
+        job_counts["last_run_timestamp"] = _format_time(last_finished["finished_at"])
+        if last_finished["state"] == status_store.FAILED:
+            job_counts["last_run_jobs"] = "Error"
+            job_counts["status_message"] = f"Error during {last_finished['trigger']} scan: {last_finished['message']}"
+        else:
+            job_counts["last_run_jobs"] = last_finished["jobs"]
+            job_counts["status_message"] = f"Scan complete. Found {last_finished['jobs']} jobs."
+    if latest is not None and latest["state"] == status_store.RUNNING:
+        job_counts["last_run_timestamp"] = "Scanning..."
+        job_counts["status_message"] = "Scan in progress... please wait."
+
+    job_counts["recent_runs"] = [
+        {
+            "trigger": run["trigger"],
+            "state": run["state"],
+            "started": _format_time(run["started_at"]),
+            "duration_seconds": round(run["duration"], 1) if run["duration"] is not None else None,
+            "jobs": run["jobs"],
+            "message": run["message"],
+            "metrics": run["metrics"]["summary"] if run["metrics"] else None,
+        }
+        for run in runs
+    ]
+    job_counts["schedule"] = [
+        {
+            "unit": unit["unit_id"],
+            "interval_hours": round(unit["interval"] / 3600, 1),
+            "last_new_jobs": unit["last_new_jobs"],
+            "next_run": _format_time(unit["next_run_at"]) if unit["next_run_at"] is not None else None,
+        }
+        for unit in (units or {}).values()
+    ]
+    return job_counts
+
+
+def get_status_snapshot():
+    """
+    Returns (job_counts, version, last_modified) from the status store. Only a cheap version query
+    hits the database unless a run was recorded since the last call.
+    """
+    try:
+        version = status_store.version()
+    except sqlite3.Error as e:
+        logging.error(f"Status store unavailable: {e}", exc_info=True)
+        return {"last_run_jobs": 0, "last_run_timestamp": "N/A", "status_message": "Status unavailable", "recent_runs": [], "schedule": []}, None, None
+
+    with _status_lock:
+        if _status_cache["version"] != version:
+            _status_cache["snapshot"] = _build_snapshot(status_store.recent_runs(), status_store.schedule_units())
+            _status_cache["version"] = version
+        snapshot = _status_cache["snapshot"]
+    return snapshot, version, datetime.datetime.fromtimestamp(version[0], datetime.timezone.utc)
+
+
+def _conditional(response, version, last_modified, tag):
+    """Adds ETag/Last-Modified validators so a poll with nothing new gets an empty 304."""
+    if version is None:
+        return response
+    response.set_etag(f"{tag}-{version[1]}-{version[0]:.6f}")
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True # Always revalidate, but a 304 is enough when nothing changed
+    return response.make_conditional(request)
+
 
 @app.route('/')
 def index():
     """
     Renders the main dashboard page.
     """
-    return render_template('index.html', job_counts=job_counts)
+    job_counts, version, last_modified = get_status_snapshot()
+    response = make_response(render_template('index.html', job_counts=job_counts, settings=config))
+    return _conditional(response, version, last_modified, "index")
 
 @app.route('/trigger_scan', methods=['POST'])
 def trigger_scan():
     """
     Endpoint to manually trigger a job scan.
-    Runs the scraper in a separate thread to avoid blocking the Flask app.
+    The scan runs in the background on the scan coordinator; a trigger while a scan is already
+    in progress (a manual one, or the worker's scheduled run) joins it instead of starting another.
     """
-    global job_counts # Declare that we intend to modify the global job_counts variable
     logging.info("Manual scan triggered via UI.")
-    job_counts["status_message"] = "Scan in progress... please wait."
-    job_counts["last_run_timestamp"] = "Scanning..." # Update status immediately
-
-    # Define the background task function
-    def run_scan_in_background():
-        global job_counts # This is crucial: declare global inside the nested function too
-        try:
-            # The run_scraper_and_email function already handles logging and email
-            jobs = run_scraper_and_email()
-            job_counts["last_run_jobs"] = len(jobs)
-            # Use pytz to get timezone-aware current time in Israel
-            current_time_idt = datetime.datetime.now(pytz.timezone('Asia/Jerusalem'))
-            job_counts["last_run_timestamp"] = current_time_idt.strftime('%Y-%m-%d %H:%M:%S IDT')
-            job_counts["status_message"] = f"Scan complete. Found {len(jobs)} jobs."
-            logging.info(f"Manual scan completed. Found {len(jobs)} jobs.")
-        except Exception as e:
-            job_counts["status_message"] = f"Error during manual scan: {e}"
-            logging.error(f"Error during manual scan: {e}", exc_info=True)
-            job_counts["last_run_jobs"] = "Error"
+    scan_id, started = scan_coordinator.trigger()
+    if started:
+        message = "Manual scan initiated in background. Check back in a few minutes or check your email."
+    else:
+        message = "A scan is already in progress. Check back in a few minutes or check your email."
+    return jsonify({"status": "success", "message": message, "scan_id": scan_id, "started": started}), 202 # 202 Accepted
 
-    # Start the scan in a new thread
-    thread = threading.Thread(target=run_scan_in_background)
-    thread.start()
+@app.route('/scan/<int:scan_id>')
+def get_scan_progress(scan_id):
+    """
+    Endpoint to follow one scan: its state and the (term, source, page) units completed so far.
+    """
+    try:
+        progress = status_store.run_progress(scan_id)
+    except sqlite3.Error as e:
+        logging.error(f"Status store unavailable: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": "Status unavailable"}), 503
+    if progress is None:
+        return jsonify({"status": "error", "message": f"Unknown scan {scan_id}"}), 404
 
-    return jsonify({"status": "success", "message": "Manual scan initiated in background. Check back in a few minutes or check your email."}), 202 # 202 Accepted
+    progress["started"] = _format_time(progress["started_at"])
+    progress["finished"] = _format_time(progress["finished_at"]) if progress["finished_at"] is not None else None
+    return jsonify(progress)
 
 @app.route('/status')
 def get_status():
     """
-    Endpoint to get the current status of the last scan.
+    Endpoint to get the current status of the last scan, with the recent run history.
+    """
+    job_counts, version, last_modified = get_status_snapshot()
+    return _conditional(jsonify(job_counts), version, last_modified, "status")
+
+@app.route('/metrics')
+def get_metrics():
     """
-    return jsonify(job_counts)
+    Prometheus scrape endpoint: cumulative pipeline metrics of every recorded run (web and worker),
+    plus gauges for the latest finished run.
+    """
+    try:
+        values = status_store.metric_totals()
+    except sqlite3.Error as e:
+        logging.error(f"Status store unavailable: {e}", exc_info=True)
+        return Response("# status store unavailable\n", status=503, mimetype="text/plain")
+    return Response(metrics.render(values), mimetype="text/plain; version=0.0.4")
+
+def _parse_day(value, end_of_day=False):
+    """Parses a YYYY-MM-DD query argument (Israel time) into an epoch timestamp; None if absent."""
+    if not value:
+        return None
+    day = IDT.localize(datetime.datetime.strptime(value, '%Y-%m-%d'))
+    if end_of_day:
+        day += datetime.timedelta(days=1)
+    return int(day.timestamp())
+
+@app.route('/jobs')
+def search_jobs():
+    """
+    Endpoint to browse and search the stored jobs, served from the job store's full-text index.
+
+    Query arguments: q (keywords, Hebrew or English), platform, since and until (YYYY-MM-DD, inclusive,
+    on the date the job was first found), limit, and cursor (the next_cursor of the previous page).
+    """
+    try:
+        since = _parse_day(request.args.get('since'))
+        until = _parse_day(request.args.get('until'), end_of_day=True)
+        limit = int(request.args.get('limit', search_index.DEFAULT_PAGE_SIZE))
+        results = job_store.search_jobs(
+            query=request.args.get('q'),
+            platform=request.args.get('platform'),
+            since=since,
+            until=until,
+            cursor=request.args.get('cursor'),
+            limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except sqlite3.Error as e:
+        logging.error(f"Job search failed: {e}", exc_info=True)
+        return jsonify({"status": "error", "message": "Search unavailable"}), 503
+
+    for job in results["jobs"]:
+        job["first_seen"] = _format_time(job["first_seen"])
+        job["last_seen"] = _format_time(job["last_seen"])
+    return jsonify(results)
 
 if __name__ == '__main__':
     # Use environment variable for port in production (Render)
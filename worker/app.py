@@ -1,48 +1,174 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+import datetime
 import os
 import pytz
 import logging
-import time
+import sqlite3
+import threading
 
-# Import the main scraper function
-from shared.scraper import run_scraper_and_email
+# For local development, load .env variables. This must happen before anything from shared is
+# imported: shared/config.py reads its settings from the environment when it is imported.
+if os.path.exists('.env'):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Import the scan entry point (runs the scraper under the shared scan lock)
+from shared import config
+from shared.scan_coordinator import run_exclusive, send_digest_exclusive
+from shared.scheduling import plan_units, start_offsets
+from shared.scraper import SCRAPE_TERMS
+from shared.work_queue import LeaderLease, LeadershipLost, QueueWorker, WorkQueue
 
 # Set up logging for the worker service
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# The leader lease is renewed every few seconds; only log its failures.
+logging.getLogger('apscheduler.executors.lease').setLevel(logging.WARNING)
+
+# Use 'Asia/Jerusalem' for Israel time
+TIMEZONE = pytz.timezone('Asia/Jerusalem')
+
+def _trigger(unit, start_date=None):
+    return IntervalTrigger(seconds=unit.interval, start_date=start_date, jitter=config.SCHEDULE_JITTER_SECONDS, timezone=TIMEZONE)
+
+def _save_unit(unit, next_run=None):
+    """Saves a unit's cadence and next run time (a datetime), for the next leader and the dashboard."""
+    try:
+        unit.save(next_run.timestamp() if next_run is not None else None)
+    except sqlite3.Error as e:
+        logging.warning(f"Could not save the schedule of {unit.id}: {e}")
+
+def scheduled_run(scheduler, unit, queue, lease):
+    """
+    Runs one scheduled unit (one source, one group of terms) and records it in the shared status store,
+    so the web dashboard shows it. Skipped if a scan (e.g. a manual one from the web app) is already in progress.
+    Its pages are crawled by the worker pool through the work queue. If this process loses the leader
+    lease meanwhile, the run is abandoned before it sends anything.
+    Its new jobs are held for the next periodic digest (see send_digest) rather than emailed.
+    The unit's next runs are rescheduled if its cadence changed, and its cadence is saved.
+    """
+    logging.info(f"Scheduled scan of {unit.source_name} ({len(unit.terms)} terms, group {unit.group}) starting.")
+    try:
+        jobs = run_exclusive("scheduled", terms=unit.terms, source_names=[unit.source_name], queue=queue, lease=lease,
+                             defer_digest=True)
+    except LeadershipLost as e:
+        logging.warning(f"Scheduled scan {unit.id} abandoned: {e}.")
+        return
+    except Exception as e:
+        logging.error(f"Scheduled scan {unit.id} failed: {e}", exc_info=True)
+        jobs = None
+
+    if unit.record(jobs):
+        scheduler.reschedule_job(unit.id, trigger=_trigger(unit))
+        logging.info(f"{unit.id} found {jobs} new jobs; next run in about {unit.interval / 3600:.1f} hours.")
+    job = scheduler.get_job(unit.id)
+    _save_unit(unit, job.next_run_time if job is not None else None)
+
+def send_digest(lease):
+    """
+    Emails the new jobs held by the scheduled runs since the last digest, as one digest.
+    Skipped if a scan (e.g. a manual one from the web app) is in progress; that scan sends them.
+    """
+    try:
+        sent = send_digest_exclusive(lease)
+        if sent is not None:
+            logging.info(f"Periodic digest done ({sent} job postings).")
+    except LeadershipLost as e:
+        logging.warning(f"Periodic digest skipped: {e}.")
+    except Exception as e:
+        logging.error(f"Periodic digest failed: {e}", exc_info=True)
+
+def renew_leadership(scheduler, lease):
+    """Renews the leader lease; if another process has taken it over, stops scheduling."""
+    try:
+        renewed = lease.acquire()
+    except Exception as e:
+        logging.error(f"Could not renew the leader lease: {e}", exc_info=True)
+        return
+    if not renewed:
+        # Called on the lease executor: waiting here for the scan executor would wait for itself
+        # to shut down. start_scheduler waits for the scan in flight instead.
+        logging.error("Leader lease lost to another worker process; no longer scheduling runs.")
+        scheduler.shutdown(wait=False)
 
-def start_scheduler():
+def start_scheduler(queue, lease):
     """
-    Initializes and starts the APScheduler to run the scraping task.
-    Schedules runs for 08:00 AM and 18:00 PM IDT.
+    Initializes the APScheduler and blocks running it, while this process holds the leader lease.
+
+    Every enabled source and group of search terms is its own job (see shared/scheduling.py), with
+    start times spread over the first interval, jittered run times and a cadence that adapts to how
+    often the unit finds new jobs. Units run one at a time, as scans share one lock; a unit still
+    running (or waiting for another) when it is due again skips that run. Their new jobs go out
+    together, in one digest every DIGEST_INTERVAL_HOURS, sent under the scan lock so it never
+    runs in the middle of a scan, in this process or another.
+
+    Returns once the lease is lost and the scan in flight, if any, has finished or given up.
     """
-    # Use 'Asia/Jerusalem' for Israel time
-    scheduler = BackgroundScheduler(timezone=pytz.timezone('Asia/Jerusalem'))
+    scans = ThreadPoolExecutor(max_workers=1)
+    scheduler = BlockingScheduler(
+        timezone=TIMEZONE,
+        executors={'default': scans, 'lease': ThreadPoolExecutor(max_workers=1)},
+        job_defaults={'max_instances': 1, 'coalesce': True, 'misfire_grace_time': 600},
+    )
+    scheduler.add_job(renew_leadership, 'interval', seconds=lease.ttl / 3, args=(scheduler, lease),
+                      id='leader_lease', executor='lease')
 
-    # Schedule the job to run twice daily: 08:00 and 18:00
-    logging.info("Scheduling job bot to run daily at 08:00 AM and 18:00 PM IDT...")
-    scheduler.add_job(run_scraper_and_email, 'cron', hour=8, minute=0, id='morning_run', misfire_grace_time=600)
-    scheduler.add_job(run_scraper_and_email, 'cron', hour=18, minute=0, id='evening_run', misfire_grace_time=600)
+    units = plan_units(SCRAPE_TERMS)
+    now = datetime.datetime.now(TIMEZONE)
+    for unit, offset in zip(units, start_offsets(units)):
+        start_date = now + datetime.timedelta(seconds=offset)
+        scheduler.add_job(scheduled_run, _trigger(unit, start_date),
+                          args=(scheduler, unit, queue, lease), id=unit.id, name=f"scan {unit.id}")
+        _save_unit(unit, start_date)
+        logging.info(f"Scheduled {unit}, first run in about {offset / 3600:.1f} hours.")
+    scheduler.add_job(send_digest, 'interval', hours=config.DIGEST_INTERVAL_HOURS, args=(lease,), id='digest', name="digest")
 
-    scheduler.start()
     logging.info("Scheduler started. Waiting for scheduled runs...")
+    scheduler.start() # Blocks until shutdown
+    # The scheduler stopped without waiting for its jobs; a scan still running notices the lost
+    # lease at its next check and stops. Only then may this process stand by for leadership again.
+    scans.shutdown(wait=True)
+
+def run_worker():
+    """
+    Runs this worker process: it always crawls units from the shared work queue, and the one process
+    holding the leader lease also schedules runs and sends their digests. Any number of worker
+    processes can run side by side; the others stand by and take over if the leader dies.
+    """
+    queue = WorkQueue()
+    worker = QueueWorker(queue)
+    lease = LeaderLease(queue, worker.worker_id)
+    standby = threading.Event()
+    worker.start()
+    logging.info(f"Worker {worker.worker_id} crawling queued units on {worker.threads} thread(s).")
 
-    # Keep the worker process alive indefinitely
     try:
         while True:
-            time.sleep(2) # Keep the main thread alive
+            try:
+                leader = lease.acquire()
+            except Exception as e:
+                logging.error(f"Could not take the leader lease: {e}", exc_info=True)
+                leader = False
+            if leader:
+                logging.info(f"Worker {worker.worker_id} is the leader: scheduling runs.")
+                start_scheduler(queue, lease)
+            else:
+                standby.wait(lease.ttl / 3)
     except (KeyboardInterrupt, SystemExit):
-        logging.info("Scheduler shutting down due to interrupt.")
-        scheduler.shutdown()
+        logging.info("Worker shutting down due to interrupt.")
     except Exception as e:
         logging.error(f"Worker main loop error: {e}", exc_info=True)
-        scheduler.shutdown()
+    finally:
+        worker.stop()
+        try:
+            lease.release()
+        except Exception as e:
+            logging.error(f"Could not release the leader lease: {e}", exc_info=True)
 
 if __name__ == '__main__':
     logging.info("Worker service starting up.")
-    # For local development, load .env variables
     if os.path.exists('.env'):
-        from dotenv import load_dotenv
-        load_dotenv()
         logging.info("Loaded environment variables from .env file (for local development).")
 
-    start_scheduler()
+    run_worker()